@@ -0,0 +1,404 @@
+"""Админка преподавателя: пользователи, заявки, контент сайта и блог"""
+import os
+from datetime import datetime
+
+import sqlalchemy
+from flask import Blueprint, current_app, flash, jsonify, redirect, render_template, request, url_for
+from flask_login import current_user, login_required
+from sqlalchemy.orm import selectinload
+
+from extensions import (admin_counter, applications_listing, cache_versions, identity_cache, password_hasher,
+                        site_content_cache, students_listing, users_listing)
+from groups import change_group_members, group_members_message, search_students
+from models import db, Application, BlogPost, Group, GroupMember, SiteContent, User
+from pagination import keyset_paginate
+from password_hashing import HasherBusy
+
+admin_bp = Blueprint('admin', __name__)
+
+
+# Сохранение контента сайта в базу данных
+def save_site_content(page_name, section_name, content_key, content_value):
+    result = save_site_content_bulk([{
+        'page_name': page_name,
+        'section_name': section_name,
+        'content_key': content_key,
+        'content_value': content_value
+    }])[0]
+    if result['status'] == 'error':
+        raise ValueError(result['error'])
+
+# Пакетное сохранение контента: один SELECT, пакет UPDATE/INSERT и один commit.
+# Возвращает результат по каждому полю: created, updated, unchanged или error
+def save_site_content_bulk(items):
+    results = []
+    values = {}
+    for item in items:
+        key = (item.get('page_name'), item.get('section_name'), item.get('content_key'))
+        result = {'page_name': key[0], 'section_name': key[1], 'content_key': key[2]}
+        results.append(result)
+        if not all(isinstance(part, str) and part for part in key):
+            result['status'] = 'error'
+            result['error'] = 'Не указаны page_name, section_name или content_key'
+        elif len(key[0]) > 50 or len(key[1]) > 50 or len(key[2]) > 100:
+            result['status'] = 'error'
+            result['error'] = 'Слишком длинный ключ'
+        elif not isinstance(item.get('content_value'), (str, type(None))):
+            result['status'] = 'error'
+            result['error'] = 'content_value должен быть строкой'
+        else:
+            values[key] = item.get('content_value')
+    if not values:
+        return results
+
+    existing = {}
+    key_columns = sqlalchemy.tuple_(SiteContent.page_name, SiteContent.section_name, SiteContent.content_key)
+    rows = db.session.query(
+        SiteContent.id, SiteContent.page_name, SiteContent.section_name,
+        SiteContent.content_key, SiteContent.content_value
+    ).filter(key_columns.in_(list(values))).all()
+    for row in rows:
+        existing[(row.page_name, row.section_name, row.content_key)] = (row.id, row.content_value)
+
+    now = datetime.utcnow()
+    updates = []
+    inserts = []
+    statuses = {}
+    for key, value in values.items():
+        if key in existing:
+            content_id, old_value = existing[key]
+            if old_value == value:
+                statuses[key] = 'unchanged'
+                continue
+            updates.append({'b_id': content_id, 'b_value': value, 'b_updated': now})
+            statuses[key] = 'updated'
+        else:
+            inserts.append({
+                'page_name': key[0],
+                'section_name': key[1],
+                'content_key': key[2],
+                'content_value': value,
+                'created_at': now,
+                'updated_at': now
+            })
+            statuses[key] = 'created'
+
+    table = SiteContent.__table__
+    if updates:
+        db.session.execute(
+            table.update()
+            .where(table.c.id == sqlalchemy.bindparam('b_id'))
+            .values(content_value=sqlalchemy.bindparam('b_value'), updated_at=sqlalchemy.bindparam('b_updated')),
+            updates
+        )
+    if inserts:
+        db.session.execute(table.insert(), inserts)
+    if updates or inserts:
+        site_content_cache.invalidate()
+    db.session.commit()
+
+    for result in results:
+        if 'status' not in result:
+            result['status'] = statuses[(result['page_name'], result['section_name'], result['content_key'])]
+    return results
+
+# Админ панель
+@admin_bp.route('/admin')
+@login_required
+def admin_panel():
+    if not current_user.is_teacher:
+        flash('Доступ запрещен!', 'error')
+        return redirect(url_for('main.dashboard'))
+    
+    users = users_listing.page()
+    students_count = admin_counter.count('students_total', User.query.filter_by(is_teacher=False), ('users',))
+    posts_count = admin_counter.count('blog_posts_total', BlogPost.query, ('blog',))
+    applications_count = admin_counter.count(
+        'applications_new', Application.query.filter_by(status='new'), ('applications',)
+    )
+    return render_template('admin_panel.html', users=users, students_count=students_count,
+                           posts_count=posts_count, applications_count=applications_count)
+
+# Ученики (админ) - ИСПРАВЛЕННАЯ ФУНКЦИЯ
+@admin_bp.route('/admin/students', methods=['GET', 'POST'])
+@login_required
+def admin_students():
+    if not current_user.is_teacher:
+        flash('Доступ запрещен!', 'error')
+        return redirect(url_for('main.dashboard'))
+    
+    # Обработка добавления учеников в группу (отмеченные и/или список email)
+    if request.method == 'POST':
+        group = db.session.get(Group, request.form.get('group_id', type=int) or 0)
+        student_ids = request.form.getlist('student_ids')
+        emails_text = request.form.get('emails', '')
+        
+        if group and (student_ids or emails_text.strip()):
+            try:
+                summary = change_group_members(group.id, 'add', student_ids, emails_text)
+            except ValueError as e:
+                flash(str(e), 'error')
+                return redirect(url_for('admin.admin_students'))
+            flash(group_members_message(summary), 'success' if summary['students'] else 'error')
+            return redirect(url_for('admin.admin_students'))
+    
+    # Ученики (не преподаватели) постранично, с группами одним дополнительным запросом
+    students = students_listing.page(
+        User.query.filter_by(is_teacher=False).options(
+            selectinload(User.group_memberships_rel).joinedload(GroupMember.group)
+        )
+    )
+    
+    # Получаем все группы с количеством участников
+    groups_with_counts = db.session.query(
+        Group,
+        db.func.count(GroupMember.id).label('member_count')
+    ).outerjoin(GroupMember).filter(Group.is_individual == False).group_by(Group.id).all()
+    
+    # Получаем индивидуальные занятия с количеством участников
+    individual_groups_with_counts = db.session.query(
+        Group,
+        db.func.count(GroupMember.id).label('member_count')
+    ).outerjoin(GroupMember).filter(Group.is_individual == True).group_by(Group.id).options(
+        selectinload(Group.members_rel).joinedload(GroupMember.user)
+    ).all()
+    
+    return render_template('admin_students.html', 
+                         students=students, 
+                         groups=groups_with_counts,
+                         individual_groups=[group for group, _ in individual_groups_with_counts])
+
+# Поиск ученика для индивидуального занятия (форма расписания)
+@admin_bp.route('/admin/students/search')
+@login_required
+def student_search():
+    if not current_user.is_teacher:
+        return jsonify({'error': 'Доступ запрещен'}), 403
+    return jsonify(search_students(User.query.filter(User.is_teacher == False), request.args.get('q', '')))
+
+# Заявки на обучение (админ)
+@admin_bp.route('/admin/applications')
+@login_required
+def admin_applications():
+    if not current_user.is_teacher:
+        flash('Доступ запрещен!', 'error')
+        return redirect(url_for('main.dashboard'))
+    
+    applications = applications_listing.page()
+    status = applications.filters.get('status', 'all')
+    return render_template('admin_applications.html', applications=applications, current_status=status)
+
+# Изменение статуса заявки
+@admin_bp.route('/admin/application/<int:app_id>/status/<status>')
+@login_required
+def change_application_status(app_id, status):
+    if not current_user.is_teacher:
+        flash('Доступ запрещен!', 'error')
+        return redirect(url_for('main.dashboard'))
+    
+    application = Application.query.get_or_404(app_id)
+    application.status = status
+    if status != 'new':
+        application.processed_at = datetime.utcnow()
+        application.processed_by = current_user.id
+    else:
+        application.processed_at = None
+        application.processed_by = None
+    
+    cache_versions.bump('applications')
+    db.session.commit()
+    flash('Статус заявки успешно изменен!', 'success')
+    return redirect(url_for('admin.admin_applications'))
+
+# Редактирование пользователя (админ)
+@admin_bp.route('/admin/edit_user/<int:user_id>', methods=['GET', 'POST'])
+@login_required
+def edit_user(user_id):
+    if not current_user.is_teacher:
+        flash('Доступ запрещен!', 'error')
+        return redirect(url_for('main.dashboard'))
+    
+    user = User.query.get_or_404(user_id)
+    
+    if request.method == 'POST':
+        user.first_name = request.form['first_name']
+        user.last_name = request.form['last_name']
+        user.email = request.form['email']
+        user.phone = request.form['phone']
+        user.is_teacher = 'is_teacher' in request.form
+        
+        # Если указан новый пароль
+        new_password = request.form.get('password')
+        if new_password:
+            try:
+                user.password_hash = password_hasher.hash(new_password)
+            except HasherBusy:
+                db.session.rollback()
+                flash('Сервер перегружен. Попробуйте через минуту.', 'error')
+                return render_template('edit_user.html', user=user), 503
+        
+        cache_versions.bump('users')
+        identity_cache.invalidate(user.id)
+        db.session.commit()
+        flash('Пользователь успешно обновлен!', 'success')
+        return redirect(url_for('admin.admin_panel'))
+    
+    return render_template('edit_user.html', user=user)
+
+# Удаление пользователя (админ)
+@admin_bp.route('/admin/delete_user/<int:user_id>')
+@login_required
+def delete_user(user_id):
+    if not current_user.is_teacher:
+        flash('Доступ запрещен!', 'error')
+        return redirect(url_for('main.dashboard'))
+    
+    user = User.query.get_or_404(user_id)
+    
+    # Запретить удаление самого себя
+    if user.id == current_user.id:
+        flash('Нельзя удалить свою учетную запись!', 'error')
+        return redirect(url_for('admin.admin_panel'))
+    
+    db.session.delete(user)
+    cache_versions.bump('users')
+    identity_cache.invalidate(user.id)
+    db.session.commit()
+    
+    flash('Пользователь успешно удален!', 'success')
+    return redirect(url_for('admin.admin_panel'))
+
+# Админ панель - управление контентом
+@admin_bp.route('/admin/content')
+@login_required
+def admin_content():
+    if not current_user.is_teacher:
+        flash('Доступ запрещен!', 'error')
+        return redirect(url_for('main.dashboard'))
+    
+    # Получаем текущий контент
+    content_data = {}
+    for (page_name, section_name, content_key), value in site_content_cache.snapshot().items():
+        content_data[f"{page_name}_{section_name}_{content_key}"] = value
+    
+    return render_template('admin_content.html', content_data=content_data)
+
+# Сохранение контента через AJAX
+@admin_bp.route('/admin/save_content', methods=['POST'])
+@login_required
+def save_content():
+    if not current_user.is_teacher:
+        return jsonify({'error': 'Доступ запрещен'}), 403
+    
+    try:
+        data = request.get_json()
+        page_name = data.get('page_name')
+        section_name = data.get('section_name')
+        content_key = data.get('content_key')
+        content_value = data.get('content_value')
+        
+        save_site_content(page_name, section_name, content_key, content_value)
+        return jsonify({'success': 'Контент успешно сохранен'})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Сохранение нескольких полей контента одним запросом
+@admin_bp.route('/admin/save_content_bulk', methods=['POST'])
+@login_required
+def save_content_bulk():
+    if not current_user.is_teacher:
+        return jsonify({'error': 'Доступ запрещен'}), 403
+    
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Ожидается JSON-объект'}), 400
+    items = data.get('items')
+    if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+        return jsonify({'error': 'Ожидается список полей в items'}), 400
+    if len(items) > current_app.config['CONTENT_BULK_MAX_ITEMS']:
+        return jsonify({'error': 'Слишком много полей в одном запросе'}), 400
+    
+    try:
+        results = save_site_content_bulk(items)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+    
+    failed = [result for result in results if result['status'] == 'error']
+    return jsonify({
+        'success': f'Сохранено полей: {len(results) - len(failed)}',
+        'results': results
+    }), (207 if failed else 200)
+
+# Блог - управление постами
+@admin_bp.route('/admin/blog')
+@login_required
+def admin_blog():
+    if not current_user.is_teacher:
+        flash('Доступ запрещен!', 'error')
+        return redirect(url_for('main.dashboard'))
+    
+    page = keyset_paginate(
+        BlogPost.query,
+        BlogPost.created_at, BlogPost.id,
+        after=request.args.get('after'),
+        before=request.args.get('before'),
+        per_page=current_app.config['ADMIN_BLOG_POSTS_PER_PAGE']
+    )
+    return render_template('admin_blog.html', posts=page.items, page=page)
+
+# Создание/редактирование поста
+@admin_bp.route('/admin/blog/edit/<int:post_id>', methods=['GET', 'POST'])
+@admin_bp.route('/admin/blog/create', methods=['GET', 'POST'])
+@login_required
+def edit_blog_post(post_id=None):
+    if not current_user.is_teacher:
+        flash('Доступ запрещен!', 'error')
+        return redirect(url_for('main.dashboard'))
+    
+    if post_id:
+        post = BlogPost.query.get_or_404(post_id)
+    else:
+        post = BlogPost()
+    
+    if request.method == 'POST':
+        post.title = request.form['title']
+        post.content = request.form['content']
+        post.is_published = 'is_published' in request.form
+        
+        # Обработка загрузки изображения
+        if 'image' in request.files:
+            file = request.files['image']
+            if file and file.filename != '':
+                filename = f"blog_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{file.filename}"
+                file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
+                file.save(file_path)
+                post.image_path = f"uploads/{filename}"
+        
+        if not post_id:  # Новый пост
+            db.session.add(post)
+        # Кэши блога (страницы и ленту) сбрасываем, только если что-то изменилось
+        if not post_id or db.session.is_modified(post):
+            cache_versions.bump('blog')
+        db.session.commit()
+        
+        flash('Пост успешно сохранен!', 'success')
+        return redirect(url_for('admin.admin_blog'))
+    
+    return render_template('edit_blog_post.html', post=post)
+
+# Удаление поста
+@admin_bp.route('/admin/blog/delete/<int:post_id>')
+@login_required
+def delete_blog_post(post_id):
+    if not current_user.is_teacher:
+        flash('Доступ запрещен!', 'error')
+        return redirect(url_for('main.dashboard'))
+    
+    post = BlogPost.query.get_or_404(post_id)
+    db.session.delete(post)
+    cache_versions.bump('blog')
+    db.session.commit()
+    
+    flash('Пост успешно удален!', 'success')
+    return redirect(url_for('admin.admin_blog'))
@@ -0,0 +1,309 @@
+"""Сборка статических файлов: локальные копии библиотек, удаление неиспользуемого CSS,
+имена с хэшем содержимого и заранее сжатые варианты (gzip, brotli)"""
+import gzip
+import hashlib
+import io
+import json
+import mimetypes
+import os
+import re
+import shutil
+import urllib.parse
+
+import click
+from flask import abort, current_app, request, send_file, url_for
+
+try:
+    import brotli
+except ImportError:  # brotli необязателен: без него собираются только .gz
+    brotli = None
+
+try:
+    from fontTools import subset as font_subset
+except ImportError:  # fontTools необязателен: без него шрифты иконок копируются целиком
+    font_subset = None
+
+# Библиотеки, которые раньше подключались с CDN (ссылки CDN используются, пока сборки нет)
+VENDOR_ASSETS = {
+    'bootstrap.css': 'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css',
+    'bootstrap.js': 'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js',
+    'fontawesome.css': 'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css',
+    'jquery.js': 'https://code.jquery.com/jquery-3.6.0.min.js',
+}
+# CSS библиотек, из которого удаляются правила для неиспользуемых классов
+TREE_SHAKE = ('bootstrap.css', 'fontawesome.css')
+# Собственные файлы сайта (относительно папки static)
+LOCAL_ASSETS = {
+    'custom.css': 'css/custom.css',
+}
+# Классы, которые Bootstrap JS добавляет элементам во время работы
+SAFELIST = {
+    'show', 'showing', 'hide', 'hiding', 'fade', 'collapse', 'collapsing', 'collapsed', 'active',
+    'disabled', 'modal-open', 'modal-backdrop', 'modal-static', 'offcanvas-backdrop', 'dropdown-menu-end',
+    'tooltip', 'popover', 'bs-tooltip-auto', 'bs-popover-auto', 'tooltip-inner', 'tooltip-arrow',
+    'popover-arrow', 'popover-header', 'popover-body', 'was-validated', 'is-valid', 'is-invalid',
+    'carousel-item-next', 'carousel-item-prev', 'carousel-item-start', 'carousel-item-end',
+}
+COMPRESSIBLE = ('.css', '.js', '.svg', '.ttf', '.eot', '.json')
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+_URL_RE = re.compile(r'url\((["\']?)([^)"\']+)\1\)')
+_TOKEN_RE = re.compile(r'[A-Za-z0-9_-]+')
+_DYNAMIC_PREFIX_RE = re.compile(r'([A-Za-z0-9_-]+-)\{[{%]')
+_CLASS_RE = re.compile(r'\.(-?[_a-zA-Z][_a-zA-Z0-9-]*)')
+_NOT_RE = re.compile(r':not\([^()]*\)')
+_GLYPH_RE = re.compile(r'content:\s*"\\([0-9a-fA-F]{4,5})"')
+_COMMENT_RE = re.compile(r'/\*.*?\*/', re.DOTALL)
+
+
+# === Удаление неиспользуемых правил CSS ===
+
+def collect_used_classes(paths):
+    """Все слова из шаблонов и скриптов (заведомо больше, чем реальные классы) и префиксы
+    классов, собранных в шаблоне динамически (например alert-{{ category }})"""
+    tokens, prefixes = set(SAFELIST), set()
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            text = f.read()
+        tokens.update(_TOKEN_RE.findall(text))
+        prefixes.update(_DYNAMIC_PREFIX_RE.findall(text))
+    return tokens, tuple(prefixes)
+
+
+def _split_blocks(css):
+    """Разбивает CSS на верхнеуровневые блоки (prelude, body); body=None для @-правил без блока"""
+    blocks, i, n = [], 0, len(css)
+    while i < n:
+        start = i
+        while i < n and css[i] not in '{;':
+            if css[i] in '"\'':
+                i = css.index(css[i], i + 1)
+            i += 1
+        if i >= n:
+            break
+        prelude = css[start:i].strip()
+        if css[i] == ';':
+            blocks.append((prelude, None))
+            i += 1
+            continue
+        depth, body_start = 1, i + 1
+        i += 1
+        while i < n and depth:
+            if css[i] in '"\'':
+                i = css.index(css[i], i + 1)
+            elif css[i] == '{':
+                depth += 1
+            elif css[i] == '}':
+                depth -= 1
+            i += 1
+        blocks.append((prelude, css[body_start:i - 1]))
+    return blocks
+
+
+def _split_selectors(prelude):
+    parts, depth, start = [], 0, 0
+    for i, char in enumerate(prelude):
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            parts.append(prelude[start:i])
+            start = i + 1
+    parts.append(prelude[start:])
+    return parts
+
+
+def tree_shake_css(css, used, prefixes):
+    """Удаляет селекторы с классами, которых нет в шаблонах (лицензионные комментарии /*! */ сохраняются)"""
+    licenses = ''.join(re.findall(r'/\*!.*?\*/', css, re.DOTALL))
+    return licenses + _shake_blocks(_COMMENT_RE.sub('', css), used, prefixes)
+
+
+def _shake_blocks(css, used, prefixes):
+    def _class_used(name):
+        return name in used or name.startswith(prefixes)
+
+    out = []
+    for prelude, body in _split_blocks(css):
+        if body is None:
+            out.append(prelude + ';')
+        elif prelude.startswith(('@media', '@supports', '@layer', '@container')):
+            inner = _shake_blocks(body, used, prefixes)
+            if inner:
+                out.append(f'{prelude}{{{inner}}}')
+        elif prelude.startswith('@'):
+            out.append(f'{prelude}{{{body}}}')  # @font-face, @keyframes и т.п. оставляем
+        else:
+            kept = [selector for selector in _split_selectors(prelude)
+                    if all(_class_used(name) for name in _CLASS_RE.findall(_NOT_RE.sub('', selector)))]
+            if kept:
+                out.append(f'{",".join(kept)}{{{body}}}')
+    return ''.join(out)
+
+
+# === Сборка ===
+
+def _fetch(url, path):
+    # urllib.request тянет за собой http.client, email и ssl - нужен только при сборке
+    import urllib.request
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with urllib.request.urlopen(url, timeout=30) as response, open(path, 'wb') as f:
+        shutil.copyfileobj(response, f)
+
+
+def _write_hashed(dist_dir, name, data):
+    """Записывает файл с хэшем в имени и его сжатые варианты, возвращает новое имя"""
+    stem, ext = os.path.splitext(name)
+    hashed = f'{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}'
+    path = os.path.join(dist_dir, hashed)
+    with open(path, 'wb') as f:
+        f.write(data)
+    if ext in COMPRESSIBLE:
+        with open(f'{path}.gz', 'wb') as f:
+            f.write(gzip.compress(data, 9, mtime=0))
+        if brotli is not None:
+            with open(f'{path}.br', 'wb') as f:
+                f.write(brotli.compress(data, quality=11))
+    return hashed
+
+
+def _subset_font(data, codepoints, name):
+    # Для woff2 fontTools нужен модуль brotli
+    if font_subset is None or not codepoints or not name.endswith(('.woff2', '.ttf')):
+        return data
+    if name.endswith('.woff2') and brotli is None:
+        return data
+    options = font_subset.Options()
+    options.flavor = 'woff2' if name.endswith('.woff2') else None
+    font = font_subset.load_font(io.BytesIO(data), options)
+    subsetter = font_subset.Subsetter(options)
+    subsetter.populate(unicodes=codepoints)
+    subsetter.subset(font)
+    out = io.BytesIO()
+    font_subset.save_font(font, out, options)
+    return out.getvalue()
+
+
+def build_assets(app):
+    static_dir = app.static_folder
+    vendor_dir = app.config['ASSETS_VENDOR_DIR']
+    dist_dir = os.path.join(static_dir, 'dist')
+    shutil.rmtree(dist_dir, ignore_errors=True)
+    os.makedirs(dist_dir)
+
+    template_dir = os.path.join(app.root_path, app.template_folder)
+    sources = [os.path.join(template_dir, name) for name in os.listdir(template_dir) if name.endswith('.html')]
+    upload_dir = os.path.abspath(app.config['UPLOAD_FOLDER'])
+    for root, _, files in os.walk(static_dir):
+        if os.path.abspath(root).startswith((os.path.abspath(dist_dir), upload_dir)):
+            continue
+        sources += [os.path.join(root, name) for name in files if name.endswith('.js')]
+    used, prefixes = collect_used_classes(sources)
+
+    manifest = {}
+    for name, url in VENDOR_ASSETS.items():
+        vendor_path = os.path.join(vendor_dir, name)
+        if not os.path.exists(vendor_path):
+            click.echo(f'Загрузка {url}')
+            _fetch(url, vendor_path)
+        with open(vendor_path, 'rb') as f:
+            data = f.read()
+
+        if name.endswith('.css'):
+            css = data.decode('utf-8')
+            if name in TREE_SHAKE:
+                before = len(css)
+                css = tree_shake_css(css, used, prefixes)
+                click.echo(f'{name}: {before // 1024} КБ -> {len(css) // 1024} КБ')
+            codepoints = {int(code, 16) for code in _GLYPH_RE.findall(css)}
+
+            # Шрифты и картинки, на которые ссылается CSS, тоже копируются с хэшем в имени
+            def _replace_url(match):
+                ref = match.group(2)
+                if ref.startswith('data:'):
+                    return match.group(0)
+                clean_ref = ref.split('?')[0].split('#')[0]
+                ref_name = os.path.basename(clean_ref)
+                ref_vendor_path = os.path.join(vendor_dir, f'{os.path.splitext(name)[0]}_files', ref_name)
+                if not os.path.exists(ref_vendor_path):
+                    _fetch(urllib.parse.urljoin(url, clean_ref), ref_vendor_path)
+                with open(ref_vendor_path, 'rb') as f:
+                    ref_data = _subset_font(f.read(), codepoints, ref_name)
+                return f'url({_write_hashed(dist_dir, ref_name, ref_data)})'
+
+            data = _URL_RE.sub(_replace_url, css).encode('utf-8')
+        manifest[name] = _write_hashed(dist_dir, name, data)
+
+    for name, path in LOCAL_ASSETS.items():
+        with open(os.path.join(static_dir, path), 'rb') as f:
+            manifest[name] = _write_hashed(dist_dir, name, f.read())
+
+    with open(os.path.join(dist_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+# === Отдача ===
+
+def _load_manifest(app):
+    path = os.path.join(app.static_folder, 'dist', 'manifest.json')
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def asset_url(name):
+    """URL файла из сборки; пока сборки нет - CDN или обычная папка static"""
+    hashed = current_app.extensions['assets'].get(name)
+    if hashed:
+        return url_for('assets', filename=hashed)
+    if name in VENDOR_ASSETS:
+        return VENDOR_ASSETS[name]
+    return url_for('static', filename=LOCAL_ASSETS[name])
+
+
+def serve_asset(filename):
+    dist_dir = os.path.join(current_app.static_folder, 'dist')
+    path = os.path.join(dist_dir, filename)
+    if os.path.basename(filename) != filename or filename.endswith(('.gz', '.br')) \
+            or not os.path.isfile(path):
+        abort(404)
+
+    encoding = None
+    accepted = request.accept_encodings
+    for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if accepted[candidate] and os.path.isfile(path + suffix):
+            encoding = candidate
+            break
+
+    response = send_file(path + ('.br' if encoding == 'br' else '.gz' if encoding else ''),
+                         mimetype=_guess_mimetype(filename), conditional=True)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    return response
+
+
+def _guess_mimetype(filename):
+    return mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+
+def init_assets(app):
+    """Подключает asset_url() в шаблонах, маршрут /assets/ и команду flask build-assets"""
+    app.config.setdefault('ASSETS_VENDOR_DIR', 'vendor')
+    app.extensions['assets'] = _load_manifest(app)
+    app.jinja_env.globals['asset_url'] = asset_url
+    app.add_url_rule('/assets/<filename>', 'assets', serve_asset)
+
+    @app.cli.command('build-assets')
+    def build_assets_command():
+        """Собрать статические файлы в static/dist."""
+        manifest = build_assets(app)
+        app.extensions['assets'] = manifest
+        for name, hashed in manifest.items():
+            click.echo(f'{name} -> {hashed}')
@@ -1,13 +1,15 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
-from flask_login import login_user, logout_user, login_required, current_user
-from werkzeug.security import check_password_hash, generate_password_hash
+"""Регистрация, вход и выход"""
+from flask import Blueprint, current_app, flash, redirect, render_template, request, url_for
+from flask_login import login_required, login_user, logout_user
 
-# Импортируем db и модели из основного приложения
+from extensions import cache_versions, password_hasher, rate_limiter
 from models import db, User
+from password_hashing import HasherBusy
 
-# Создаем Blueprint для аутентификации
-auth_bp = Blueprint('auth', __name__, url_prefix='')
+auth_bp = Blueprint('auth', __name__)
 
+
+# Регистрация
 @auth_bp.route('/register', methods=['GET', 'POST'])
 def register():
     if request.method == 'POST':
@@ -22,16 +24,23 @@ def register():
             flash('Пользователь с таким email уже существует!', 'error')
             return redirect(url_for('auth.register'))
         
+        try:
+            password_hash = password_hasher.hash(password)
+        except HasherBusy:
+            flash('Сервер перегружен. Попробуйте через минуту.', 'error')
+            return render_template('register.html'), 503
+        
         # Создание нового пользователя (ученика)
         user = User(
             email=email,
             first_name=first_name,
             last_name=last_name,
             phone=phone,
-            is_teacher=False
+            is_teacher=False,
+            password_hash=password_hash
         )
-        user.set_password(password) # Этот метод определен в models.py
         db.session.add(user)
+        cache_versions.bump('users')
         db.session.commit()
         
         flash('Регистрация успешна! Теперь вы можете войти.', 'success')
@@ -39,23 +48,44 @@ def register():
     
     return render_template('register.html')
 
+# Вход
 @auth_bp.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         email = request.form['email']
         password = request.form['password']
+        
+        # Лимит попыток проверяется до дорогого хеширования
+        for key, limit in ((f'login:account:{email.strip().lower()}', 'LOGIN_LIMIT_ACCOUNT'),
+                           (f'login:ip:{request.remote_addr}', 'LOGIN_LIMIT_IP')):
+            retry_after = rate_limiter.hit(key, *current_app.config[limit])
+            if retry_after:
+                flash('Слишком много попыток входа. Попробуйте позже.', 'error')
+                return render_template('login.html'), 429, {'Retry-After': str(retry_after)}
+        
         user = User.query.filter_by(email=email).first()
+        valid = False
+        if user:
+            try:
+                valid, new_hash = password_hasher.verify(user.password_hash, password)
+            except HasherBusy:
+                flash('Сервер перегружен. Попробуйте через минуту.', 'error')
+                return render_template('login.html'), 503
         
-        if user and user.check_password(password): # Этот метод определен в models.py
+        if valid:
+            if new_hash:
+                # Хеш с устаревшими параметрами заменяем, пока знаем пароль
+                user.password_hash = new_hash
+                db.session.commit()
             login_user(user)
             flash('Вы успешно вошли в систему!', 'success')
-            # Перенаправляем на dashboard после входа
             return redirect(url_for('main.dashboard'))
         else:
             flash('Неверный email или пароль!', 'error')
     
     return render_template('login.html')
 
+# Выход
 @auth_bp.route('/logout')
 @login_required
 def logout():
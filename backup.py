@@ -1,31 +1,39 @@
-import sqlite3
+"""Резервное копирование базы и загруженных файлов: ZIP-архив, отправка на email, очистка старых копий.
+Импортируется только задачей планировщика (jobs.py) или запускается вручную: python backup.py"""
+import logging
 import os
+import shutil
+import smtplib
 import zipfile
 from datetime import datetime
-import smtplib
-from email.mime.multipart import MIMEMultipart
+from email import encoders
 from email.mime.base import MIMEBase
+from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
-from email import encoders
-import shutil
 
-def create_backup():
-    """Создание резервной копии базы данных"""
+logger = logging.getLogger(__name__)
+
+
+def backup_database():
+    """Функция резервного копирования"""
     try:
         # Создаем имя файла с датой
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         backup_filename = f"backup_{timestamp}"
         backup_path = f"backups/{backup_filename}"
         
+        # Создаем папку для резервных копий если её нет
+        os.makedirs('backups', exist_ok=True)
+        
         # Копируем базу данных
         if os.path.exists('english_teacher.db'):
             shutil.copy2('english_teacher.db', f"{backup_path}.db")
-            print(f"База данных скопирована: {backup_path}.db")
+            logger.info("База данных скопирована: %s.db", backup_path)
         
         # Копируем папку uploads
         if os.path.exists('static/uploads'):
             shutil.copytree('static/uploads', f"{backup_path}_uploads", dirs_exist_ok=True)
-            print(f"Папка uploads скопирована: {backup_path}_uploads")
+            logger.info("Папка uploads скопирована: %s_uploads", backup_path)
         
         # Создаем ZIP архив
         zip_filename = f"{backup_path}.zip"
@@ -33,7 +41,6 @@ def create_backup():
             # Добавляем базу данных
             if os.path.exists(f"{backup_path}.db"):
                 zipf.write(f"{backup_path}.db", f"{backup_filename}.db")
-            
             # Добавляем файлы из uploads
             if os.path.exists(f"{backup_path}_uploads"):
                 for root, dirs, files in os.walk(f"{backup_path}_uploads"):
@@ -48,33 +55,36 @@ def create_backup():
         if os.path.exists(f"{backup_path}_uploads"):
             shutil.rmtree(f"{backup_path}_uploads")
         
-        print(f"Резервная копия создана: {zip_filename}")
+        logger.info("Резервная копия создана: %s", zip_filename,
+                    extra={'size': os.path.getsize(zip_filename)})
         return zip_filename
-        
-    except Exception as e:
-        print(f"Ошибка при создании резервной копии: {e}")
+    except Exception:
+        logger.exception("Ошибка при создании резервной копии")
         return None
 
-def send_backup_email(backup_file, email_config):
+def send_backup_email(backup_file, recipient_email):
     """Отправка резервной копии на email"""
     try:
+        # Для тестирования - используйте свои данные
+        from_email = "your_email@gmail.com"  # Замените на ваш email
+        password = "your_app_password"       # Замените на пароль приложения
+        smtp_server = "smtp.gmail.com"
+        smtp_port = 587
+        
         # Создаем сообщение
         msg = MIMEMultipart()
-        msg['From'] = email_config['from_email']
-        msg['To'] = email_config['to_email']
+        msg['From'] = from_email
+        msg['To'] = recipient_email
         msg['Subject'] = f"Резервная копия сайта - {datetime.now().strftime('%d.%m.%Y %H:%M')}"
         
         # Текст сообщения
         body = f"""
         Здравствуйте!
-        
         Это автоматическая резервная копия сайта преподавателя английского языка.
         Дата создания: {datetime.now().strftime('%d.%m.%Y %H:%M:%S')}
-        
         В архиве содержатся:
         - База данных сайта
         - Все загруженные файлы (изображения, документы)
-        
         С уважением,
         Система резервного копирования
         """
@@ -85,7 +95,6 @@ def send_backup_email(backup_file, email_config):
             with open(backup_file, "rb") as attachment:
                 part = MIMEBase('application', 'octet-stream')
                 part.set_payload(attachment.read())
-            
             encoders.encode_base64(part)
             part.add_header(
                 'Content-Disposition',
@@ -94,26 +103,25 @@ def send_backup_email(backup_file, email_config):
             msg.attach(part)
         
         # Подключаемся к SMTP серверу и отправляем
-        server = smtplib.SMTP(email_config['smtp_server'], email_config['smtp_port'])
+        server = smtplib.SMTP(smtp_server, smtp_port)
         server.starttls()
-        server.login(email_config['from_email'], email_config['password'])
+        server.login(from_email, password)
         text = msg.as_string()
-        server.sendmail(email_config['from_email'], email_config['to_email'], text)
+        server.sendmail(from_email, recipient_email, text)
         server.quit()
         
-        print(f"Резервная копия отправлена на {email_config['to_email']}")
+        logger.info("Резервная копия отправлена на %s", recipient_email)
         return True
-        
-    except Exception as e:
-        print(f"Ошибка при отправке email: {e}")
+    except Exception:
+        logger.exception("Ошибка при отправке email")
         return False
 
 def cleanup_old_backups(max_backups=30):
-    """Удаление старых резервных копий (оставляем только последние 30)"""
+    """Удаление старых резервных копий"""
     try:
         if not os.path.exists('backups'):
             return
-            
+        
         # Получаем список всех файлов
         files = [f for f in os.listdir('backups') if f.endswith('.zip')]
         files.sort(key=lambda x: os.path.getctime(os.path.join('backups', x)), reverse=True)
@@ -121,38 +129,31 @@ def cleanup_old_backups(max_backups=30):
         # Удаляем старые файлы
         for file in files[max_backups:]:
             os.remove(os.path.join('backups', file))
-            print(f"Удалена старая резервная копия: {file}")
-            
-    except Exception as e:
-        print(f"Ошибка при очистке старых резервных копий: {e}")
+            logger.info("Удалена старая резервная копия: %s", file)
+    except Exception:
+        logger.exception("Ошибка при очистке старых резервных копий")
 
-def backup_and_send():
-    """Основная функция резервного копирования"""
-    print(f"Начинаем создание резервной копии: {datetime.now()}")
-    
-    # Конфигурация email (измените на свои данные)
-    email_config = {
-        'from_email': 'your_email@gmail.com',  # Ваш email
-        'to_email': 'recipient@gmail.com',     # Email получателя
-        'password': 'your_app_password',       # Пароль приложения
-        'smtp_server': 'smtp.gmail.com',
-        'smtp_port': 587
-    }
+def daily_backup():
+    """Ежедневное резервное копирование"""
+    logger.info("Начинаем ежедневное резервное копирование")
     
     # Создаем резервную копию
-    backup_file = create_backup()
-    
+    backup_file = backup_database()
     if backup_file:
-        # Отправляем на email
-        if send_backup_email(backup_file, email_config):
-            print("Резервная копия успешно создана и отправлена!")
+        # Отправляем на email преподавателя
+        recipient_email = "sal-olga@mail.ru"  # Email преподавателя
+        if send_backup_email(backup_file, recipient_email):
+            logger.info("Резервная копия успешно создана и отправлена")
         else:
-            print("Резервная копия создана, но не отправлена на email")
+            logger.warning("Резервная копия создана, но не отправлена на email")
         
         # Очищаем старые резервные копии
         cleanup_old_backups()
     else:
-        print("Ошибка при создании резервной копии")
+        # Исключение попадает в историю запусков задачи как failed
+        raise RuntimeError("Ошибка при создании резервной копии")
 
 if __name__ == "__main__":
-    backup_and_send()
+    # При ручном запуске JSON-логи приложения не настроены - сообщения выводятся как есть
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    daily_backup()
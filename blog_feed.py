@@ -0,0 +1,93 @@
+"""Atom-лента блога: собирается из кэша записей и пересобирается только при изменении блога"""
+import hashlib
+import threading
+from html import escape
+
+from flask import Response, request, url_for
+
+
+def _atom_date(value):
+    return value.replace(microsecond=0).isoformat() + 'Z'
+
+
+class BlogFeed:
+    """Лента из последних max_entries опубликованных постов.
+
+    Готовый XML хранится в памяти до смены версии 'blog'. При пересборке
+    фрагменты записей, чьи updated_at не изменились, берутся из кэша.
+    """
+
+    version_name = 'blog'
+
+    def __init__(self, db, model, versions, title, max_entries=20):
+        self.db = db
+        self.model = model
+        self.versions = versions
+        self.title = title
+        self.max_entries = max_entries
+        self._entries = {}        # id поста -> (updated_at, XML-фрагмент)
+        self._feed = (None, None)  # (версия, (xml, etag, last_modified))
+        self._lock = threading.Lock()
+
+    def _entry_xml(self, post, updated):
+        link = url_for('main.blog_post', post_id=post.id, _external=True)
+        summary = post.content[:500] + ('...' if len(post.content) > 500 else '')
+        return (
+            '<entry>'
+            f'<title>{escape(post.title)}</title>'
+            f'<link href="{escape(link)}"/>'
+            f'<id>{escape(link)}</id>'
+            f'<published>{_atom_date(post.created_at)}</published>'
+            f'<updated>{_atom_date(updated)}</updated>'
+            f'<summary>{escape(summary)}</summary>'
+            '</entry>'
+        )
+
+    def _build(self):
+        model = self.model
+        posts = (model.query.filter_by(is_published=True)
+                 .order_by(model.created_at.desc(), model.id.desc())
+                 .limit(self.max_entries).all())
+        entries = {}
+        fragments = []
+        for post in posts:
+            updated = post.updated_at or post.created_at
+            cached = self._entries.get(post.id)
+            if cached is None or cached[0] != updated:
+                cached = (updated, self._entry_xml(post, updated))
+            entries[post.id] = cached
+            fragments.append(cached[1])
+        self._entries = entries
+
+        last_modified = max((updated for updated, _ in entries.values()), default=None)
+        feed_url = url_for('main.blog_feed', _external=True)
+        xml = (
+            '<?xml version="1.0" encoding="utf-8"?>\n'
+            '<feed xmlns="http://www.w3.org/2005/Atom">'
+            f'<title>{escape(self.title)}</title>'
+            f'<link href="{escape(url_for("main.blog", _external=True))}"/>'
+            f'<link rel="self" href="{escape(feed_url)}"/>'
+            f'<id>{escape(feed_url)}</id>'
+            f'<updated>{_atom_date(last_modified) if last_modified else "1970-01-01T00:00:00Z"}</updated>'
+            + ''.join(fragments) +
+            '</feed>'
+        ).encode('utf-8')
+        return xml, hashlib.sha256(xml).hexdigest()[:32], last_modified
+
+    def response(self):
+        version = self.versions.current(self.version_name)
+        cached_version, feed = self._feed
+        if feed is None or cached_version != version:
+            with self._lock:
+                cached_version, feed = self._feed
+                if feed is None or cached_version != version:
+                    feed = self._build()
+                    self._feed = (version, feed)
+
+        xml, etag, last_modified = feed
+        response = Response(xml, mimetype='application/atom+xml')
+        response.set_etag(etag)
+        if last_modified:
+            response.last_modified = last_modified
+        response.headers['Cache-Control'] = 'public, max-age=300'
+        return response.make_conditional(request)
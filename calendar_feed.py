@@ -0,0 +1,222 @@
+"""Календари iCalendar (.ics) по секретным ссылкам: расписание и сроки домашних заданий"""
+import hashlib
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import pytz
+from flask import Response, request
+
+from recurrence import RecurrenceRule
+
+
+def _escape(text):
+    return (text or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\r\n', '\\n').replace('\n', '\\n')
+
+
+# Дальше этой даты таблицы pytz переходов не содержат
+_OPEN_END = datetime(2038, 1, 1)
+
+
+def _offset(delta):
+    minutes = int(delta.total_seconds()) // 60
+    sign = '-' if minutes < 0 else '+'
+    return f'{sign}{abs(minutes) // 60:02d}{abs(minutes) % 60:02d}'
+
+
+def _fold(line):
+    """Строки длиннее 75 октетов переносятся (RFC 5545, 3.1), не разрывая символы UTF-8"""
+    data = line.encode('utf-8')
+    if len(data) <= 75:
+        return line
+    parts = []
+    current = ''
+    limit = 75
+    for char in line:
+        if len((current + char).encode('utf-8')) > limit:
+            parts.append(current)
+            current = ''
+            limit = 74  # продолжение начинается с пробела
+        current += char
+    parts.append(current)
+    return '\r\n '.join(parts)
+
+
+class CalendarItem:
+    """Событие ленты. rrule и exdates - для серии повторяющихся занятий"""
+
+    __slots__ = ('uid', 'summary', 'start', 'end', 'description', 'rrule', 'exdates', 'stamp')
+
+    def __init__(self, uid, summary, start, end, description=None, rrule=None, exdates=(), stamp=None):
+        self.uid = uid
+        self.summary = summary
+        self.start = start
+        self.end = end
+        self.description = description
+        self.rrule = rrule
+        self.exdates = tuple(exdates)
+        self.stamp = stamp  # Время создания или изменения (DTSTAMP)
+
+    def fields(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+
+class CalendarFeeds:
+    """Готовые .ics ленты (вид, id) в памяти процесса.
+
+    Лента пересобирается только после смены версий schedule/homework/identity (состав групп).
+    Фрагменты VEVENT, чьи данные не изменились, берутся из кэша. Если после пересборки
+    содержимое ленты не изменилось, ETag и Last-Modified остаются прежними - календари,
+    опрашивающие ссылку, продолжают получать 304.
+    """
+
+    version_names = ('schedule', 'homework', 'identity')
+
+    def __init__(self, versions, loader, changed_at, timezone='Europe/Moscow', name='Расписание',
+                 max_feeds=1000, max_fragments=20000):
+        self.versions = versions
+        self.loader = loader          # (вид, id) -> (название, [CalendarItem]) или None
+        self.changed_at = changed_at  # () -> время последнего изменения версий (UTC)
+        self.timezone = pytz.timezone(timezone)
+        self.name = name
+        self.max_feeds = max_feeds
+        self.max_fragments = max_fragments
+        self._feeds = OrderedDict()      # (вид, id) -> (версии, (ics, etag, last_modified))
+        self._fragments = OrderedDict()  # uid -> (поля события, VEVENT)
+        self._lock = threading.Lock()
+
+    def _local(self, value):
+        return f';TZID={self.timezone.zone}:' + value.strftime('%Y%m%dT%H%M%S')
+
+    def _utc(self, value):
+        return pytz.utc.localize(value).strftime('%Y%m%dT%H%M%SZ')
+
+    def _vtimezone(self, first, last):
+        """VTIMEZONE для TZID событий (RFC 5545, 3.6.5): правила зоны, действующие с начала
+        первого до конца последнего события (для Europe/Moscow - одно STANDARD +0300)"""
+        zone = self.timezone
+        transitions = getattr(zone, '_utc_transition_times', None)
+        if transitions:
+            infos = zone._transition_info
+            low = max(bisect_right(transitions, first - infos[-1][0]) - 1, 0)
+            high = max(bisect_right(transitions, last - infos[-1][0]), low + 1)
+            observances = []
+            for index in range(low, high):
+                offset, dst, name = infos[index]
+                previous = infos[index - 1][0] if index else offset
+                start = transitions[index] + previous if index else datetime(1970, 1, 1)
+                observances.append((start, previous, offset, dst, name))
+        else:
+            offset = zone.utcoffset(first)
+            observances = [(datetime(1970, 1, 1), offset, offset, timedelta(0), zone.tzname(first))]
+
+        lines = ['BEGIN:VTIMEZONE', f'TZID:{zone.zone}']
+        for start, offset_from, offset_to, dst, name in observances:
+            kind = 'DAYLIGHT' if dst else 'STANDARD'
+            lines += [
+                f'BEGIN:{kind}',
+                f'DTSTART:{start.strftime("%Y%m%dT%H%M%S")}',
+                f'TZOFFSETFROM:{_offset(offset_from)}',
+                f'TZOFFSETTO:{_offset(offset_to)}',
+                f'TZNAME:{name}',
+                f'END:{kind}',
+            ]
+        lines.append('END:VTIMEZONE')
+        return '\r\n'.join(lines)
+
+    def _rrule(self, text):
+        rule = RecurrenceRule.parse(text)
+        if rule.until is None:
+            return str(rule)
+        # При DTSTART с TZID значение UNTIL должно быть в UTC
+        until = self.timezone.localize(rule.until).astimezone(pytz.utc).replace(tzinfo=None)
+        rule.until = None
+        return f'{rule};UNTIL={until.strftime("%Y%m%dT%H%M%SZ")}'
+
+    def _render(self, item):
+        lines = [
+            'BEGIN:VEVENT',
+            f'UID:{item.uid}',
+            f'DTSTAMP:{self._utc(item.stamp)}',
+            'DTSTART' + self._local(item.start),
+            'DTEND' + self._local(item.end),
+            f'SUMMARY:{_escape(item.summary)}',
+        ]
+        if item.description:
+            lines.append(f'DESCRIPTION:{_escape(item.description)}')
+        if item.rrule:
+            lines.append('RRULE:' + self._rrule(item.rrule))
+        for exdate in item.exdates:
+            lines.append('EXDATE' + self._local(exdate))
+        lines.append('END:VEVENT')
+        return '\r\n'.join(_fold(line) for line in lines)
+
+    def _fragment(self, item):
+        fields = item.fields()
+        with self._lock:
+            cached = self._fragments.get(item.uid)
+            if cached is not None and cached[0] == fields:
+                self._fragments.move_to_end(item.uid)
+                return cached[1]
+        fragment = self._render(item)
+        with self._lock:
+            self._fragments[item.uid] = (fields, fragment)
+            while len(self._fragments) > self.max_fragments:
+                self._fragments.popitem(last=False)
+        return fragment
+
+    def _build(self, kind, resource_id, previous):
+        loaded = self.loader(kind, resource_id)
+        if loaded is None:
+            return None
+        title, items = loaded
+        items = sorted(items, key=lambda item: (item.start, item.uid))
+        ics = '\r\n'.join([
+            'BEGIN:VCALENDAR',
+            'VERSION:2.0',
+            'PRODID:-//english-teacher//schedule//RU',
+            'CALSCALE:GREGORIAN',
+            'METHOD:PUBLISH',
+            _fold(f'X-WR-CALNAME:{_escape(f"{self.name}: {title}")}'),
+            f'X-WR-TIMEZONE:{self.timezone.zone}',
+            # Каждый TZID, на который ссылаются события, должен быть описан в календаре
+            self._vtimezone(
+                min((item.start for item in items), default=datetime.now()),
+                # Серия без UNTIL продолжается сколь угодно долго - нужны все будущие правила зоны
+                max((_OPEN_END if item.rrule else item.end for item in items), default=datetime.now()),
+            ),
+        ] + [self._fragment(item) for item in items] + ['END:VCALENDAR', '']).encode('utf-8')
+        etag = hashlib.sha256(ics).hexdigest()[:32]
+        if previous is not None and previous[1] == etag:
+            return previous
+        # Удаление события не оставляет следов в данных, поэтому время изменения ленты -
+        # время изменения версий (не раньше самого нового события)
+        last_modified = max([self.changed_at()] + [item.stamp for item in items])
+        return ics, etag, last_modified
+
+    def response(self, kind, resource_id):
+        versions = tuple(self.versions.current(name) for name in self.version_names)
+        key = (kind, resource_id)
+        with self._lock:
+            entry = self._feeds.get(key)
+            if entry is not None:
+                self._feeds.move_to_end(key)
+        if entry is None or entry[0] != versions:
+            feed = self._build(kind, resource_id, entry[1] if entry is not None else None)
+            if feed is None:
+                return None
+            entry = (versions, feed)
+            with self._lock:
+                self._feeds[key] = entry
+                self._feeds.move_to_end(key)
+                while len(self._feeds) > self.max_feeds:
+                    self._feeds.popitem(last=False)
+
+        ics, etag, last_modified = entry[1]
+        response = Response(ics, mimetype='text/calendar')
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        # Ссылка секретная: промежуточным кэшам хранить ее нельзя
+        response.headers['Cache-Control'] = 'private, max-age=300'
+        return response.make_conditional(request)
@@ -0,0 +1,106 @@
+"""Чат преподавателя и учеников"""
+import os
+from datetime import datetime
+
+from flask import Blueprint, current_app, jsonify, render_template, request
+from flask_login import current_user, login_required
+
+from models import db, ChatFile, Message, User
+
+chat_bp = Blueprint('chat', __name__)
+
+
+# Чат
+@chat_bp.route('/chat')
+@login_required
+def chat():
+    # Получаем все чаты пользователя (где он отправитель или получатель)
+    sent_chats = db.session.query(User).join(Message, Message.recipient_id == User.id).filter(Message.sender_id == current_user.id).distinct().all()
+    received_chats = db.session.query(User).join(Message, Message.sender_id == User.id).filter(Message.recipient_id == current_user.id).distinct().all()
+    
+    # Объединяем и убираем дубликаты
+    all_chats = list(set(sent_chats + received_chats))
+    
+    # Получаем количество непрочитанных сообщений для каждого чата
+    unread_counts = {}
+    for chat_user in all_chats:
+        unread_count = Message.query.filter(
+            Message.sender_id == chat_user.id,
+            Message.recipient_id == current_user.id,
+            Message.is_read == False
+        ).count()
+        unread_counts[chat_user.id] = unread_count
+    
+    return render_template('chat.html', chats=all_chats, unread_counts=unread_counts)
+
+# Чат с конкретным пользователем
+@chat_bp.route('/chat/<int:user_id>')
+@login_required
+def chat_with_user(user_id):
+    user = User.query.get_or_404(user_id)
+    
+    # Получаем сообщения между текущим пользователем и выбранным пользователем
+    messages = Message.query.filter(
+        ((Message.sender_id == current_user.id) & (Message.recipient_id == user_id)) |
+        ((Message.sender_id == user_id) & (Message.recipient_id == current_user.id))
+    ).order_by(Message.created_at.asc()).all()
+    
+    # Помечаем сообщения как прочитанные
+    for message in messages:
+        if message.recipient_id == current_user.id and not message.is_read:
+            message.is_read = True
+    db.session.commit()
+    
+    return render_template('chat_room.html', user=user, messages=messages)
+
+# Отправка сообщения
+@chat_bp.route('/chat/send', methods=['POST'])
+@login_required
+def send_message():
+    recipient_id = request.form.get('recipient_id')
+    content = request.form.get('content')
+    
+    if not recipient_id:
+        return jsonify({'error': 'Получатель обязателен'}), 400
+    
+    # Создаем сообщение
+    message = Message(
+        sender_id=current_user.id,
+        recipient_id=recipient_id,
+        content=content or ''  # Может быть пустым, если отправляем только файл
+    )
+    db.session.add(message)
+    db.session.flush()  # Получаем ID сообщения
+    
+    # Обработка загрузки файлов
+    if 'files' in request.files:
+        files = request.files.getlist('files')
+        for file in files:
+            if file and file.filename != '':
+                # Определяем тип файла
+                if file.filename.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.webp')):
+                    file_type = 'image'
+                elif file.filename.lower().endswith(('.pdf', '.doc', '.docx', '.txt', '.xls', '.xlsx')):
+                    file_type = 'document'
+                else:
+                    file_type = 'other'
+                
+                # Создаем уникальное имя файла
+                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+                filename = f"chat_{timestamp}_{file.filename}"
+                file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
+                
+                # Сохраняем файл
+                file.save(file_path)
+                
+                # Создаем запись в базе данных
+                chat_file = ChatFile(
+                    message_id=message.id,
+                    filename=file.filename,
+                    file_path=f"uploads/{filename}",
+                    file_type=file_type
+                )
+                db.session.add(chat_file)
+    
+    db.session.commit()
+    return jsonify({'success': 'Сообщение отправлено', 'message': message.to_dict()})
@@ -0,0 +1,177 @@
+"""Сжатие ответов на лету (brotli, gzip) с учетом Accept-Encoding"""
+import itertools
+import zlib
+
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_accept_header
+
+try:
+    import brotli
+except ImportError:  # brotli необязателен: без него используется только gzip
+    brotli = None
+
+# Сжимаем только текстовые форматы; JPEG, PNG, ZIP, PDF и т.п. уже сжаты
+COMPRESSIBLE_TYPES = (
+    'text/',
+    'application/json',
+    'application/javascript',
+    'application/xml',
+    'application/atom+xml',
+    'application/rss+xml',
+    'image/svg+xml',
+)
+
+
+class _GzipEncoder:
+    def __init__(self, level):
+        # wbits=31 - формат gzip (заголовок и контрольная сумма)
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, chunk):
+        # Z_SYNC_FLUSH, чтобы каждый кусок потокового ответа сразу уходил клиенту
+        return self._compressor.compress(chunk) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class _BrotliEncoder:
+    def __init__(self, quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, chunk):
+        return self._compressor.process(chunk) + self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+class CompressionMiddleware:
+    def __init__(self, wsgi_app, min_size=500, gzip_level=6, brotli_quality=5):
+        self.wsgi_app = wsgi_app
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def _choose_encoding(self, environ):
+        accept = parse_accept_header(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        if brotli is not None and accept['br']:
+            return 'br'
+        if accept['gzip']:
+            return 'gzip'
+        return None
+
+    def _encoder(self, encoding):
+        if encoding == 'br':
+            return _BrotliEncoder(self.brotli_quality)
+        return _GzipEncoder(self.gzip_level)
+
+    def __call__(self, environ, start_response):
+        encoding = self._choose_encoding(environ)
+        if environ.get('REQUEST_METHOD') == 'HEAD':
+            encoding = None
+        captured = {}
+
+        def _start_response(status, headers, exc_info=None):
+            captured['status'] = status
+            captured['headers'] = headers
+            captured['exc_info'] = exc_info
+            # Заголовки отправим сами, когда решим, сжимать ли ответ
+            return _no_write
+
+        app_iter = self.wsgi_app(environ, _start_response)
+        return _CompressingIterator(self, app_iter, captured, start_response, encoding)
+
+
+def _no_write(data):
+    raise RuntimeError('CompressionMiddleware не поддерживает write() из start_response')
+
+
+class _CompressingIterator:
+    def __init__(self, middleware, app_iter, captured, start_response, encoding):
+        self.middleware = middleware
+        self.app_iter = app_iter
+        self.captured = captured
+        self.start_response = start_response
+        self.encoding = encoding
+
+    def _compressible(self, headers):
+        status_code = int(self.captured['status'][:3])
+        if status_code < 200 or status_code in (204, 206, 304):
+            return False
+        content_type = headers.get('Content-Type', '')
+        if not content_type.startswith(COMPRESSIBLE_TYPES):
+            return False
+        if 'Content-Encoding' in headers or 'no-transform' in headers.get('Cache-Control', ''):
+            return False
+        return True
+
+    def __iter__(self):
+        iterator = iter(self.app_iter)
+        if 'status' not in self.captured:
+            # Приложение вызывает start_response только при первой итерации
+            first = next(iterator, b'')
+            iterator = itertools.chain([first], iterator)
+        headers = Headers(self.captured['headers'])
+        compressible = self._compressible(headers)
+
+        if compressible:
+            vary = headers.get('Vary')
+            if not vary:
+                headers['Vary'] = 'Accept-Encoding'
+            elif 'accept-encoding' not in vary.lower():
+                headers['Vary'] = f'{vary}, Accept-Encoding'
+
+        content_length = headers.get('Content-Length')
+        too_small = content_length is not None and int(content_length) < self.middleware.min_size
+        if not compressible or self.encoding is None or too_small:
+            self.start_response(self.captured['status'], headers.to_wsgi_list(), self.captured['exc_info'])
+            yield from iterator
+            return
+
+        # Длина неизвестна (потоковый ответ): копим начало, пока не станет ясно, стоит ли сжимать
+        buffered, size = [], 0
+        for chunk in iterator:
+            buffered.append(chunk)
+            size += len(chunk)
+            if size >= self.middleware.min_size:
+                break
+        else:
+            self.start_response(self.captured['status'], headers.to_wsgi_list(), self.captured['exc_info'])
+            yield from buffered
+            return
+
+        headers['Content-Encoding'] = self.encoding
+        headers.remove('Content-Length')
+        etag = headers.get('ETag')
+        if etag and not etag.startswith('W/'):
+            # Сжатое представление не побайтово равно исходному - ETag становится слабым
+            headers['ETag'] = f'W/{etag}'
+        self.start_response(self.captured['status'], headers.to_wsgi_list(), self.captured['exc_info'])
+
+        encoder = self.middleware._encoder(self.encoding)
+        data = encoder.compress(b''.join(buffered))
+        if data:
+            yield data
+        for chunk in iterator:
+            data = encoder.compress(chunk)
+            if data:
+                yield data
+        yield encoder.finish()
+
+    def close(self):
+        if hasattr(self.app_iter, 'close'):
+            self.app_iter.close()
+
+
+def init_compression(app):
+    """Подключает сжатие ответов"""
+    app.config.setdefault('COMPRESS_MIN_SIZE', 500)
+    app.config.setdefault('COMPRESS_GZIP_LEVEL', 6)
+    app.config.setdefault('COMPRESS_BROTLI_QUALITY', 5)
+    app.wsgi_app = CompressionMiddleware(
+        app.wsgi_app,
+        app.config['COMPRESS_MIN_SIZE'],
+        app.config['COMPRESS_GZIP_LEVEL'],
+        app.config['COMPRESS_BROTLI_QUALITY'],
+    )
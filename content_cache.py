@@ -0,0 +1,84 @@
+"""Кэш контента сайта (SiteContent) в памяти процесса со сбросом по версии в БД"""
+import threading
+import time
+from types import MappingProxyType
+
+from sqlalchemy.exc import OperationalError
+
+
+class CacheVersions:
+    """Счетчики версий кэшей, хранящиеся в БД и общие для всех воркеров.
+
+    Версии читаются одним запросом не чаще раза в check_interval секунд,
+    поэтому изменения из другого воркера становятся видны с такой задержкой.
+    """
+
+    def __init__(self, db, model, check_interval=5.0):
+        self.db = db
+        self.model = model
+        self.check_interval = check_interval
+        self._versions = MappingProxyType({})
+        self._checked_at = 0.0
+
+    def current(self, name, refresh=False):
+        """refresh=True - прочитать версии из БД сейчас, не дожидаясь интервала"""
+        if refresh or time.monotonic() - self._checked_at > self.check_interval:
+            try:
+                rows = self.db.session.query(self.model.name, self.model.version).all()
+            except OperationalError:
+                # Таблица еще не создана - считаем, что версия не менялась
+                self.db.session.rollback()
+                rows = []
+            self._versions = MappingProxyType(dict(rows))
+            self._checked_at = time.monotonic()
+        return self._versions.get(name, 0)
+
+    def bump(self, *names):
+        """Увеличивает версии в текущей транзакции (commit выполняет вызывающий код)"""
+        table = self.model.__table__
+        for name in names:
+            result = self.db.session.execute(
+                table.update()
+                .where(table.c.name == name)
+                .values(version=table.c.version + 1, updated_at=self.db.func.now())
+            )
+            if result.rowcount == 0:
+                self.db.session.add(self.model(name=name, version=1))
+        # Этот воркер должен увидеть новую версию сразу, не дожидаясь интервала
+        self._checked_at = 0.0
+
+
+class SiteContentCache:
+    """Весь SiteContent одним запросом в неизменяемом словаре (page, section, key) -> value"""
+
+    version_name = 'site_content'
+
+    def __init__(self, db, model, versions):
+        self.db = db
+        self.model = model
+        self.versions = versions
+        self._state = (None, None)  # (версия, снимок)
+        self._lock = threading.Lock()
+
+    def snapshot(self):
+        version = self.versions.current(self.version_name)
+        cached_version, snapshot = self._state
+        if snapshot is not None and cached_version == version:
+            return snapshot
+        with self._lock:
+            cached_version, snapshot = self._state
+            if snapshot is None or cached_version != version:
+                model = self.model
+                rows = self.db.session.query(
+                    model.page_name, model.section_name, model.content_key, model.content_value
+                ).all()
+                snapshot = MappingProxyType({(page, section, key): value for page, section, key, value in rows})
+                self._state = (version, snapshot)
+        return snapshot
+
+    def get(self, page_name, section_name, content_key, default_value=''):
+        return self.snapshot().get((page_name, section_name, content_key), default_value)
+
+    def invalidate(self):
+        """Сбрасывает кэш во всех воркерах (в текущей транзакции)"""
+        self.versions.bump(self.version_name)
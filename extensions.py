@@ -0,0 +1,135 @@
+"""Общие объекты приложения: менеджер входа и кэши/сервисы, которые create_app создает из конфигурации.
+
+Модули маршрутов импортируют отсюда прокси: объект каждого приложения лежит в app.extensions
+и находится через current_app, поэтому импорт модуля ничего не создает и не читает настроек.
+"""
+import atexit
+from datetime import timedelta
+from functools import wraps
+
+from flask import current_app
+from flask_login import LoginManager
+from werkzeug.local import LocalProxy
+
+from blog_feed import BlogFeed
+from calendar_feed import CalendarFeeds
+from content_cache import CacheVersions, SiteContentCache
+from group_membership import GroupMembership
+from identity import IdentityCache
+from listing import ApproximateCounter, Listing
+from models import db, Application, BlogPost, CacheVersion, GroupMember, SiteContent, User
+from page_cache import PageCache
+from password_hashing import PasswordHasher
+from rate_limit import BatchWriter, MemoryBucketStore, RateLimiter, SQLiteBucketStore
+from recurrence import OccurrenceCache
+from schedule_conflicts import ScheduleIndex
+
+login_manager = LoginManager()
+login_manager.login_view = 'auth.login'
+login_manager.login_message = 'Пожалуйста, войдите для доступа к этой странице.'
+
+
+def _extension(name):
+    return LocalProxy(lambda: current_app.extensions[name])
+
+
+cache_versions = _extension('cache_versions')
+site_content_cache = _extension('site_content_cache')
+identity_cache = _extension('identity_cache')
+page_cache = _extension('page_cache')
+blog_feed_cache = _extension('blog_feed_cache')
+group_membership = _extension('group_membership')
+occurrence_cache = _extension('occurrence_cache')
+calendar_feeds = _extension('calendar_feeds')
+schedule_index = _extension('schedule_index')
+rate_limiter = _extension('rate_limiter')
+application_writer = _extension('application_writer')
+password_hasher = _extension('password_hasher')
+admin_counter = _extension('admin_counter')
+users_listing = _extension('users_listing')
+students_listing = _extension('students_listing')
+applications_listing = _extension('applications_listing')
+
+USER_SORTS = {
+    'created': (User.created_at, 'desc'),
+    'name': (User.last_name, 'asc'),
+}
+
+
+# current_user - неизменяемый снимок из identity_cache (без запроса к БД, пока снимок свежий)
+@login_manager.user_loader
+def load_user(user_id):
+    return identity_cache.get(int(user_id))
+
+
+# Декоратор маршрута для page_cache: кэш берется из текущего приложения в момент запроса.
+# query - параметры запроса, которые читает маршрут (остальные на ключ кэша не влияют)
+def cached_page(*dependencies, query=()):
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            return page_cache.serve(dependencies, view, args, kwargs, query)
+        return wrapper
+    return decorator
+
+
+# Создание кэшей и сервисов по app.config (вызывается из create_app после установки настроек)
+def init_extensions(app):
+    # Загрузчики лент и индекса живут в модуле маршрутов расписания, который сам импортирует extensions
+    import schedule
+
+    config = app.config
+    versions = CacheVersions(db, CacheVersion, config['CACHE_VERSION_CHECK_INTERVAL'])
+    counter = ApproximateCounter(versions, config['ADMIN_COUNT_TTL'])
+    writer = BatchWriter(app, db, Application.__table__, config['APPLICATION_FLUSH_INTERVAL'])
+    atexit.register(writer.flush)
+    hasher = PasswordHasher(
+        config['PASSWORD_HASH_METHOD'],
+        config['PASSWORD_HASH_WORKERS'],
+        config['PASSWORD_HASH_QUEUE'],
+        config['PASSWORD_HASH_TIMEOUT']
+    )
+    atexit.register(hasher.shutdown)
+
+    app.extensions.update({
+        'cache_versions': versions,
+        'site_content_cache': SiteContentCache(db, SiteContent, versions),
+        'identity_cache': IdentityCache(db, User, GroupMember, versions,
+                                        config['IDENTITY_CACHE_TTL'], config['IDENTITY_CACHE_SIZE']),
+        'page_cache': PageCache(versions, config['PAGE_CACHE_MAX_ENTRIES'], config['PAGE_CACHE_DIR'],
+                                config['PAGE_CACHE_DISK_MAX_FILES']),
+        'blog_feed_cache': BlogFeed(db, BlogPost, versions, 'Блог - Саликова О.А.'),
+        'group_membership': GroupMembership(db, User, GroupMember),
+        'occurrence_cache': OccurrenceCache(versions, config['SCHEDULE_CACHE_WINDOWS']),
+        'calendar_feeds': CalendarFeeds(versions, schedule.calendar_feed_items, schedule.calendar_feeds_changed_at,
+                                        config['CALENDAR_TIMEZONE'], 'Английский язык',
+                                        config['CALENDAR_FEED_CACHE_SIZE']),
+        'schedule_index': ScheduleIndex(versions, schedule.schedule_index_events,
+                                        timedelta(days=config['SCHEDULE_CONFLICT_HORIZON_DAYS'])),
+        'rate_limiter': RateLimiter(
+            SQLiteBucketStore(config['RATE_LIMIT_DB']) if config['RATE_LIMIT_DB'] else MemoryBucketStore()
+        ),
+        'application_writer': writer,
+        'password_hasher': hasher,
+        'admin_counter': counter,
+        'users_listing': Listing(
+            'users', User, USER_SORTS, 'created',
+            filters={'role': (User.is_teacher, {'student': False, 'teacher': True})},
+            date_column=User.created_at,
+            per_page=config['ADMIN_LIST_PER_PAGE'],
+            counter=counter, dependencies=('users',)
+        ),
+        'students_listing': Listing(
+            'students', User, USER_SORTS, 'name',
+            date_column=User.created_at,
+            per_page=config['ADMIN_LIST_PER_PAGE'],
+            counter=counter, dependencies=('users',)
+        ),
+        'applications_listing': Listing(
+            'applications', Application, {'created': (Application.created_at, 'desc')}, 'created',
+            filters={'status': (Application.status, {status: status for status in ('new', 'contacted', 'processed')})},
+            date_column=Application.created_at,
+            per_page=config['ADMIN_LIST_PER_PAGE'],
+            counter=counter, dependencies=('applications',)
+        ),
+    })
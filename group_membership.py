@@ -0,0 +1,117 @@
+"""Массовое управление составом групп: добавление, удаление и перевод учеников набором запросов"""
+import csv
+import importlib
+import io
+
+from sqlalchemy import delete, func, or_, select
+
+# Строк в одном INSERT: старые SQLite ограничивают запрос 999 параметрами
+INSERT_BATCH_SIZE = 400
+
+
+def parse_emails(text):
+    """Email-адреса из вставленного CSV/списка (любые разделители: запятая, точка с запятой, перевод строки).
+    Возвращает (адреса без повторов, строки, не похожие на email)"""
+    emails, invalid, seen = [], [], set()
+    sample = text[:1024]
+    delimiter = ';' if sample.count(';') > sample.count(',') else ','
+    for row in csv.reader(io.StringIO(text), delimiter=delimiter):
+        for cell in row:
+            value = cell.strip().strip('<>')
+            if not value:
+                continue
+            if '@' not in value or ' ' in value:
+                # Заголовки столбцов и имена в таблице - не ошибка, если в строке есть адрес
+                if not any('@' in other for other in row):
+                    invalid.append(value)
+                continue
+            if value.lower() not in seen:
+                seen.add(value.lower())
+                emails.append(value)
+    return emails, invalid
+
+
+class GroupMembership:
+    """Операции над GroupMember. Все ученики проверяются одним IN-запросом,
+    вставка идет одним INSERT ... ON CONFLICT DO NOTHING по unique_group_member.
+    commit выполняет вызывающий код."""
+
+    def __init__(self, db, user_model, member_model):
+        self.db = db
+        self.user_model = user_model
+        self.member_model = member_model
+
+    def resolve_students(self, student_ids=(), emails=()):
+        """Находит учеников по id и email одним запросом.
+        Возвращает (id найденных учеников, не найденные id и email)"""
+        user = self.user_model
+        ids = set()
+        for value in student_ids:
+            try:
+                ids.add(int(value))
+            except (TypeError, ValueError):
+                pass
+        emails = list(dict.fromkeys(email.strip().lower() for email in emails if email.strip()))
+        if not ids and not emails:
+            return [], []
+
+        conditions = []
+        if ids:
+            conditions.append(user.id.in_(ids))
+        if emails:
+            # Адреса в базе хранятся как введены при регистрации - сравниваем без учета регистра
+            # (по индексу ix_user_email_lower)
+            conditions.append(func.lower(user.email).in_(emails))
+        rows = self.db.session.execute(
+            select(user.id, user.email).where(user.is_teacher == False, or_(*conditions))
+        ).all()
+
+        found_ids = {row.id for row in rows}
+        found_emails = {row.email.lower() for row in rows}
+        by_email = [row.id for row in rows if row.email.lower() in emails]
+        missing = [str(value) for value in sorted(ids - found_ids)]
+        missing += [email for email in emails if email not in found_emails]
+        # Порядок: сначала выбранные галочками, потом из списка email, без повторов
+        resolved = sorted(found_ids & ids) + [user_id for user_id in by_email if user_id not in ids]
+        return list(dict.fromkeys(resolved)), missing
+
+    def existing(self, group_id, user_ids):
+        member = self.member_model
+        if not user_ids:
+            return set()
+        return set(self.db.session.execute(
+            select(member.user_id).where(member.group_id == group_id, member.user_id.in_(user_ids))
+        ).scalars())
+
+    def add(self, group_id, user_ids):
+        """Добавляет учеников в группу. Возвращает (добавлено, уже были в группе)"""
+        already = self.existing(group_id, user_ids)
+        new_ids = [user_id for user_id in user_ids if user_id not in already]
+        # Модуль диалекта (sqlite, postgresql) импортируется при первой вставке: диалект PostgreSQL
+        # вместе с asyncpg заметно удлиняет запуск, а нужен только на PostgreSQL
+        insert = importlib.import_module(f'sqlalchemy.dialects.{self.db.engine.dialect.name}').insert
+        for start in range(0, len(new_ids), INSERT_BATCH_SIZE):
+            statement = insert(self.member_model.__table__).values(
+                [{'group_id': group_id, 'user_id': user_id} for user_id in new_ids[start:start + INSERT_BATCH_SIZE]]
+            ).on_conflict_do_nothing(index_elements=['group_id', 'user_id'])
+            self.db.session.execute(statement)
+        return len(new_ids), len(already)
+
+    def remove(self, group_id, user_ids):
+        """Удаляет учеников из группы одним DELETE. Возвращает число удаленных"""
+        if not user_ids:
+            return 0
+        member = self.member_model
+        result = self.db.session.execute(
+            delete(member).where(member.group_id == group_id, member.user_id.in_(user_ids))
+        )
+        return result.rowcount
+
+    def move(self, from_group_id, to_group_id, user_ids):
+        """Переводит учеников из одной группы в другую. Переводятся только состоящие в исходной группе.
+        Возвращает (добавлено, уже были, удалено, не состояли в исходной группе)"""
+        members = self.existing(from_group_id, user_ids)
+        moving = [user_id for user_id in user_ids if user_id in members]
+        added, already = self.add(to_group_id, moving)
+        removed = self.remove(from_group_id, moving)
+        return added, already, removed, len(user_ids) - len(moving)
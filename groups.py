@@ -0,0 +1,253 @@
+"""Группы учеников: управление составом (преподаватель) и вкладка группы ученика"""
+import sqlalchemy
+from flask import Blueprint, current_app, flash, jsonify, redirect, render_template, request, url_for
+from flask_login import current_user, login_required
+from sqlalchemy.orm import contains_eager
+
+from extensions import group_membership, identity_cache
+from group_membership import parse_emails
+from models import db, Group, GroupMember, User
+from schedule import calendar_feed_url
+
+groups_bp = Blueprint('groups', __name__)
+
+
+# Массовое изменение состава группы: action - 'add', 'remove' или 'move' (в target_group_id).
+# Ученики задаются списком id и/или вставленным списком email (CSV)
+def change_group_members(group_id, action, student_ids=(), emails_text='', target_group_id=None):
+    emails, invalid = parse_emails(emails_text or '')
+    if len(student_ids) + len(emails) > current_app.config['GROUP_BULK_MAX_STUDENTS']:
+        raise ValueError(f"Не больше {current_app.config['GROUP_BULK_MAX_STUDENTS']} учеников за один раз")
+
+    user_ids, not_found = group_membership.resolve_students(student_ids, emails)
+    summary = {
+        'action': action,
+        'group_id': group_id,
+        'students': len(user_ids),
+        'added': 0,
+        'already_member': 0,
+        'removed': 0,
+        'not_in_group': 0,
+        'not_found': not_found,
+        'invalid': invalid
+    }
+    if action == 'add':
+        summary['added'], summary['already_member'] = group_membership.add(group_id, user_ids)
+    elif action == 'remove':
+        summary['removed'] = group_membership.remove(group_id, user_ids)
+    elif action == 'move':
+        summary['target_group_id'] = target_group_id
+        (summary['added'], summary['already_member'], summary['removed'],
+         summary['not_in_group']) = group_membership.move(group_id, target_group_id, user_ids)
+    if user_ids:
+        identity_cache.invalidate(*user_ids)
+    db.session.commit()
+    return summary
+
+# Текст flash-сообщения по итогам change_group_members
+def group_members_message(summary):
+    parts = []
+    if summary['added']:
+        parts.append(f"добавлено: {summary['added']}")
+    if summary['already_member']:
+        parts.append(f"уже были в группе: {summary['already_member']}")
+    if summary['removed']:
+        parts.append(f"удалено из группы: {summary['removed']}")
+    if summary['not_in_group']:
+        parts.append(f"пропущены, не состояли в исходной группе: {summary['not_in_group']}")
+    if summary['not_found']:
+        parts.append('не найдены среди учеников: ' + ', '.join(summary['not_found'][:10])
+                     + (' ...' if len(summary['not_found']) > 10 else ''))
+    if summary['invalid']:
+        parts.append('не похожи на email: ' + ', '.join(summary['invalid'][:10])
+                     + (' ...' if len(summary['invalid']) > 10 else ''))
+    return 'Состав группы: ' + ('; '.join(parts) if parts else 'изменений нет')
+
+# Группы (админ)
+@groups_bp.route('/admin/groups')
+@login_required
+def admin_groups():
+    if not current_user.is_teacher:
+        flash('Доступ запрещен!', 'error')
+        return redirect(url_for('main.dashboard'))
+    
+    # Получаем все группы с количеством участников
+    groups = db.session.query(
+        Group,
+        db.func.count(GroupMember.id).label('member_count')
+    ).outerjoin(GroupMember).group_by(Group.id).all()
+    
+    return render_template('admin_groups.html', groups=groups)
+
+# Создание группы
+@groups_bp.route('/admin/groups/create', methods=['POST'])
+@login_required
+def create_group():
+    if not current_user.is_teacher:
+        flash('Доступ запрещен!', 'error')
+        return redirect(url_for('main.dashboard'))
+    
+    name = request.form.get('name')
+    description = request.form.get('description')
+    is_individual = request.form.get('is_individual') == 'on'
+    
+    if not name:
+        flash('Название группы обязательно!', 'error')
+        return redirect(url_for('groups.admin_groups'))
+    
+    group = Group(
+        name=name,
+        description=description,
+        is_individual=is_individual,
+        created_by=current_user.id
+    )
+    db.session.add(group)
+    db.session.commit()
+    
+    flash('Группа успешно создана!', 'success')
+    return redirect(url_for('groups.admin_groups'))
+
+# Удаление участника из группы
+@groups_bp.route('/admin/groups/<int:group_id>/remove_member/<int:member_id>')
+@login_required
+def remove_group_member(group_id, member_id):
+    if not current_user.is_teacher:
+        flash('Доступ запрещен!', 'error')
+        return redirect(url_for('main.dashboard'))
+    
+    member = GroupMember.query.get_or_404(member_id)
+    if member.group_id != group_id:
+        flash('Ошибка: участник не принадлежит этой группе!', 'error')
+        return redirect(url_for('groups.admin_groups'))
+    
+    db.session.delete(member)
+    identity_cache.invalidate(member.user_id)
+    db.session.commit()
+    
+    flash('Участник успешно удален из группы!', 'success')
+    return redirect(url_for('groups.admin_groups'))
+
+# Массовое изменение состава группы: добавление, удаление, перевод в другую группу.
+# Принимает форму или JSON {"action", "student_ids", "emails", "target_group_id"}
+@groups_bp.route('/admin/groups/<int:group_id>/members', methods=['POST'])
+@login_required
+def bulk_group_members(group_id):
+    if not current_user.is_teacher:
+        if request.is_json:
+            return jsonify({'error': 'Доступ запрещен'}), 403
+        flash('Доступ запрещен!', 'error')
+        return redirect(url_for('main.dashboard'))
+    
+    group = Group.query.get_or_404(group_id)
+    if request.is_json:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Ожидается JSON-объект'}), 400
+        student_ids = data.get('student_ids') or []
+        emails = data.get('emails') or ''
+        if isinstance(emails, list):
+            emails = '\n'.join(str(email) for email in emails)
+        action = data.get('action', 'add')
+        try:
+            target_group_id = int(data['target_group_id']) if data.get('target_group_id') is not None else None
+        except (TypeError, ValueError):
+            target_group_id = None
+    else:
+        student_ids = request.form.getlist('student_ids')
+        emails = request.form.get('emails', '')
+        action = request.form.get('action', 'add')
+        target_group_id = request.form.get('target_group_id', type=int)
+    
+    error = None
+    if action not in ('add', 'remove', 'move'):
+        error = 'Неизвестное действие'
+    elif not isinstance(student_ids, list) or not isinstance(emails, str):
+        error = 'Неверный формат списка учеников'
+    elif action == 'move':
+        target = db.session.get(Group, target_group_id) if target_group_id else None
+        if not target or target.id == group.id:
+            error = 'Выберите другую группу для перевода'
+    if error is None:
+        try:
+            summary = change_group_members(group.id, action, student_ids, emails, target_group_id)
+        except ValueError as e:
+            error = str(e)
+    
+    if request.is_json:
+        if error:
+            return jsonify({'error': error}), 400
+        return jsonify(summary)
+    if error:
+        flash(error, 'error')
+    else:
+        flash(group_members_message(summary), 'success' if summary['students'] else 'error')
+    return redirect(url_for('groups.view_group', group_id=group.id))
+
+# Просмотр группы
+@groups_bp.route('/admin/groups/<int:group_id>')
+@login_required
+def view_group(group_id):
+    if not current_user.is_teacher:
+        flash('Доступ запрещен!', 'error')
+        return redirect(url_for('main.dashboard'))
+    
+    group = Group.query.get_or_404(group_id)
+    # Участники вместе с пользователями одним запросом
+    members = (GroupMember.query.filter_by(group_id=group_id)
+               .join(GroupMember.user).options(contains_eager(GroupMember.user))
+               .order_by(User.last_name, User.first_name).all())
+    # Группы, в которые можно перевести учеников
+    other_groups = db.session.query(Group.id, Group.name).filter(Group.id != group_id).order_by(Group.name).all()
+    
+    # Кандидатов для добавления страница не загружает - их ищет group_candidates
+    return render_template('view_group.html', group=group, members=members, other_groups=other_groups,
+                           feed_url=calendar_feed_url('group', group.id))
+
+# Поиск учеников, которых еще нет в группе (для окна добавления участников)
+@groups_bp.route('/admin/groups/<int:group_id>/candidates')
+@login_required
+def group_candidates(group_id):
+    if not current_user.is_teacher:
+        return jsonify({'error': 'Доступ запрещен'}), 403
+    
+    query = User.query.filter(User.is_teacher == False).filter(
+        ~sqlalchemy.exists().where(GroupMember.group_id == group_id, GroupMember.user_id == User.id)
+    )
+    return jsonify(search_students(query, request.args.get('q', '')))
+
+# Поиск учеников по началу фамилии, имени или email (до трех слов)
+def search_students(query, text):
+    for term in text.split()[:3]:
+        term = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        # LIKE в SQLite не учитывает регистр только для латиницы - для кириллицы
+        # проверяем еще и вариант с заглавной буквы, как обычно пишут фамилии
+        variants = {term.lower() + '%', term.capitalize() + '%'}
+        query = query.filter(sqlalchemy.or_(*(
+            column.like(pattern, escape='\\')
+            for column in (User.last_name, User.first_name, User.email)
+            for pattern in variants
+        )))
+    students = (query.order_by(User.last_name, User.id)
+                .limit(current_app.config['GROUP_CANDIDATES_LIMIT']).all())
+    return [
+        {'id': student.id, 'name': f'{student.last_name} {student.first_name}', 'email': student.email}
+        for student in students
+    ]
+
+# Вкладка "Группа" для ученика
+@groups_bp.route('/student/group')
+@login_required
+def student_group():
+    if current_user.is_teacher:
+        flash('Доступ запрещен!', 'error')
+        return redirect(url_for('main.dashboard'))
+    
+    # Получаем группу ученика
+    if not current_user.group_ids:
+        flash('Вы не состоите в группе!', 'info')
+        return redirect(url_for('main.dashboard'))
+    
+    group = db.session.get(Group, current_user.group_ids[0])
+    members = GroupMember.query.filter_by(group_id=group.id).all()
+    
+    return render_template('student_group.html', group=group, members=members)
@@ -0,0 +1,199 @@
+"""Проверки живости и готовности для балансировщика и сторожевых скриптов: /healthz и /readyz в JSON"""
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app, jsonify
+from sqlalchemy import func, text
+
+from models import db, JobRun, SchedulerLease
+
+# Результаты проверок: ok - в порядке, warn - стоит посмотреть, fail - не в порядке, skip - не проверялось
+OK, WARN, FAIL, SKIP = 'ok', 'warn', 'fail', 'skip'
+
+
+def _elapsed_ms(started):
+    return round((time.perf_counter() - started) * 1000, 2)
+
+
+def check_database(config):
+    """Время запроса SELECT 1 через пул приложения"""
+    started = time.perf_counter()
+    db.session.execute(text('SELECT 1'))
+    db.session.rollback()
+    latency = _elapsed_ms(started)
+    status = OK if latency <= config['HEALTH_DB_LATENCY_MS'] else WARN
+    return status, {'latency_ms': latency}
+
+
+def check_write_lock(config):
+    """Можно ли сейчас получить блокировку на запись (SQLite: BEGIN IMMEDIATE с коротким ожиданием).
+
+    Отдельное соединение, чтобы не менять busy_timeout у соединений пула"""
+    url = db.engine.url
+    if url.get_backend_name() != 'sqlite' or url.database in (None, '', ':memory:'):
+        return SKIP, {}
+    timeout = config['HEALTH_WRITE_LOCK_TIMEOUT']
+    started = time.perf_counter()
+    connection = sqlite3.connect(url.database, timeout=timeout, isolation_level=None)
+    try:
+        connection.execute('BEGIN IMMEDIATE')
+        connection.execute('ROLLBACK')
+    except sqlite3.OperationalError as e:
+        return FAIL, {'wait_ms': _elapsed_ms(started), 'error': str(e)}
+    finally:
+        connection.close()
+    return OK, {'wait_ms': _elapsed_ms(started)}
+
+
+def check_disk(config):
+    """Свободное место на томе с загрузками"""
+    usage = shutil.disk_usage(config['UPLOAD_FOLDER'])
+    free_mb = usage.free // (1024 * 1024)
+    status = OK if free_mb >= config['HEALTH_MIN_FREE_MB'] else FAIL
+    return status, {'free_mb': free_mb, 'total_mb': usage.total // (1024 * 1024)}
+
+
+def check_scheduler(config):
+    """Есть ли действующий лидер планировщика задач"""
+    if config['SCHEDULER_MODE'] == 'off':
+        return SKIP, {}
+    scheduler = current_app.extensions['job_scheduler']
+    lease = db.session.get(SchedulerLease, scheduler.name)
+    db.session.rollback()
+    if lease is None:
+        return WARN, {'leader': None}
+    expires_in = (lease.expires_at - datetime.utcnow()).total_seconds()
+    details = {'leader': lease.holder, 'expires_in_s': round(expires_in, 1), 'this_process': scheduler.is_leader}
+    return (OK if expires_in > 0 else WARN), details
+
+
+def _newest_backup_file(folder):
+    try:
+        names = [name for name in os.listdir(folder) if name.endswith('.zip')]
+    except OSError:
+        return None
+    if not names:
+        return None
+    return max(datetime.utcfromtimestamp(os.path.getmtime(os.path.join(folder, name))) for name in names)
+
+
+def check_backup(config):
+    """Возраст последней резервной копии: успешный запуск задачи или архив в папке (ручной запуск)"""
+    last_run = db.session.query(func.max(JobRun.finished_at)).filter(
+        JobRun.job == config['HEALTH_BACKUP_JOB'], JobRun.status == 'success'
+    ).scalar()
+    db.session.rollback()
+    candidates = [value for value in (last_run, _newest_backup_file(config['HEALTH_BACKUP_DIR'])) if value]
+    if not candidates:
+        return WARN, {'last_backup': None}
+    last_backup = max(candidates)
+    age = datetime.utcnow() - last_backup
+    status = OK if age <= timedelta(hours=config['HEALTH_BACKUP_MAX_AGE_HOURS']) else WARN
+    return status, {'last_backup': last_backup.isoformat() + 'Z', 'age_hours': round(age.total_seconds() / 3600, 1)}
+
+
+# Имя -> (проверка, критичность): True - сбой выводит воркер из ротации (503), число N - то же,
+# но только после N сбоев подряд, False - сбой только переводит ответ в degraded.
+# Блокировка записи - на общем файле SQLite: одна долгая запись роняла бы проверку у всех воркеров
+# сразу, поэтому 503 лишь когда блокировка недоступна несколько проверок подряд (около 3 * HEALTH_CACHE_TTL).
+# Лидер планировщика и свежесть копии общие для всех воркеров и не критичны
+READINESS_CHECKS = {
+    'database': (check_database, True),
+    'write_lock': (check_write_lock, 3),
+    'disk': (check_disk, True),
+    'scheduler': (check_scheduler, False),
+    'backup': (check_backup, False),
+}
+
+
+class ReadinessProbe:
+    """Проверки готовности с кэшированием: частые опросы не нагружают базу и диск.
+
+    Пока один поток выполняет проверки, остальные получают предыдущий результат"""
+
+    def __init__(self, app, checks, ttl):
+        self.app = app
+        self.checks = checks
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._result = None
+        self._checked_at = 0.0
+        self._failures = {}  # Имя проверки -> сбоев подряд
+
+    def _run_checks(self):
+        config = self.app.config
+        results = {}
+        blocking = False
+        for name, (check, critical) in self.checks.items():
+            started = time.perf_counter()
+            try:
+                status, details = check(config)
+            except Exception as e:
+                db.session.rollback()
+                status, details = FAIL, {'error': f'{type(e).__name__}: {e}'}
+            results[name] = dict(details, status=status, critical=bool(critical), duration_ms=_elapsed_ms(started))
+            failures = self._failures.get(name, 0) + 1 if status == FAIL else 0
+            self._failures[name] = failures
+            if failures > 1:
+                results[name]['consecutive_failures'] = failures
+            if critical and failures >= critical:
+                blocking = True
+        if blocking:
+            status = FAIL
+        elif any(result['status'] in (FAIL, WARN) for result in results.values()):
+            status = 'degraded'
+        else:
+            status = OK
+        return {'status': status, 'checks': results, 'checked_at': datetime.utcnow().isoformat() + 'Z'}
+
+    def result(self):
+        now = time.monotonic()
+        if self._result is not None and now - self._checked_at < self.ttl:
+            return self._result
+        if not self._lock.acquire(blocking=self._result is None):
+            return self._result
+        try:
+            if self._result is None or time.monotonic() - self._checked_at >= self.ttl:
+                self._result = self._run_checks()
+                self._checked_at = time.monotonic()
+            return self._result
+        finally:
+            self._lock.release()
+
+
+def _no_store(response):
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+def healthz_view():
+    # Живость: процесс принимает и обрабатывает запросы; зависимости не проверяются
+    return _no_store(jsonify(status=OK, pid=os.getpid()))
+
+
+def readyz_view():
+    result = current_app.extensions['readiness'].result()
+    response = jsonify(dict(result, pid=os.getpid()))
+    response.status_code = 503 if result['status'] == FAIL else 200
+    return _no_store(response)
+
+
+def init_health(app):
+    """Подключает маршруты /healthz и /readyz"""
+    app.config.setdefault('HEALTH_CACHE_TTL', 5.0)
+    app.config.setdefault('HEALTH_DB_LATENCY_MS', 100.0)
+    app.config.setdefault('HEALTH_WRITE_LOCK_TIMEOUT', 0.5)
+    app.config.setdefault('HEALTH_MIN_FREE_MB', 500)
+    app.config.setdefault('HEALTH_BACKUP_JOB', 'daily_backup')
+    app.config.setdefault('HEALTH_BACKUP_DIR', 'backups')
+    app.config.setdefault('HEALTH_BACKUP_MAX_AGE_HOURS', 26)
+
+    probe = ReadinessProbe(app, READINESS_CHECKS, app.config['HEALTH_CACHE_TTL'])
+    app.extensions['readiness'] = probe
+    app.add_url_rule('/healthz', 'healthz', healthz_view)
+    app.add_url_rule('/readyz', 'readyz', readyz_view)
+    return probe
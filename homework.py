@@ -0,0 +1,456 @@
+"""Домашние задания: выдача преподавателем, статусы и файлы учеников"""
+import os
+from datetime import datetime
+
+import sqlalchemy
+from flask import Blueprint, current_app, flash, redirect, render_template, request, url_for
+from flask_login import current_user, login_required
+
+from extensions import cache_versions
+from models import (db, Group, GroupMember, Homework, HomeworkFile, ScheduleSeries, StudentHomeworkFile,
+                    StudentHomeworkStatus, User)
+from recurrence import parse_occurrence_key
+from schedule import calendar_events, default_schedule_window, materialize_occurrence
+
+homework_bp = Blueprint('homework', __name__)
+
+
+# Домашние задания преподавателя
+@homework_bp.route('/admin/homework')
+@login_required
+def admin_homework():
+    if not current_user.is_teacher:
+        flash('Доступ запрещен!', 'error')
+        return redirect(url_for('main.dashboard'))
+    
+    # Получаем все домашние задания
+    homeworks = Homework.query.order_by(Homework.created_at.desc()).all()
+    # Получаем группы и учеников для добавления заданий
+    groups = Group.query.all()
+    students = User.query.filter_by(is_teacher=False).all()
+    # Ближайшие занятия для привязки задания (включая повторения серий)
+    schedules = calendar_events(*default_schedule_window())
+    
+    return render_template('admin_homework.html', homeworks=homeworks, groups=groups, students=students, schedules=schedules)
+
+# Создание домашнего задания
+@homework_bp.route('/admin/homework/create', methods=['POST'])
+@login_required
+def create_homework():
+    if not current_user.is_teacher:
+        flash('Доступ запрещен!', 'error')
+        return redirect(url_for('main.dashboard'))
+    
+    title = request.form.get('title')
+    description = request.form.get('description')
+    deadline = request.form.get('deadline')
+    group_id = request.form.get('group_id')
+    student_id = request.form.get('student_id')
+    schedule_id = request.form.get('schedule_id')
+    
+    if not title:
+        flash('Название задания обязательно!', 'error')
+        return redirect(url_for('homework.admin_homework'))
+    
+    try:
+        # Преобразуем deadline в datetime если он есть
+        deadline_dt = None
+        if deadline:
+            deadline_dt = datetime.fromisoformat(deadline.replace('T', ' '))
+        
+        # Обрабатываем group_id и student_id
+        group_id_int = None
+        student_id_int = None
+        schedule_id_int = None
+        if group_id:
+            group_id_int = int(group_id)
+        if student_id:
+            student_id_int = int(student_id)
+        if schedule_id:
+            if schedule_id.isdigit():
+                schedule_id_int = int(schedule_id)
+            else:
+                # Ключ занятия календаря: запись Schedule или повторение серии
+                parsed = parse_occurrence_key(schedule_id)
+                if parsed[0] == 'schedule':
+                    schedule_id_int = parsed[1]
+                else:
+                    series = db.session.get(ScheduleSeries, parsed[1])
+                    if series is None:
+                        raise ValueError('Серия занятий не найдена')
+                    schedule_id_int = materialize_occurrence(series, parsed[2]).id
+        
+        # Создаем домашнее задание
+        homework = Homework(
+            title=title,
+            description=description,
+            deadline=deadline_dt,
+            group_id=group_id_int,
+            student_id=student_id_int,
+            schedule_id=schedule_id_int,
+            created_by=current_user.id
+        )
+        db.session.add(homework)
+        db.session.flush()  # Получаем ID домашнего задания
+        
+        # Создаем статусы для учеников, избегая дубликатов
+        try:
+            if student_id_int:
+                # Проверяем, существует ли уже статус для этой пары
+                existing_status = StudentHomeworkStatus.query.filter_by(
+                    homework_id=homework.id,
+                    student_id=student_id_int
+                ).first()
+                if not existing_status:
+                    # Индивидуальное задание
+                    status = StudentHomeworkStatus(
+                        homework_id=homework.id,
+                        student_id=student_id_int,
+                        status='assigned',
+                        teacher_status='sent'
+                    )
+                    db.session.add(status)
+            elif group_id_int:
+                # Групповое задание
+                group_members = GroupMember.query.filter_by(group_id=group_id_int).all()
+                for member in group_members:
+                    # Проверяем, существует ли уже статус для этой пары
+                    existing_status = StudentHomeworkStatus.query.filter_by(
+                        homework_id=homework.id,
+                        student_id=member.user_id
+                    ).first()
+                    if not existing_status:
+                        status = StudentHomeworkStatus(
+                            homework_id=homework.id,
+                            student_id=member.user_id,
+                            status='assigned',
+                            teacher_status='sent'
+                        )
+                        db.session.add(status)
+            
+            # Обработка загрузки файлов
+            if 'files' in request.files:
+                files = request.files.getlist('files')
+                for file in files:
+                    if file and file.filename != '':
+                        # Определяем тип файла
+                        if file.filename.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.webp')):
+                            file_type = 'image'
+                        elif file.filename.lower().endswith(('.pdf', '.doc', '.docx', '.txt', '.xls', '.xlsx')):
+                            file_type = 'document'
+                        else:
+                            file_type = 'other'
+                        
+                        # Создаем уникальное имя файла
+                        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+                        filename = f"homework_{timestamp}_{file.filename}"
+                        file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
+                        
+                        # Сохраняем файл
+                        file.save(file_path)
+                        
+                        # Создаем запись в базе данных
+                        homework_file = HomeworkFile(
+                            homework_id=homework.id,
+                            filename=file.filename,
+                            file_path=f"uploads/{filename}",
+                            file_type=file_type
+                        )
+                        db.session.add(homework_file)
+            
+            cache_versions.bump('homework')
+            db.session.commit()
+            flash('Домашнее задание успешно создано!', 'success')
+        except sqlalchemy.exc.IntegrityError as e:
+            # Откатываем транзакцию в случае ошибки уникальности
+            db.session.rollback()
+            flash('Ошибка при создании домашнего задания: возможно, статус уже существует.', 'error')
+            return redirect(url_for('homework.admin_homework'))
+        except Exception as e:
+            # Откатываем транзакцию в случае любой другой ошибки
+            db.session.rollback()
+            flash(f'Ошибка при создании домашнего задания: {str(e)}', 'error')
+            return redirect(url_for('homework.admin_homework'))
+            
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Ошибка при создании домашнего задания: {str(e)}', 'error')
+        return redirect(url_for('homework.admin_homework'))
+    
+    return redirect(url_for('homework.admin_homework'))
+
+# Удаление домашнего задания
+@homework_bp.route('/admin/homework/delete/<int:homework_id>')
+@login_required
+def delete_homework(homework_id):
+    if not current_user.is_teacher:
+        flash('Доступ запрещен!', 'error')
+        return redirect(url_for('main.dashboard'))
+    
+    homework = Homework.query.get_or_404(homework_id)
+    db.session.delete(homework)
+    cache_versions.bump('homework')
+    db.session.commit()
+    
+    flash('Домашнее задание успешно удалено!', 'success')
+    return redirect(url_for('homework.admin_homework'))
+
+# Обновление статуса домашнего задания у ученика (преподаватель)
+@homework_bp.route('/admin/homework/<int:homework_id>/student/<int:student_id>/status', methods=['POST'])
+@login_required
+def update_student_homework_status(homework_id, student_id):
+    if not current_user.is_teacher:
+        flash('Доступ запрещен!', 'error')
+        return redirect(url_for('main.dashboard'))
+    
+    teacher_status = request.form.get('teacher_status')
+    review_notes = request.form.get('review_notes')
+    
+    # Получаем или создаем статус
+    status = StudentHomeworkStatus.query.filter_by(
+        homework_id=homework_id,
+        student_id=student_id
+    ).first()
+    
+    if not status:
+        status = StudentHomeworkStatus(
+            homework_id=homework_id,
+            student_id=student_id
+        )
+        db.session.add(status)
+    
+    status.teacher_status = teacher_status
+    status.review_notes = review_notes
+    status.reviewed_at = datetime.utcnow()
+    
+    db.session.commit()
+    flash('Статус домашнего задания обновлен!', 'success')
+    return redirect(url_for('homework.admin_homework'))
+
+# Домашние задания ученика
+@homework_bp.route('/student/homework')
+@login_required
+def student_homework():
+    if current_user.is_teacher:
+        flash('Доступ запрещен!', 'error')
+        return redirect(url_for('main.dashboard'))
+    
+    # Получаем индивидуальные домашние задания
+    individual_homeworks = Homework.query.filter_by(student_id=current_user.id).all()
+    
+    # Получаем домашние задания групп ученика
+    group_homeworks = []
+    if current_user.group_ids:
+        group_homeworks = Homework.query.filter(Homework.group_id.in_(current_user.group_ids)).all()
+    
+    # Объединяем и сортируем по дате создания
+    all_homeworks = individual_homeworks + group_homeworks
+    all_homeworks.sort(key=lambda x: x.created_at, reverse=True)
+    
+    # Получаем статусы для каждого задания
+    homework_statuses = {}
+    for homework in all_homeworks:
+        status = StudentHomeworkStatus.query.filter_by(
+            homework_id=homework.id,
+            student_id=current_user.id
+        ).first()
+        if not status:
+            # Создаем статус если его нет
+            status = StudentHomeworkStatus(
+                homework_id=homework.id,
+                student_id=current_user.id,
+                status='assigned',
+                teacher_status='sent'
+            )
+            db.session.add(status)
+            db.session.commit()
+        homework_statuses[homework.id] = status
+    
+    return render_template('student_homework.html', 
+                         homeworks=all_homeworks, 
+                         homework_statuses=homework_statuses)
+
+# Обновление статуса домашнего задания у ученика
+@homework_bp.route('/student/homework/<int:homework_id>/status', methods=['POST'])
+@login_required
+def update_my_homework_status(homework_id):
+    if current_user.is_teacher:
+        flash('Доступ запрещен!', 'error')
+        return redirect(url_for('main.dashboard'))
+    
+    status_value = request.form.get('status')
+    
+    # Получаем или создаем статус
+    status = StudentHomeworkStatus.query.filter_by(
+        homework_id=homework_id,
+        student_id=current_user.id
+    ).first()
+    
+    if not status:
+        status = StudentHomeworkStatus(
+            homework_id=homework_id,
+            student_id=current_user.id,
+            status=status_value,
+            teacher_status='sent'
+        )
+        db.session.add(status)
+    else:
+        status.status = status_value
+        status.submitted_at = datetime.utcnow()
+    
+    db.session.commit()
+    flash('Статус домашнего задания обновлен!', 'success')
+    return redirect(url_for('homework.student_homework'))
+
+# Просмотр домашнего задания учеником
+@homework_bp.route('/student/homework/<int:homework_id>')
+@login_required
+def view_student_homework(homework_id):
+    if current_user.is_teacher:
+        flash('Доступ запрещен!', 'error')
+        return redirect(url_for('main.dashboard'))
+    
+    # Получаем домашнее задание
+    homework = Homework.query.get_or_404(homework_id)
+    
+    # Проверяем доступ к заданию
+    has_access = False
+    if homework.student_id == current_user.id:
+        # Индивидуальное задание для этого ученика
+        has_access = True
+    else:
+        # Проверяем, есть ли задание для группы ученика
+        if homework.group_id in current_user.group_ids:
+            has_access = True
+    
+    if not has_access:
+        flash('У вас нет доступа к этому домашнему заданию!', 'error')
+        return redirect(url_for('homework.student_homework'))
+    
+    # Получаем статус ученика
+    status = StudentHomeworkStatus.query.filter_by(
+        homework_id=homework_id,
+        student_id=current_user.id
+    ).first()
+    
+    if not status:
+        # Создаем статус если его нет
+        status = StudentHomeworkStatus(
+            homework_id=homework_id,
+            student_id=current_user.id,
+            status='assigned',
+            teacher_status='sent'
+        )
+        db.session.add(status)
+        db.session.commit()
+    
+    # Получаем файлы ученика по этому заданию
+    student_files = StudentHomeworkFile.query.filter_by(
+        homework_id=homework_id,
+        student_id=current_user.id
+    ).all()
+    
+    return render_template('view_student_homework.html', 
+                         homework=homework, 
+                         status=status,
+                         student_files=student_files)
+
+# Загрузка файла учеником для домашнего задания
+@homework_bp.route('/student/homework/<int:homework_id>/upload', methods=['POST'])
+@login_required
+def upload_student_homework_file(homework_id):
+    if current_user.is_teacher:
+        flash('Доступ запрещен!', 'error')
+        return redirect(url_for('main.dashboard'))
+    
+    # Получаем домашнее задание
+    homework = Homework.query.get_or_404(homework_id)
+    
+    # Проверяем доступ к заданию
+    has_access = False
+    if homework.student_id == current_user.id:
+        # Индивидуальное задание для этого ученика
+        has_access = True
+    else:
+        # Проверяем, есть ли задание для группы ученика
+        if homework.group_id in current_user.group_ids:
+            has_access = True
+    
+    if not has_access:
+        flash('У вас нет доступа к этому домашнему заданию!', 'error')
+        return redirect(url_for('homework.student_homework'))
+    
+    try:
+        # Обработка загрузки файлов
+        if 'files' in request.files:
+            files = request.files.getlist('files')
+            comment = request.form.get('comment', '')
+            for file in files:
+                if file and file.filename != '':
+                    # Определяем тип файла
+                    if file.filename.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.webp')):
+                        file_type = 'image'
+                    elif file.filename.lower().endswith(('.pdf', '.doc', '.docx', '.txt', '.xls', '.xlsx')):
+                        file_type = 'document'
+                    else:
+                        file_type = 'other'
+                    
+                    # Создаем уникальное имя файла
+                    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+                    filename = f"student_homework_{timestamp}_{file.filename}"
+                    file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
+                    
+                    # Сохраняем файл
+                    file.save(file_path)
+                    
+                    # Создаем запись в базе данных
+                    student_file = StudentHomeworkFile(
+                        homework_id=homework_id,
+                        student_id=current_user.id,
+                        filename=file.filename,
+                        file_path=f"uploads/{filename}",
+                        file_type=file_type,
+                        comment=comment
+                    )
+                    db.session.add(student_file)
+            db.session.commit()
+            flash('Файлы успешно загружены!', 'success')
+        else:
+            flash('Выберите файлы для загрузки!', 'error')
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Ошибка при загрузке файлов: {str(e)}', 'error')
+    
+    return redirect(url_for('homework.view_student_homework', homework_id=homework_id))
+
+# Удаление файла ученика
+@homework_bp.route('/student/homework/file/<int:file_id>/delete')
+@login_required
+def delete_student_homework_file(file_id):
+    if current_user.is_teacher:
+        flash('Доступ запрещен!', 'error')
+        return redirect(url_for('main.dashboard'))
+    
+    # Получаем файл
+    student_file = StudentHomeworkFile.query.get_or_404(file_id)
+    
+    # Проверяем, что файл принадлежит текущему пользователю
+    if student_file.student_id != current_user.id:
+        flash('Доступ запрещен!', 'error')
+        return redirect(url_for('homework.student_homework'))
+    
+    try:
+        # Удаляем файл с диска
+        if os.path.exists(student_file.file_path):
+            os.remove(student_file.file_path)
+        
+        # Удаляем запись из базы данных
+        db.session.delete(student_file)
+        db.session.commit()
+        
+        flash('Файл успешно удален!', 'success')
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Ошибка при удалении файла: {str(e)}', 'error')
+    
+    return redirect(url_for('homework.view_student_homework', homework_id=student_file.homework_id))
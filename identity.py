@@ -0,0 +1,90 @@
+"""Кэш пользователей для Flask-Login: неизменяемые снимки вместо запроса к БД на каждый запрос"""
+import threading
+import time
+from collections import OrderedDict
+
+from flask_login import UserMixin
+
+
+class UserIdentity(UserMixin):
+    """Снимок пользователя для current_user: только чтение.
+    Чтобы изменить пользователя, загрузите модель User по id"""
+
+    __slots__ = ('id', 'email', 'first_name', 'last_name', 'phone', 'is_teacher', 'group_ids')
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            object.__setattr__(self, name, fields[name])
+
+    def __setattr__(self, name, value):
+        raise AttributeError('UserIdentity доступен только для чтения')
+
+    def __repr__(self):
+        return f'<UserIdentity {self.email}>'
+
+
+class IdentityCache:
+    """LRU снимков с TTL.
+
+    invalidate(user_id) сразу убирает снимок в этом процессе и увеличивает версию
+    'identity' - остальные воркеры сбрасывают свои снимки, когда заметят новую версию.
+    """
+
+    version_name = 'identity'
+
+    def __init__(self, db, user_model, member_model, versions, ttl=300.0, max_entries=1000):
+        self.db = db
+        self.user_model = user_model
+        self.member_model = member_model
+        self.versions = versions
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # id -> (версия, время загрузки, снимок)
+        self._lock = threading.Lock()
+
+    def _load(self, user_id):
+        user = self.db.session.get(self.user_model, user_id)
+        if user is None:
+            return None
+        member = self.member_model
+        # Порядок вступления: group_ids[0] - группа, которую раньше давал .first()
+        group_ids = tuple(self.db.session.execute(
+            self.db.select(member.group_id).where(member.user_id == user_id).order_by(member.id)
+        ).scalars())
+        return UserIdentity(
+            id=user.id,
+            email=user.email,
+            first_name=user.first_name,
+            last_name=user.last_name,
+            phone=user.phone,
+            is_teacher=bool(user.is_teacher),
+            group_ids=group_ids
+        )
+
+    def get(self, user_id):
+        version = self.versions.current(self.version_name)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] == version and now - entry[1] < self.ttl:
+                self._entries.move_to_end(user_id)
+                return entry[2]
+
+        identity = self._load(user_id)
+        if identity is None:
+            with self._lock:
+                self._entries.pop(user_id, None)
+            return None
+        with self._lock:
+            self._entries[user_id] = (version, now, identity)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return identity
+
+    def invalidate(self, *user_ids):
+        """Вызывается до commit изменений пользователя или его групп (версия пишется в той же транзакции)"""
+        with self._lock:
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+        self.versions.bump(self.version_name)
@@ -0,0 +1,354 @@
+"""Задачи по расписанию с одним лидером: процессы выбирают лидера через аренду в БД,
+задачи запускает только лидер, история запусков пишется в job_run"""
+import importlib
+import os
+import signal
+import socket
+import threading
+import time
+import traceback
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import click
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from models import db, JobRun, SchedulerLease
+
+
+def _holder_gone(holder):
+    """Точно ли завершился процесс holder ('хост:pid:...'). Про другой хост узнать нельзя - False"""
+    host, _, rest = (holder or '').partition(':')
+    pid = rest.partition(':')[0]
+    if host != socket.gethostname() or not pid.isdigit():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass
+    return False
+
+
+class JobScheduler:
+    """Планировщик, который можно запускать в каждом воркере или отдельным процессом.
+
+    Каждые heartbeat секунд процесс пытается захватить или продлить аренду lease_ttl секунд:
+    одним UPDATE, который проходит, только если аренда своя или уже истекла. Лидер находит
+    наступившие запуски задач (расписание cron, пропущенные запуски сливаются в один) и
+    занимает каждый строкой job_run - уникальный (job, scheduled_for) не дает выполнить
+    один запуск дважды, даже если на время смены лидера их окажется два.
+    Запуск, опоздавший больше чем на misfire_grace секунд, записывается как missed.
+    Строка running, оставшаяся от процесса, который больше не лидер, перезапускается новым
+    лидером, только если прежний исполнитель точно завершился (тот же хост, процесса с его pid
+    нет) и misfire_grace еще не прошел. Иначе строка помечается abandoned: процесс, потерявший
+    аренду, мог продолжать задачу, и второй запуск рядом с ним недопустим. Результат такой
+    задачи все равно записывается - строку обновляет только ее текущий исполнитель.
+    """
+
+    def __init__(self, app, db, lease_model, run_model, jobs, name='default', lease_ttl=30.0,
+                 heartbeat=10.0, misfire_grace=3600.0, timezone=None):
+        self.app = app
+        self.db = db
+        self.lease_model = lease_model
+        self.run_model = run_model
+        self.jobs = jobs  # имя -> ('модуль:функция', параметры cron: hour, minute, day_of_week...)
+        self.name = name
+        self.lease_ttl = timedelta(seconds=lease_ttl)
+        self.heartbeat = heartbeat
+        self.misfire_grace = timedelta(seconds=misfire_grace)
+        self.timezone = timezone
+        self.holder = None
+        self.is_leader = False
+        self._triggers = {}
+        self._running = {}  # имя задачи -> поток, выполняющий ее в этом процессе
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def _trigger(self, job):
+        trigger = self._triggers.get(job)
+        if trigger is None:
+            # APScheduler нужен только для разбора расписаний cron
+            from apscheduler.triggers.cron import CronTrigger
+            trigger = self._triggers[job] = CronTrigger(timezone=self.timezone, **self.jobs[job][1])
+        return trigger
+
+    def _acquire(self):
+        """Захватывает или продлевает аренду. True, если этот процесс - лидер"""
+        lease = self.lease_model
+        session = self.db.session
+        now = datetime.utcnow()
+        values = {'holder': self.holder, 'expires_at': now + self.lease_ttl, 'heartbeat_at': now}
+        result = session.execute(
+            update(lease)
+            .where(lease.name == self.name, or_(lease.holder == self.holder, lease.expires_at < now))
+            .values(**values)
+        )
+        if result.rowcount == 0 and session.get(lease, self.name) is None:
+            session.add(lease(name=self.name, **values))
+            try:
+                session.commit()
+            except IntegrityError:
+                session.rollback()
+                return False
+            return True
+        session.commit()
+        return result.rowcount == 1
+
+    def _release(self):
+        lease = self.lease_model
+        self.db.session.execute(
+            update(lease)
+            .where(lease.name == self.name, lease.holder == self.holder)
+            .values(expires_at=datetime.utcnow())
+        )
+        self.db.session.commit()
+
+    def due(self, job, now=None):
+        """Последний наступивший и еще не занятый запуск задачи (UTC, без tzinfo) или None"""
+        run = self.run_model
+        now = (now or datetime.utcnow()).replace(tzinfo=timezone.utc)
+        last = self.db.session.query(func.max(run.scheduled_for)).filter(run.job == job).scalar()
+        start = last.replace(tzinfo=timezone.utc) + timedelta(microseconds=1) if last else now - self.misfire_grace
+        trigger = self._trigger(job)
+        slot = None
+        fire_time = trigger.get_next_fire_time(None, start)
+        while fire_time is not None and fire_time <= now:
+            slot = fire_time
+            fire_time = trigger.get_next_fire_time(fire_time, fire_time + timedelta(microseconds=1))
+        if slot is None:
+            return None
+        return slot.astimezone(timezone.utc).replace(tzinfo=None)
+
+    def _claim(self, job, scheduled_for, status='running'):
+        """Строка job_run для запуска или None, если его уже занял другой процесс"""
+        run = self.run_model(job=job, scheduled_for=scheduled_for, holder=self.holder, status=status,
+                             started_at=datetime.utcnow())
+        self.db.session.add(run)
+        try:
+            self.db.session.commit()
+        except IntegrityError:
+            self.db.session.rollback()
+            return None
+        return run.id
+
+    def _recover(self, now):
+        """Подбирает запуски, брошенные прежними лидерами"""
+        run = self.run_model
+        stale = self.db.session.execute(
+            select(run.id, run.job, run.holder, run.scheduled_for)
+            .where(run.status == 'running', run.holder != self.holder)
+        ).all()
+        for row in stale:
+            gone = _holder_gone(row.holder)
+            retry = gone and row.job in self.jobs and now - row.scheduled_for <= self.misfire_grace
+            thread = self._running.get(row.job)
+            if retry and thread is not None and thread.is_alive():
+                continue
+            values = {'holder': self.holder, 'started_at': now} if retry else {
+                'status': 'abandoned', 'finished_at': now,
+                'error': f'Исполнитель {row.holder} перестал быть лидером, не завершив задачу'
+                         + ('' if gone else ' (возможно, задача еще выполняется)'),
+            }
+            # Условие на holder: строку мог одновременно подобрать другой процесс
+            result = self.db.session.execute(
+                update(run).where(run.id == row.id, run.status == 'running', run.holder == row.holder)
+                .values(**values)
+            )
+            self.db.session.commit()
+            if result.rowcount != 1:
+                continue
+            if retry:
+                self.app.logger.warning('Задача %s (запуск %s) не завершена прежним лидером %s - перезапуск',
+                                        row.job, row.scheduled_for, row.holder)
+                self._start_job(row.job, row.id)
+            else:
+                self.app.logger.warning('Задача %s (запуск %s) брошена прежним лидером %s',
+                                        row.job, row.scheduled_for, row.holder)
+
+    @property
+    def busy(self):
+        """Выполняется ли сейчас задача в этом процессе"""
+        return any(thread.is_alive() for thread in self._running.values())
+
+    def _dispatch(self):
+        now = datetime.utcnow()
+        self._recover(now)
+        for job in self.jobs:
+            thread = self._running.get(job)
+            if thread is not None and thread.is_alive():
+                continue
+            scheduled_for = self.due(job, now)
+            if scheduled_for is None:
+                continue
+            if now - scheduled_for > self.misfire_grace:
+                if self._claim(job, scheduled_for, 'missed') is not None:
+                    self.app.logger.warning('Задача %s пропущена: запуск %s опоздал больше допустимого',
+                                            job, scheduled_for)
+                continue
+            run_id = self._claim(job, scheduled_for)
+            if run_id is not None:
+                self._start_job(job, run_id)
+
+    def _start_job(self, job, run_id):
+        thread = threading.Thread(target=self._execute, args=(job, run_id), name=f'job-{job}', daemon=True)
+        self._running[job] = thread
+        thread.start()
+
+    def _execute(self, job, run_id):
+        """Выполняет задачу и записывает результат в строку run_id"""
+        module_name, _, func_name = self.jobs[job][0].partition(':')
+        started = time.monotonic()
+        status, error = 'success', None
+        with self.app.app_context():
+            self.app.logger.info('Задача %s запущена', job)
+            try:
+                getattr(importlib.import_module(module_name), func_name)()
+            except Exception:
+                status, error = 'failed', traceback.format_exc()[-4000:]
+                self.app.logger.exception('Задача %s завершилась ошибкой', job)
+            duration = time.monotonic() - started
+            try:
+                # Только пока строка за этим процессом: после перезапуска ее ведет новый лидер
+                result = self.db.session.execute(
+                    update(self.run_model)
+                    .where(self.run_model.id == run_id, self.run_model.holder == self.holder)
+                    .values(status=status, error=error, finished_at=datetime.utcnow(), duration=duration)
+                )
+                self.db.session.commit()
+                if result.rowcount != 1:
+                    self.app.logger.warning('Результат задачи %s не записан: запуск подобран другим процессом', job)
+            except Exception:
+                self.db.session.rollback()
+                self.app.logger.exception('Не удалось записать результат задачи %s', job)
+            self.app.logger.info('Задача %s: %s за %.1f с', job, status, duration)
+        return status
+
+    def run_now(self, job):
+        """Запуск задачи вне расписания (записывается в историю с scheduled_for = сейчас)"""
+        if self.holder is None:
+            self.holder = self._make_holder()
+        with self.app.app_context():
+            run_id = self._claim(job, datetime.utcnow())
+        return self._execute(job, run_id)
+
+    def _tick(self):
+        with self.app.app_context():
+            try:
+                leader = self._acquire()
+                if leader != self.is_leader:
+                    self.app.logger.info('Планировщик %s: %s', self.holder,
+                                         'стал лидером' if leader else 'больше не лидер')
+                self.is_leader = leader
+                if leader:
+                    self._dispatch()
+            except Exception:
+                self.db.session.rollback()
+                self.is_leader = False
+                self.app.logger.exception('Ошибка планировщика задач')
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self._tick()
+            self._stop.wait(self.heartbeat)
+
+    @staticmethod
+    def _make_holder():
+        return f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+    def start(self):
+        """Запускает фоновый поток в этом процессе (в воркере - после fork)"""
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        self._pid = os.getpid()
+        self.holder = self._make_holder()
+        self.is_leader = False
+        self._running = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name='job-scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """Останавливает поток, ждет текущие задачи до timeout секунд и отдает аренду"""
+        if self._thread is None or self._pid != os.getpid():
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        for thread in list(self._running.values()):
+            thread.join(timeout)
+        with self.app.app_context():
+            try:
+                self._release()
+            except Exception:
+                self.db.session.rollback()
+                self.app.logger.exception('Не удалось освободить аренду планировщика')
+        self._thread = None
+
+    def run_forever(self):
+        """Отдельный процесс планировщика: работает до SIGTERM или Ctrl+C"""
+        self.start()
+        signal.signal(signal.SIGTERM, lambda signum, frame: self._stop.set())
+        try:
+            while not self._stop.wait(1.0):
+                pass
+        except KeyboardInterrupt:
+            pass
+        self.stop()
+
+
+def init_job_scheduler(app):
+    app.config.setdefault('SCHEDULER_MODE', 'workers')
+    app.config.setdefault('SCHEDULER_JOBS', {})
+    app.config.setdefault('SCHEDULER_LEASE_TTL', 30.0)
+    app.config.setdefault('SCHEDULER_HEARTBEAT', 10.0)
+    app.config.setdefault('SCHEDULER_MISFIRE_GRACE', 3600.0)
+    app.config.setdefault('SCHEDULER_TIMEZONE', None)
+
+    scheduler = JobScheduler(
+        app, db, SchedulerLease, JobRun, app.config['SCHEDULER_JOBS'],
+        lease_ttl=app.config['SCHEDULER_LEASE_TTL'],
+        heartbeat=app.config['SCHEDULER_HEARTBEAT'],
+        misfire_grace=app.config['SCHEDULER_MISFIRE_GRACE'],
+        timezone=app.config['SCHEDULER_TIMEZONE']
+    )
+    app.extensions['job_scheduler'] = scheduler
+
+    @app.cli.command('run-scheduler')
+    def run_scheduler_command():
+        """Запустить планировщик задач отдельным процессом."""
+        click.echo(f'Планировщик {scheduler._make_holder()}: задачи {", ".join(scheduler.jobs) or "нет"}')
+        scheduler.run_forever()
+
+    @app.cli.command('run-job')
+    @click.argument('job')
+    def run_job_command(job):
+        """Выполнить задачу сейчас (с записью в историю)."""
+        if job not in scheduler.jobs:
+            raise click.ClickException(f'Неизвестная задача: {job}')
+        status = scheduler.run_now(job)
+        click.echo(f'{job}: {status}')
+        if status != 'success':
+            raise SystemExit(1)
+
+    @app.cli.command('jobs')
+    @click.option('--limit', default=20, help='Сколько последних запусков показать.')
+    def jobs_command(limit):
+        """Показать лидера планировщика и последние запуски задач."""
+        lease = db.session.get(SchedulerLease, scheduler.name)
+        if lease is None:
+            click.echo('Лидер: нет')
+        else:
+            state = 'активна' if lease.expires_at > datetime.utcnow() else 'истекла'
+            click.echo(f'Лидер: {lease.holder}, аренда {state} (до {lease.expires_at:%Y-%m-%d %H:%M:%S} UTC)')
+        runs = JobRun.query.order_by(JobRun.started_at.desc()).limit(limit).all()
+        for run in runs:
+            duration = f'{run.duration:.1f} с' if run.duration is not None else '-'
+            click.echo(f'{run.started_at:%Y-%m-%d %H:%M:%S}  {run.job:<20} {run.status:<8} {duration:>9}  '
+                       f'запуск {run.scheduled_for:%Y-%m-%d %H:%M} UTC  {run.holder or ""}')
+            if run.error:
+                click.echo('    ' + run.error.strip().splitlines()[-1])
+
+    return scheduler
@@ -0,0 +1,277 @@
+"""Структурированные логи: JSON-строки с контекстом запроса, запись в отдельном потоке.
+
+В потоке запроса запись лога только дополняется полями (request_id, user_id, route, duration_ms),
+проходит выборку и кладется в очередь; форматирование и вывод делает фоновый поток.
+Логи - по строке JSON на запись в stdout (журнал systemd) и, если задан LOG_FILE, в файл;
+отбор записей: flask --app app logs --request-id ... --level WARNING
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import re
+import sys
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+from logging.handlers import QueueHandler, QueueListener, WatchedFileHandler
+
+import click
+from flask import g, has_request_context, request
+
+# Стандартные атрибуты LogRecord; все остальные (extra=...) попадают в JSON как есть
+_RESERVED = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+_REQUEST_ID = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+_LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL')
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна строка JSON на запись (вызывается в фоновом потоке)"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+            'pid': record.process,
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and value is not None:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry['stack'] = self.formatStack(record.stack_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class RequestContextFilter(logging.Filter):
+    """Добавляет к записи контекст текущего запроса и отбрасывает часть шумных записей.
+
+    sampling: 'логгер' или 'логгер:маршрут' -> доля сохраняемых записей. Предупреждения и ошибки
+    не отбрасываются никогда; решение принимается по request_id, поэтому запрос попадает
+    в логи целиком или не попадает совсем"""
+
+    def __init__(self, sampling=None):
+        super().__init__()
+        self.sampling = sampling or {}
+        self.sampled_out = 0
+
+    def filter(self, record):
+        route = None
+        if has_request_context():
+            context = g.get('log_context')
+            if context is not None:
+                record.__dict__.update(context)
+                route = context['route']
+                user = g.get('_login_user')  # Только если пользователь уже загружен: лог не должен ходить в БД
+                record.user_id = getattr(user, 'id', None)
+                if getattr(record, 'duration_ms', None) is None:
+                    record.duration_ms = round((time.perf_counter() - g.log_started) * 1000, 2)
+
+        if self.sampling and record.levelno < logging.WARNING:
+            rate = self.sampling.get(f'{record.name}:{route}', self.sampling.get(record.name))
+            if rate is not None and rate < 1.0:
+                key = getattr(record, 'request_id', None)
+                point = (zlib.crc32(key.encode()) % 10000) / 10000 if key else (time.perf_counter_ns() % 10000) / 10000
+                if point >= rate:
+                    self.sampled_out += 1
+                    return False
+        return True
+
+
+class _NonBlockingQueueHandler(QueueHandler):
+    """Кладет запись в очередь без форматирования; при переполненной очереди запись теряется"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Аргументы подставляются сразу: к моменту вывода объекты могут измениться.
+        # Трассировка исключения форматируется уже в фоновом потоке
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class AsyncLogging:
+    """Корневой логгер -> очередь -> фоновый поток -> обработчики вывода.
+
+    Поток не переживает fork (gunicorn с предзагрузкой), поэтому в дочернем процессе
+    очередь и поток создаются заново"""
+
+    def __init__(self, handlers, level='INFO', sampling=None, queue_size=10000):
+        self.handlers = handlers
+        self.queue_size = queue_size
+        self.context_filter = RequestContextFilter(sampling)
+        self.handler = _NonBlockingQueueHandler(queue.Queue(queue_size))
+        self.handler.addFilter(self.context_filter)
+        self.level = level
+        self.listener = None
+
+    def start(self):
+        self.listener = QueueListener(self.handler.queue, *self.handlers, respect_handler_level=True)
+        self.listener.start()
+
+    def flush(self, timeout=5.0):
+        """Ждет, пока фоновый поток выведет все записи из очереди"""
+        deadline = time.monotonic() + timeout
+        while self.handler.queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def stop(self):
+        if self.listener is not None and self.listener._thread is not None:
+            self.listener.stop()  # Выводит оставшиеся записи
+        for handler in self.handlers:
+            handler.flush()
+
+    def _after_fork(self):
+        # Блокировки старой очереди могли остаться захваченными потоком родителя
+        self.handler.queue = queue.Queue(self.queue_size)
+        self.handler.dropped = 0
+        self.context_filter.sampled_out = 0
+        self.start()
+
+    def install(self):
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            if isinstance(handler, _NonBlockingQueueHandler):
+                root.removeHandler(handler)
+        root.addHandler(self.handler)
+        root.setLevel(self.level)
+
+
+def _output_handlers(config):
+    formatter = JsonFormatter()
+    handlers = [logging.StreamHandler(sys.stdout)]
+    if config['LOG_FILE']:
+        os.makedirs(os.path.dirname(os.path.abspath(config['LOG_FILE'])), exist_ok=True)
+        # WatchedFileHandler переоткрывает файл после ротации logrotate
+        handlers.append(WatchedFileHandler(config['LOG_FILE'], encoding='utf-8'))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    return handlers
+
+
+# Один экземпляр на процесс: корневой логгер общий для всех приложений
+_active = None
+
+
+def _after_fork_in_child():
+    if _active is not None:
+        _active._after_fork()
+
+
+def _stop_active():
+    if _active is not None:
+        _active.stop()
+
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
+atexit.register(_stop_active)
+
+
+def _start_request():
+    g.log_started = time.perf_counter()
+    incoming = request.headers.get('X-Request-ID', '')
+    g.request_id = incoming if _REQUEST_ID.match(incoming) else os.urandom(8).hex()
+    # Поля, общие для всех записей запроса, собираются один раз
+    g.log_context = {'request_id': g.request_id, 'route': request.endpoint,
+                     'method': request.method, 'path': request.path}
+
+
+def _log_request(app):
+    access_logger = logging.getLogger('access')
+
+    def log_request(response):
+        started = g.get('log_started')
+        if started is None:
+            return response
+        duration = round((time.perf_counter() - started) * 1000, 2)
+        slow = duration >= app.config['LOG_SLOW_REQUEST_MS']
+        access_logger.log(logging.WARNING if slow else logging.INFO, '%s %s %s', request.method,
+                          request.full_path.rstrip('?'), response.status_code,
+                          extra={'status': response.status_code, 'duration_ms': duration,
+                                 'size': response.calculate_content_length(), 'slow': slow or None})
+        response.headers['X-Request-ID'] = g.request_id
+        return response
+    return log_request
+
+
+def _matches(entry, level, request_id, route, user_id, since, slow_ms):
+    if level and _LEVELS.index(entry.get('level', 'INFO')) < _LEVELS.index(level):
+        return False
+    if request_id and entry.get('request_id') != request_id:
+        return False
+    if route and entry.get('route') != route:
+        return False
+    if user_id is not None and entry.get('user_id') != user_id:
+        return False
+    if since and entry.get('ts', '') < since:
+        return False
+    if slow_ms is not None and (entry.get('logger') != 'access' or (entry.get('duration_ms') or 0) < slow_ms):
+        return False
+    return True
+
+
+def init_logging(app):
+    """Подключает асинхронные JSON-логи и контекст запросов"""
+    global _active
+    app.config.setdefault('LOG_LEVEL', 'INFO')
+    app.config.setdefault('LOG_FILE', None)
+    app.config.setdefault('LOG_QUEUE_SIZE', 10000)
+    app.config.setdefault('LOG_SAMPLING', {})
+    app.config.setdefault('LOG_SLOW_REQUEST_MS', 1000)
+
+    if _active is not None:
+        _active.stop()
+    logs = AsyncLogging(_output_handlers(app.config), app.config['LOG_LEVEL'],
+                        app.config['LOG_SAMPLING'], app.config['LOG_QUEUE_SIZE'])
+    logs.install()
+    logs.start()
+    _active = logs
+    app.extensions['logging'] = logs
+
+    # Записи app.logger идут через корневой логгер, а не в stderr обработчиком Flask по умолчанию
+    from flask.logging import default_handler
+    app.logger.removeHandler(default_handler)
+
+    app.before_request(_start_request)
+    app.after_request(_log_request(app))
+
+    @app.cli.command('logs')
+    @click.option('--file', 'path', help='Файл логов (по умолчанию LOG_FILE; "-" - stdin, например из journalctl -o cat).')
+    @click.option('--level', type=click.Choice(_LEVELS), help='Не ниже этого уровня.')
+    @click.option('--request-id', help='Записи одного запроса.')
+    @click.option('--route', help='Маршрут (endpoint), например main.index.')
+    @click.option('--user', 'user_id', type=int, help='ID пользователя.')
+    @click.option('--since', type=int, help='За последние N минут.')
+    @click.option('--slow', 'slow_ms', type=float, help='Запросы дольше N мс.')
+    def logs_command(path, level, request_id, route, user_id, since, slow_ms):
+        """Отобрать записи JSON-логов."""
+        path = path or app.config['LOG_FILE']
+        if not path:
+            raise click.ClickException('LOG_FILE не задан: укажите --file или передайте журнал через --file -')
+        since_ts = None
+        if since:
+            since_ts = (datetime.now(timezone.utc) - timedelta(minutes=since)).isoformat(timespec='milliseconds')
+        stream = click.get_text_stream('stdin') if path == '-' else open(path, encoding='utf-8')
+        with stream:
+            for line in stream:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # Строки не в JSON (например, собственный лог gunicorn)
+                if isinstance(entry, dict) and _matches(entry, level, request_id, route, user_id, since_ts, slow_ms):
+                    click.echo(line.rstrip('\n'))
+
+    return logs
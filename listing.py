@@ -0,0 +1,141 @@
+"""Серверные списки для админки: фильтры, сортировка, keyset-пагинация и кэшированный счетчик"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from flask import abort, request
+
+from pagination import KeysetPage, keyset_paginate
+
+
+class ApproximateCounter:
+    """Кэш результатов COUNT(*) по ключу.
+
+    Значение пересчитывается при смене версий зависимостей (cache_versions)
+    или по истечении ttl секунд. Изменения без bump (например, новые заявки
+    с сайта) попадают в счетчик с задержкой не больше ttl.
+    """
+
+    def __init__(self, versions, ttl=60.0, max_entries=256):
+        self.versions = versions
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # ключ -> (версии, время подсчета, значение)
+        self._lock = threading.Lock()
+
+    def count(self, key, query, dependencies=()):
+        versions = tuple(self.versions.current(name) for name in dependencies)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == versions and now - entry[1] < self.ttl:
+                self._entries.move_to_end(key)
+                return entry[2]
+
+        value = query.order_by(None).count()
+        with self._lock:
+            self._entries[key] = (versions, now, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+
+class ListingPage(KeysetPage):
+    """Страница списка вместе с примененными параметрами (для шаблона и pager.html)"""
+
+    def __init__(self, page, total, sort, order, filters, default_orders):
+        super().__init__(page.items, page.prev_cursor, page.next_cursor)
+        self.total = total
+        self.sort = sort
+        self.order = order
+        self.filters = filters
+        self.default_orders = default_orders
+
+    def next_order(self, sort):
+        """Порядок для ссылки в заголовке столбца: повторный клик меняет направление"""
+        if sort == self.sort:
+            return 'asc' if self.order == 'desc' else 'desc'
+        return self.default_orders[sort]
+
+
+class Listing:
+    """Описание списка: допустимые сортировки и фильтры берутся только отсюда,
+    поэтому каждый запрос страницы попадает в заранее созданный индекс.
+
+    sorts - {имя: (колонка, порядок по умолчанию)};
+    filters - {параметр запроса: (колонка, {значение параметра: значение в БД})},
+    значение 'all' или пустое отключает фильтр;
+    date_column - колонка для фильтра по диапазону дат created_from/created_to (ГГГГ-ММ-ДД).
+    """
+
+    def __init__(self, name, model, sorts, default_sort, filters=None, date_column=None,
+                 per_page=50, counter=None, dependencies=()):
+        self.name = name
+        self.model = model
+        self.sorts = sorts
+        self.default_sort = default_sort
+        self.filters = filters or {}
+        self.date_column = date_column
+        self.per_page = per_page
+        self.counter = counter
+        self.dependencies = dependencies
+
+    def _date_arg(self, name):
+        value = request.args.get(name)
+        if not value:
+            return None
+        try:
+            return datetime.strptime(value, '%Y-%m-%d')
+        except ValueError:
+            abort(400)
+
+    def apply_filters(self, query):
+        """Применяет фильтры из запроса; возвращает (query, {параметр: значение})"""
+        active = {}
+        for param, (column, choices) in self.filters.items():
+            value = request.args.get(param, 'all')
+            if value in ('', 'all'):
+                continue
+            if value not in choices:
+                abort(400)
+            query = query.filter(column == choices[value])
+            active[param] = value
+
+        if self.date_column is not None:
+            created_from = self._date_arg('created_from')
+            created_to = self._date_arg('created_to')
+            if created_from:
+                query = query.filter(self.date_column >= created_from)
+                active['created_from'] = request.args['created_from']
+            if created_to:
+                # Дата "по" включительно
+                query = query.filter(self.date_column < created_to + timedelta(days=1))
+                active['created_to'] = request.args['created_to']
+        return query, active
+
+    def page(self, query=None):
+        sort = request.args.get('sort', self.default_sort)
+        if sort not in self.sorts:
+            abort(400)
+        sort_column, default_order = self.sorts[sort]
+        order = request.args.get('order', default_order)
+        if order not in ('asc', 'desc'):
+            abort(400)
+
+        query, active = self.apply_filters(query if query is not None else self.model.query)
+        total = None
+        if self.counter is not None:
+            key = (self.name, tuple(sorted(active.items())))
+            total = self.counter.count(key, query, self.dependencies)
+
+        page = keyset_paginate(
+            query, sort_column, self.model.id,
+            after=request.args.get('after'),
+            before=request.args.get('before'),
+            per_page=self.per_page,
+            descending=order == 'desc'
+        )
+        default_orders = {name: default for name, (_, default) in self.sorts.items()}
+        return ListingPage(page, total, sort, order, active, default_orders)
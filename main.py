@@ -1,23 +1,24 @@
-from flask import Blueprint, render_template, request, jsonify, redirect, url_for, flash
-from flask_login import login_required, current_user # Импортируем login_required и current_user
+"""Публичные страницы сайта, блог, заявки на обучение и личный кабинет"""
 from datetime import datetime
 
-# Импортируем db и модели из основного приложения
-from models import db, Lesson, BlogPost, Application, SiteContent
+from flask import Blueprint, current_app, flash, jsonify, redirect, render_template, request, url_for
+from flask_login import current_user, login_required
 
-# Создаем Blueprint для основных маршрутов
-main_bp = Blueprint('main', __name__, url_prefix='')
+from extensions import (application_writer, blog_feed_cache, cached_page, identity_cache, rate_limiter,
+                        site_content_cache)
+from models import db, BlogPost, Lesson, User
+from pagination import keyset_paginate
+from rate_limit import normalize_phone
 
-# Функция для получения контента сайта (скопирована из app.py)
+main_bp = Blueprint('main', __name__)
+
+
+# Получение контента сайта (из кэша)
 def get_site_content(page_name, section_name, content_key, default_value=''):
-    content = SiteContent.query.filter_by(
-        page_name=page_name,
-        section_name=section_name,
-        content_key=content_key
-    ).first()
-    return content.content_value if content else default_value
+    return site_content_cache.get(page_name, section_name, content_key, default_value)
 
 @main_bp.route('/')
+@cached_page('site_content')
 def index():
     # Получаем контент для главной страницы из базы данных
     hero_title = get_site_content('index', 'hero', 'title', 'Английский язык для детей')
@@ -32,6 +33,7 @@ def index():
                          about_text=about_text)
 
 @main_bp.route('/services')
+@cached_page('lessons')
 def services():
     # Загружаем уроки из базы данных
     lessons = Lesson.query.all()
@@ -53,15 +55,35 @@ def services():
     return render_template('services.html', lessons=lessons)
 
 @main_bp.route('/contacts')
+@cached_page()
 def contacts():
     return render_template('contacts.html')
 
 @main_bp.route('/blog')
+@cached_page('blog', query=('after', 'before'))
 def blog():
-    posts = BlogPost.query.filter_by(is_published=True).order_by(BlogPost.created_at.desc()).all()
-    return render_template('blog.html', posts=posts)
+    page = keyset_paginate(
+        BlogPost.query.filter_by(is_published=True),
+        BlogPost.created_at, BlogPost.id,
+        after=request.args.get('after'),
+        before=request.args.get('before'),
+        per_page=current_app.config['BLOG_POSTS_PER_PAGE']
+    )
+    return render_template('blog.html', posts=page.items, page=page)
+
+# Отдельная страница поста
+@main_bp.route('/blog/<int:post_id>')
+@cached_page('blog')
+def blog_post(post_id):
+    post = BlogPost.query.filter_by(id=post_id, is_published=True).first_or_404()
+    return render_template('blog_post.html', post=post)
 
-# Отправка заявки на обучение
+# Atom-лента блога
+@main_bp.route('/blog/feed.xml')
+def blog_feed():
+    return blog_feed_cache.response()
+
+# Отправка заявки на обучание
 @main_bp.route('/submit_application', methods=['POST'])
 def submit_application():
     try:
@@ -74,35 +96,53 @@ def submit_application():
         if not name or not phone:
             return jsonify({'error': 'Имя и телефон обязательны для заполнения'}), 400
         
-        # Создаем новую заявку
-        application = Application(
-            name=name,
-            phone=phone,
-            email=email,
-            child_age=child_age,
-            message=message
-        )
-        db.session.add(application)
-        db.session.commit()
+        success = {'success': 'Заявка успешно отправлена! Мы свяжемся с вами в ближайшее время.'}
+        phone_key = normalize_phone(phone) or phone.strip().lower()
+        for key, limit in ((f'application:ip:{request.remote_addr}', 'APPLICATION_LIMIT_IP'),
+                           (f'application:phone:{phone_key}', 'APPLICATION_LIMIT_PHONE'),
+                           ('application:all', 'APPLICATION_LIMIT_GLOBAL')):
+            retry_after = rate_limiter.hit(key, *current_app.config[limit])
+            if retry_after:
+                response = jsonify({'error': 'Слишком много заявок. Попробуйте позже.'})
+                response.headers['Retry-After'] = str(retry_after)
+                return response, 429
+        
+        # Повторная отправка с того же телефона (двойной клик, повтор формы) - отвечаем успехом без записи
+        if not rate_limiter.first_seen(f'application:{phone_key}', current_app.config['APPLICATION_DEDUPE_WINDOW']):
+            return jsonify(success)
+        
+        # Ставим заявку в очередь на запись
+        queued = application_writer.add({
+            'name': name,
+            'phone': phone,
+            'email': email,
+            'child_age': child_age,
+            'message': message,
+            'status': 'new',
+            'created_at': datetime.utcnow()
+        })
+        if not queued:
+            return jsonify({'error': 'Ошибка при отправке заявки. Попробуйте позже.'}), 503
         
-        return jsonify({'success': 'Заявка успешно отправлена! Мы свяжемся с вами в ближайшее время.'})
+        return jsonify(success)
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': 'Ошибка при отправке заявки. Попробуйте позже.'}), 500
 
 # Личный кабинет
 @main_bp.route('/dashboard')
-@login_required  # Добавляем декоратор прямо здесь
+@login_required
 def dashboard():
     return render_template('dashboard.html')
 
-# Обновление профиля (оставляем в main, так как это общая функция)
+# Обновление профиля
 @main_bp.route('/update_profile', methods=['POST'])
-@login_required  # Добавляем декоратор прямо здесь
+@login_required
 def update_profile():
-    # from flask_login import current_user - уже импортирован выше
     phone = request.form['phone']
-    current_user.phone = phone
+    user = db.session.get(User, current_user.id)
+    user.phone = phone
+    identity_cache.invalidate(user.id)
     db.session.commit()
     flash('Профиль успешно обновлен!', 'success')
     return redirect(url_for('main.dashboard'))
@@ -0,0 +1,329 @@
+"""Метрики запросов (задержки, коды ответов, время БД и шаблонов) в формате Prometheus"""
+import fcntl
+import json
+import os
+import threading
+import time
+
+from flask import Response, abort, current_app, g, request
+from flask.signals import before_render_template, template_rendered
+from werkzeug.wsgi import ClosingIterator
+
+from sql_monitor import current_sql_stats
+
+# Сумма счетчиков завершившихся воркеров в каталоге METRICS_DIR
+DEAD_WORKERS_FILE = 'dead.json'
+
+# Границы корзин гистограммы задержек, в секундах
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Shard:
+    """Счетчики одного потока. Пишет в них только поток-владелец, поэтому блокировки не нужны"""
+    __slots__ = ('requests', 'buckets', 'durations', 'db_time', 'template_time', 'in_flight')
+
+    def __init__(self):
+        self.requests = {}       # (endpoint, method, status) -> количество
+        self.buckets = {}        # endpoint -> [счетчики по корзинам + корзина +Inf]
+        self.durations = {}      # endpoint -> суммарное время
+        self.db_time = {}        # endpoint -> суммарное время в БД
+        self.template_time = {}  # endpoint -> суммарное время рендеринга шаблонов
+        self.in_flight = 0
+
+
+class MetricsRegistry:
+    """Метрики процесса: набор потоковых счетчиков, которые сливаются при чтении"""
+
+    def __init__(self, metrics_dir=None, flush_interval=5.0):
+        self.metrics_dir = metrics_dir
+        self.flush_interval = flush_interval
+        self._local = threading.local()
+        self._shards = []
+        self._shards_lock = threading.Lock()  # Только для регистрации нового потока
+        self._flush_lock = threading.Lock()
+        self._last_flush = 0.0
+
+    def shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = _Shard()
+            with self._shards_lock:
+                self._shards.append(shard)
+        return shard
+
+    def observe(self, shard, endpoint, method, status, duration, db_time=0.0, template_time=0.0):
+        key = (endpoint, method, status)
+        shard.requests[key] = shard.requests.get(key, 0) + 1
+
+        buckets = shard.buckets.get(endpoint)
+        if buckets is None:
+            buckets = shard.buckets[endpoint] = [0] * (len(LATENCY_BUCKETS) + 1)
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if duration <= bound:
+                buckets[i] += 1
+                break
+        else:
+            buckets[-1] += 1
+        shard.durations[endpoint] = shard.durations.get(endpoint, 0.0) + duration
+        if db_time:
+            shard.db_time[endpoint] = shard.db_time.get(endpoint, 0.0) + db_time
+        if template_time:
+            shard.template_time[endpoint] = shard.template_time.get(endpoint, 0.0) + template_time
+
+        if self.metrics_dir and time.monotonic() - self._last_flush > self.flush_interval:
+            self._flush_due()
+
+    def snapshot(self):
+        """Сливает счетчики всех потоков процесса в один словарь (сериализуемый в JSON)"""
+        requests, buckets, durations, db_time, template_time = {}, {}, {}, {}, {}
+        in_flight = 0
+        for shard in list(self._shards):
+            for (endpoint, method, status), n in list(shard.requests.items()):
+                key = f'{endpoint}\t{method}\t{status}'
+                requests[key] = requests.get(key, 0) + n
+            for endpoint, counts in list(shard.buckets.items()):
+                total = buckets.setdefault(endpoint, [0] * len(counts))
+                for i, n in enumerate(counts):
+                    total[i] += n
+            for source, target in ((shard.durations, durations),
+                                   (shard.db_time, db_time),
+                                   (shard.template_time, template_time)):
+                for endpoint, value in list(source.items()):
+                    target[endpoint] = target.get(endpoint, 0.0) + value
+            in_flight += shard.in_flight
+        return {
+            'pid': os.getpid(),
+            'requests': requests,
+            'buckets': buckets,
+            'durations': durations,
+            'db_time': db_time,
+            'template_time': template_time,
+            'in_flight': in_flight,
+        }
+
+    def _flush_due(self):
+        # Срок мог наступить сразу в нескольких потоках: снимок пишет один, остальные не ждут
+        if not self._flush_lock.acquire(blocking=False):
+            return
+        try:
+            if time.monotonic() - self._last_flush > self.flush_interval:
+                self._write()
+        finally:
+            self._flush_lock.release()
+
+    def flush(self):
+        """Сохраняет снимок процесса в общий каталог для агрегации между воркерами"""
+        with self._flush_lock:
+            self._write()
+
+    def _write(self):
+        self._last_flush = time.monotonic()
+        os.makedirs(self.metrics_dir, exist_ok=True)
+        path = os.path.join(self.metrics_dir, f'{os.getpid()}.json')
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp_path, path)
+
+    def _read(self, name):
+        try:
+            with open(os.path.join(self.metrics_dir, name)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _absorb_dead(self):
+        """Снимки завершившихся воркеров сливаются в один файл и удаляются: при перезапуске
+        воркеров по max_requests файлы иначе копились бы и перечитывались при каждом опросе"""
+        with open(os.path.join(self.metrics_dir, '.lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            dead = []
+            for name in os.listdir(self.metrics_dir):
+                if name.endswith('.json') and name[:-5].isdigit() and not _pid_alive(int(name[:-5])):
+                    snapshot = self._read(name)
+                    if snapshot is not None:
+                        dead.append((name, snapshot))
+            if not dead:
+                return
+            previous = self._read(DEAD_WORKERS_FILE)
+            merged = merge_snapshots(([previous] if previous else []) + [snapshot for _, snapshot in dead])
+            merged['in_flight'] = 0  # Счетчики завершившихся воркеров сохраняем, а их "текущие запросы" - нет
+            merged['pid'] = None
+            path = os.path.join(self.metrics_dir, DEAD_WORKERS_FILE)
+            with open(f'{path}.tmp', 'w') as f:
+                json.dump(merged, f)
+            os.replace(f'{path}.tmp', path)
+            for name, _ in dead:
+                os.remove(os.path.join(self.metrics_dir, name))
+
+    def collect(self):
+        """Снимки всех воркеров (или только текущего процесса, если каталог не задан)"""
+        if not self.metrics_dir:
+            return [self.snapshot()]
+        self.flush()
+        self._absorb_dead()
+        snapshots = []
+        for name in os.listdir(self.metrics_dir):
+            if name.endswith('.json'):
+                snapshot = self._read(name)
+                if snapshot is not None:
+                    snapshots.append(snapshot)
+        return snapshots
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def merge_snapshots(snapshots):
+    merged = {'requests': {}, 'buckets': {}, 'durations': {}, 'db_time': {},
+              'template_time': {}, 'in_flight': 0}
+    for snapshot in snapshots:
+        for key in ('requests', 'durations', 'db_time', 'template_time'):
+            target = merged[key]
+            for name, value in snapshot[key].items():
+                target[name] = target.get(name, 0) + value
+        for endpoint, counts in snapshot['buckets'].items():
+            total = merged['buckets'].setdefault(endpoint, [0] * len(counts))
+            for i, n in enumerate(counts):
+                total[i] += n
+        merged['in_flight'] += snapshot['in_flight']
+    return merged
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_prometheus(merged):
+    """Текстовый формат Prometheus (exposition format 0.0.4)"""
+    lines = [
+        '# HELP http_requests_total Количество обработанных запросов',
+        '# TYPE http_requests_total counter',
+    ]
+    for key, n in sorted(merged['requests'].items()):
+        endpoint, method, status = key.split('\t')
+        lines.append(f'http_requests_total{{endpoint="{_label(endpoint)}",method="{method}",'
+                     f'status="{status}"}} {n}')
+
+    lines += [
+        '# HELP http_request_duration_seconds Время обработки запроса',
+        '# TYPE http_request_duration_seconds histogram',
+    ]
+    for endpoint, counts in sorted(merged['buckets'].items()):
+        label = _label(endpoint)
+        cumulative = 0
+        for bound, n in zip(LATENCY_BUCKETS, counts):
+            cumulative += n
+            lines.append(f'http_request_duration_seconds_bucket{{endpoint="{label}",le="{bound}"}} {cumulative}')
+        cumulative += counts[-1]
+        lines.append(f'http_request_duration_seconds_bucket{{endpoint="{label}",le="+Inf"}} {cumulative}')
+        lines.append(f'http_request_duration_seconds_sum{{endpoint="{label}"}} '
+                     f'{merged["durations"].get(endpoint, 0.0):.6f}')
+        lines.append(f'http_request_duration_seconds_count{{endpoint="{label}"}} {cumulative}')
+
+    for name, key, help_text in (
+        ('http_request_db_seconds_total', 'db_time', 'Время, проведенное в запросах к БД'),
+        ('http_request_template_seconds_total', 'template_time', 'Время рендеринга шаблонов'),
+    ):
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        for endpoint, value in sorted(merged[key].items()):
+            lines.append(f'{name}{{endpoint="{_label(endpoint)}"}} {value:.6f}')
+
+    lines += [
+        '# HELP http_requests_in_flight Запросы, обрабатываемые в данный момент',
+        '# TYPE http_requests_in_flight gauge',
+        f'http_requests_in_flight {merged["in_flight"]}',
+    ]
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsMiddleware:
+    """WSGI-прослойка: замеряет полное время запроса, включая отдачу тела ответа"""
+
+    def __init__(self, wsgi_app, registry):
+        self.wsgi_app = wsgi_app
+        self.registry = registry
+
+    def __call__(self, environ, start_response):
+        registry = self.registry
+        shard = registry.shard()
+        shard.in_flight += 1
+        started = time.perf_counter()
+        status = ['500']
+
+        def _start_response(status_line, headers, exc_info=None):
+            status[0] = status_line[:3]
+            return start_response(status_line, headers, exc_info)
+
+        def _finish():
+            shard.in_flight -= 1
+            registry.observe(
+                shard,
+                environ.get('metrics.endpoint') or 'unknown',
+                environ.get('REQUEST_METHOD', 'GET'),
+                status[0],
+                time.perf_counter() - started,
+                environ.get('metrics.db_time', 0.0),
+                environ.get('metrics.template_time', 0.0),
+            )
+
+        try:
+            result = self.wsgi_app(environ, _start_response)
+        except Exception:
+            _finish()
+            raise
+        return ClosingIterator(result, _finish)
+
+
+def _before_render(sender, template, context, **extra):
+    g._template_started = time.perf_counter()
+
+
+def _after_render(sender, template, context, **extra):
+    started = g.pop('_template_started', None)
+    if started is not None:
+        g._template_time = g.get('_template_time', 0.0) + time.perf_counter() - started
+
+
+def _store_request_metrics(response):
+    # Передаем данные Flask в WSGI-прослойку через environ
+    environ = request.environ
+    environ['metrics.endpoint'] = request.endpoint
+    stats = current_sql_stats()
+    if stats is not None:
+        environ['metrics.db_time'] = stats.total_time
+    environ['metrics.template_time'] = g.get('_template_time', 0.0)
+    return response
+
+
+def metrics_view():
+    token = current_app.config['METRICS_TOKEN']
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        abort(403)
+    registry = current_app.extensions['metrics']
+    body = render_prometheus(merge_snapshots(registry.collect()))
+    return Response(body, content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def init_metrics(app):
+    """Подключает сбор метрик и маршрут /metrics"""
+    app.config.setdefault('METRICS_DIR', None)
+    app.config.setdefault('METRICS_FLUSH_INTERVAL', 5.0)
+    app.config.setdefault('METRICS_TOKEN', None)
+
+    registry = MetricsRegistry(app.config['METRICS_DIR'], app.config['METRICS_FLUSH_INTERVAL'])
+    app.extensions['metrics'] = registry
+    app.wsgi_app = MetricsMiddleware(app.wsgi_app, registry)
+
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
+    app.after_request(_store_request_metrics)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
+    return registry
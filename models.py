@@ -1,10 +1,12 @@
-from flask_sqlalchemy import SQLAlchemy
-from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
+"""Модели базы данных. Единственный реестр моделей: db инициализируется в create_app (app.py)"""
 from datetime import datetime
-import pytz # Для функции to_dict в Message
 
-# Создаем экземпляр SQLAlchemy. Он будет инициализирован в app.py
+import pytz
+import sqlalchemy
+from flask_login import UserMixin
+from flask_sqlalchemy import SQLAlchemy
+from werkzeug.security import check_password_hash, generate_password_hash
+
 db = SQLAlchemy()
 
 # Модель пользователя
@@ -19,17 +21,29 @@ class User(UserMixin, db.Model):
     is_teacher = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
-    # Связи
-    group_memberships = db.relationship('GroupMember', back_populates='user', lazy=True, cascade='all, delete-orphan')
-    sent_messages = db.relationship('Message', foreign_keys='Message.sender_id', back_populates='sender', lazy=True)
-    received_messages = db.relationship('Message', foreign_keys='Message.recipient_id', back_populates='recipient', lazy=True)
-    homework_files = db.relationship('StudentHomeworkFile', back_populates='student', lazy=True, cascade='all, delete-orphan')
+    # Индексы под сортировки и фильтры списков пользователей в админке
+    __table_args__ = (
+        db.Index('ix_user_role_created', 'is_teacher', 'created_at', 'id'),
+        db.Index('ix_user_role_last_name', 'is_teacher', 'last_name', 'id'),
+        db.Index('ix_user_created', 'created_at', 'id'),
+        db.Index('ix_user_last_name', 'last_name', 'id'),
+        db.Index('ix_user_email_lower', db.func.lower(email)),
+    )
+    
+    # Связи (используем back_populates для избежания конфликтов)
+    group_memberships_rel = db.relationship('GroupMember', back_populates='user', lazy=True, cascade='all, delete-orphan')
+    sent_messages_rel = db.relationship('Message', foreign_keys='Message.sender_id', back_populates='sender', lazy=True)
+    received_messages_rel = db.relationship('Message', foreign_keys='Message.recipient_id', back_populates='recipient', lazy=True)
+    homework_files_rel = db.relationship('StudentHomeworkFile', back_populates='student', lazy=True, cascade='all, delete-orphan')
+    created_groups_rel = db.relationship('Group', foreign_keys='Group.created_by', back_populates='creator')
+    created_schedules_rel = db.relationship('Schedule', foreign_keys='Schedule.created_by', back_populates='creator')
+    created_homeworks_rel = db.relationship('Homework', foreign_keys='Homework.created_by', back_populates='creator')
+    homework_statuses_as_student_rel = db.relationship('StudentHomeworkStatus', foreign_keys='StudentHomeworkStatus.student_id', back_populates='student')
     
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
     
     def check_password(self, password):
-        # Импортируем здесь, так как check_password_hash уже импортирован
         return check_password_hash(self.password_hash, password)
     
     def __repr__(self):
@@ -56,6 +70,13 @@ class SiteContent(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+# Версии кэшей: общий для всех воркеров признак того, что данные изменились
+class CacheVersion(db.Model):
+    __tablename__ = 'cache_version'
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 # Модель постов блога
 class BlogPost(db.Model):
     __tablename__ = 'blog_post'
@@ -66,6 +87,12 @@ class BlogPost(db.Model):
     is_published = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Индексы для постраничного вывода по (created_at, id)
+    __table_args__ = (
+        db.Index('ix_blog_post_published_created', 'is_published', 'created_at', 'id'),
+        db.Index('ix_blog_post_created', 'created_at', 'id'),
+    )
 
 # Модель заявок на обучение
 class Application(db.Model):
@@ -80,6 +107,11 @@ class Application(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     processed_at = db.Column(db.DateTime, nullable=True)
     processed_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    
+    __table_args__ = (
+        db.Index('ix_application_status_created', 'status', 'created_at', 'id'),
+        db.Index('ix_application_created', 'created_at', 'id'),
+    )
 
 # Модель групп
 class Group(db.Model):
@@ -91,9 +123,11 @@ class Group(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     created_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     
-    # Связи
-    members = db.relationship('GroupMember', back_populates='group', lazy=True, cascade='all, delete-orphan')
-    creator = db.relationship('User', foreign_keys=[created_by])
+    # Связи (используем back_populates)
+    members_rel = db.relationship('GroupMember', back_populates='group', lazy=True, cascade='all, delete-orphan')
+    creator = db.relationship('User', foreign_keys=[created_by], back_populates='created_groups_rel')
+    schedules_rel = db.relationship('Schedule', back_populates='group')
+    homeworks_rel = db.relationship('Homework', back_populates='group')
 
 # Модель участников групп
 class GroupMember(db.Model):
@@ -103,12 +137,12 @@ class GroupMember(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     joined_at = db.Column(db.DateTime, default=datetime.utcnow)
     
-    # Связи
-    group = db.relationship('Group', back_populates='members')
-    user = db.relationship('User', back_populates='group_memberships')
-    
     # Уникальность: пользователь может быть в группе только один раз
     __table_args__ = (db.UniqueConstraint('group_id', 'user_id', name='unique_group_member'),)
+    
+    # Связи (используем back_populates)
+    group = db.relationship('Group', back_populates='members_rel')
+    user = db.relationship('User', back_populates='group_memberships_rel')
 
 # Модель расписания
 class Schedule(db.Model):
@@ -123,10 +157,65 @@ class Schedule(db.Model):
     created_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
-    # Связи
-    group = db.relationship('Group', foreign_keys=[group_id])
+    # Связи (используем back_populates)
+    group = db.relationship('Group', back_populates='schedules_rel')
     student = db.relationship('User', foreign_keys=[student_id])
-    creator = db.relationship('User', foreign_keys=[created_by])
+    creator = db.relationship('User', foreign_keys=[created_by], back_populates='created_schedules_rel')
+    homeworks_linked_rel = db.relationship('Homework', back_populates='schedule')
+    
+    # Календарь читается окнами: по времени, по группе и по ученику
+    __table_args__ = (
+        db.Index('ix_schedule_start_end', 'start_time', 'end_time'),
+        db.Index('ix_schedule_group_start', 'group_id', 'start_time'),
+        db.Index('ix_schedule_student_start', 'student_id', 'start_time'),
+    )
+
+# Модель повторяющегося занятия (серии). Повторения не хранятся, а вычисляются по правилу
+# для запрошенного окна дат (см. recurrence.py)
+class ScheduleSeries(db.Model):
+    __tablename__ = 'schedule_series'
+    id = db.Column(db.Integer, primary_key=True)
+    title = db.Column(db.String(200), nullable=False)
+    description = db.Column(db.Text, nullable=True)
+    start_time = db.Column(db.DateTime, nullable=False)  # Начало первого занятия
+    end_time = db.Column(db.DateTime, nullable=False)    # Конец первого занятия (задает длительность)
+    rrule = db.Column(db.String(200), nullable=False)    # Например, FREQ=WEEKLY;BYDAY=MO,WE;COUNT=30
+    last_start = db.Column(db.DateTime, nullable=True)   # Начало последнего занятия; NULL - без окончания
+    group_id = db.Column(db.Integer, db.ForeignKey('group.id'), nullable=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    created_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (db.Index('ix_schedule_series_range', 'start_time', 'last_start'),)
+    
+    group = db.relationship('Group')
+    student = db.relationship('User', foreign_keys=[student_id])
+    exceptions_rel = db.relationship('ScheduleException', back_populates='series', cascade='all, delete-orphan')
+
+# Исключение из серии: занятие original_start отменено или заменено отдельной записью Schedule
+class ScheduleException(db.Model):
+    __tablename__ = 'schedule_exception'
+    id = db.Column(db.Integer, primary_key=True)
+    series_id = db.Column(db.Integer, db.ForeignKey('schedule_series.id'), nullable=False)
+    original_start = db.Column(db.DateTime, nullable=False)
+    schedule_id = db.Column(db.Integer, db.ForeignKey('schedule.id', ondelete='SET NULL'), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (db.UniqueConstraint('series_id', 'original_start', name='unique_series_exception'),)
+    
+    series = db.relationship('ScheduleSeries', back_populates='exceptions_rel')
+    schedule = db.relationship('Schedule')
+
+# Секретная ссылка на календарь .ics ученика, группы или преподавателя (kind: student/group/teacher)
+class CalendarFeedToken(db.Model):
+    __tablename__ = 'calendar_feed_token'
+    id = db.Column(db.Integer, primary_key=True)
+    token = db.Column(db.String(64), unique=True, nullable=False)
+    kind = db.Column(db.String(20), nullable=False)
+    resource_id = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (db.UniqueConstraint('kind', 'resource_id', name='unique_calendar_feed'),)
 
 # Модель домашних заданий
 class Homework(db.Model):
@@ -142,13 +231,14 @@ class Homework(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
-    # Связи
-    group = db.relationship('Group', foreign_keys=[group_id])
+    # Связи (используем back_populates)
+    group = db.relationship('Group', back_populates='homeworks_rel')
     student = db.relationship('User', foreign_keys=[student_id])
-    schedule = db.relationship('Schedule', foreign_keys=[schedule_id])
-    creator = db.relationship('User', foreign_keys=[created_by])
-    files = db.relationship('HomeworkFile', back_populates='homework', lazy=True, cascade='all, delete-orphan')
-    student_files = db.relationship('StudentHomeworkFile', back_populates='homework', lazy=True, cascade='all, delete-orphan')
+    schedule = db.relationship('Schedule', back_populates='homeworks_linked_rel')
+    creator = db.relationship('User', foreign_keys=[created_by], back_populates='created_homeworks_rel')
+    files_rel = db.relationship('HomeworkFile', back_populates='homework', lazy=True, cascade='all, delete-orphan')
+    student_files_rel = db.relationship('StudentHomeworkFile', back_populates='homework', lazy=True, cascade='all, delete-orphan')
+    statuses_rel = db.relationship('StudentHomeworkStatus', back_populates='homework', lazy=True, cascade='all, delete-orphan')
 
 # Модель файлов домашних заданий (от преподавателя)
 class HomeworkFile(db.Model):
@@ -160,8 +250,8 @@ class HomeworkFile(db.Model):
     file_type = db.Column(db.String(50), nullable=False)  # image, document, etc.
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
     
-    # Связь
-    homework = db.relationship('Homework', back_populates='files')
+    # Связь (используем back_populates)
+    homework = db.relationship('Homework', back_populates='files_rel')
     
     def to_dict(self):
         return {
@@ -184,9 +274,9 @@ class StudentHomeworkFile(db.Model):
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
     comment = db.Column(db.Text, nullable=True)
     
-    # Связи
-    homework = db.relationship('Homework', back_populates='student_files')
-    student = db.relationship('User', back_populates='homework_files')
+    # Связи (используем back_populates)
+    homework = db.relationship('Homework', back_populates='student_files_rel')
+    student = db.relationship('User', back_populates='homework_files_rel')
     
     def to_dict(self):
         return {
@@ -212,12 +302,12 @@ class StudentHomeworkStatus(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
-    # Связи
-    homework = db.relationship('Homework', foreign_keys=[homework_id])
-    student = db.relationship('User', foreign_keys=[student_id])
-    
     # Уникальность: ученик может иметь только один статус для каждого задания
     __table_args__ = (db.UniqueConstraint('homework_id', 'student_id', name='unique_student_homework'),)
+    
+    # Связи (используем back_populates)
+    homework = db.relationship('Homework', back_populates='statuses_rel')
+    student = db.relationship('User', foreign_keys=[student_id], back_populates='homework_statuses_as_student_rel')
 
 # Модель файлов в чате
 class ChatFile(db.Model):
@@ -229,8 +319,8 @@ class ChatFile(db.Model):
     file_type = db.Column(db.String(50), nullable=False)  # image, document, etc.
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
     
-    # Связь с сообщением
-    message = db.relationship('Message', back_populates='files')
+    # Связь с сообщением (используем back_populates)
+    message = db.relationship('Message', back_populates='files_rel')
     
     def to_dict(self):
         return {
@@ -251,14 +341,13 @@ class Message(db.Model):
     is_read = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
-    # Связи
-    sender = db.relationship('User', foreign_keys=[sender_id], back_populates='sent_messages')
-    recipient = db.relationship('User', foreign_keys=[recipient_id], back_populates='received_messages')
-    files = db.relationship('ChatFile', back_populates='message', lazy=True)
+    # Связи (используем back_populates)
+    sender = db.relationship('User', foreign_keys=[sender_id], back_populates='sent_messages_rel')
+    recipient = db.relationship('User', foreign_keys=[recipient_id], back_populates='received_messages_rel')
+    files_rel = db.relationship('ChatFile', back_populates='message', lazy=True)
     
     def to_dict(self):
         # Конвертируем время в локальное время пользователя
-        # pytz уже импортирован в начале файла
         local_tz = pytz.timezone('Europe/Moscow')  # Измените на ваш часовой пояс
         utc_time = self.created_at
         if utc_time.tzinfo is None:
@@ -272,5 +361,43 @@ class Message(db.Model):
             'content': self.content,
             'is_read': self.is_read,
             'created_at': local_time.isoformat(),
-            'files': [file.to_dict() for file in self.files]
+            'files': [file.to_dict() for file in self.files_rel]
         }
+
+
+# Аренда лидерства планировщика задач: задачи выполняет только процесс, который продлевает
+# аренду (holder), пока она не истекла (expires_at). Время в UTC
+class SchedulerLease(db.Model):
+    __tablename__ = 'scheduler_lease'
+    name = db.Column(db.String(50), primary_key=True)
+    holder = db.Column(db.String(120))
+    expires_at = db.Column(db.DateTime, nullable=False)
+    heartbeat_at = db.Column(db.DateTime)
+
+# Запуски задач планировщика (status: running, success, failed, missed, abandoned). Уникальность
+# (job, scheduled_for) не дает двум процессам выполнить один и тот же запуск
+class JobRun(db.Model):
+    __tablename__ = 'job_run'
+    id = db.Column(db.Integer, primary_key=True)
+    job = db.Column(db.String(100), nullable=False)
+    scheduled_for = db.Column(db.DateTime, nullable=False)
+    holder = db.Column(db.String(120))
+    status = db.Column(db.String(20), nullable=False, default='running')
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+    duration = db.Column(db.Float)  # Секунды
+    error = db.Column(db.Text)
+    
+    __table_args__ = (
+        db.UniqueConstraint('job', 'scheduled_for', name='unique_job_run'),
+        db.Index('ix_job_run_started', 'started_at'),
+    )
+
+# Создание индексов, объявленных в моделях, для уже существующих таблиц
+# (db.create_all() создает индексы только вместе с новыми таблицами)
+def ensure_indexes():
+    # IF NOT EXISTS, а не checkfirst: SQLAlchemy не видит в SQLite индексы по выражениям
+    with db.engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                connection.execute(sqlalchemy.schema.CreateIndex(index, if_not_exists=True))
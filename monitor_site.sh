@@ -4,10 +4,20 @@ echo "=== Мониторинг сайта преподавателя англи
 echo "Нажмите Ctrl+C для выхода"
 echo ""
 
+# Состояние воркера, ответившего на запрос: база, блокировка записи, место на диске,
+# лидер планировщика, возраст резервной копии (503 - воркер не готов)
+echo "Готовность (/readyz):"
+curl -sS --max-time 2 -w "\nHTTP %{http_code}\n" http://localhost:5000/readyz
+echo ""
+
 # Показываем последние логи
 echo "Последние сообщения от сайта:"
 sudo journalctl -u english-teacher-site.service -n 20 --no-pager
 
+echo ""
+echo "Логи в JSON; отбор записей, например ошибки и медленные запросы за час:"
+echo "   sudo journalctl -u english-teacher-site.service -o cat | flask --app app logs --file - --level WARNING --since 60"
+
 echo ""
 echo "В реальном времени (нажмите Ctrl+C для остановки):"
 echo ""
@@ -0,0 +1,148 @@
+"""Кэш готовых страниц для анонимных посетителей (ETag, 304, необязательный дисковый уровень)"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from functools import wraps
+from urllib.parse import urlencode
+
+from flask import make_response, request, session
+from flask_login import current_user
+
+
+class CachedPage:
+    __slots__ = ('key', 'body', 'mimetype', 'etag')
+
+    def __init__(self, key, body, mimetype, etag=None):
+        self.key = key
+        self.body = body
+        self.mimetype = mimetype
+        self.etag = etag or hashlib.sha256(body).hexdigest()[:32]
+
+
+class PageCache:
+    """Страницы кэшируются по пути, параметрам запроса, которые читает маршрут, и версиям данных,
+    от которых они зависят. Прочие параметры в ключ не входят: иначе каждый новый ?x=... занимал бы
+    место в кэше. Дисковый уровень ограничен max_disk_files файлами, лишние удаляются начиная со старых"""
+
+    def __init__(self, versions, max_entries=256, cache_dir=None, max_disk_files=1000):
+        self.versions = versions
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.max_disk_files = max_disk_files
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _page(query):
+        values = [(name, value) for name in sorted(query) for value in request.args.getlist(name)]
+        return f'{request.path}?{urlencode(values)}' if values else request.path
+
+    def _key(self, page, dependencies):
+        parts = [page]
+        parts += [f'{name}={self.versions.current(name)}' for name in dependencies]
+        return '|'.join(parts)
+
+    def _disk_path(self, page):
+        # Один файл на страницу: при изменении версий файл перезаписывается
+        digest = hashlib.sha256(page.encode()).hexdigest()
+        return os.path.join(self.cache_dir, f'{digest}.page')
+
+    def get(self, key, page):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+        if self.cache_dir:
+            entry = self._read_disk(key, page)
+            if entry is not None:
+                self._remember(entry)
+        return entry
+
+    def store(self, entry, page):
+        self._remember(entry)
+        if self.cache_dir:
+            self._write_disk(entry, page)
+            self._prune_disk()
+
+    def _remember(self, entry):
+        with self._lock:
+            self._entries[entry.key] = entry
+            self._entries.move_to_end(entry.key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _read_disk(self, key, page):
+        try:
+            with open(self._disk_path(page), 'rb') as f:
+                meta = json.loads(f.readline())
+                if meta['key'] != key:
+                    return None
+                return CachedPage(key, f.read(), meta['mimetype'], meta['etag'])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _write_disk(self, entry, page):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._disk_path(page)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        meta = {'key': entry.key, 'mimetype': entry.mimetype, 'etag': entry.etag}
+        with open(tmp_path, 'wb') as f:
+            f.write(json.dumps(meta).encode() + b'\n')
+            f.write(entry.body)
+        os.replace(tmp_path, path)
+
+    def _prune_disk(self):
+        # Запись бывает только при промахе, поэтому просмотр каталога здесь недорог
+        try:
+            files = [item for item in os.scandir(self.cache_dir) if item.name.endswith('.page')]
+        except OSError:
+            return
+        if len(files) <= self.max_disk_files:
+            return
+        files.sort(key=lambda item: item.stat().st_mtime)
+        for item in files[:len(files) - self.max_disk_files]:
+            try:
+                os.remove(item.path)
+            except OSError:
+                pass  # Файл уже удалил другой воркер
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def serve(self, dependencies, view, args, kwargs, query=()):
+        """Ответ маршрута view из кэша или после его вызова; dependencies - имена версий из CacheVersions,
+        query - параметры запроса, от которых зависит страница"""
+        # Кэшируем только анонимные GET без flash-сообщений в сессии
+        if (request.method != 'GET' or current_user.is_authenticated
+                or '_flashes' in session):
+            return view(*args, **kwargs)
+
+        page = self._page(query)
+        key = self._key(page, dependencies)
+        entry = self.get(key, page)
+        if entry is None:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200 or 'Set-Cookie' in response.headers:
+                return response
+            entry = CachedPage(key, response.get_data(), response.mimetype)
+            self.store(entry, page)
+
+        response = make_response(entry.body)
+        response.mimetype = entry.mimetype
+        response.set_etag(entry.etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        response.vary.add('Cookie')
+        return response.make_conditional(request)
+
+    def cached(self, *dependencies, query=()):
+        """Декоратор маршрута: dependencies - имена версий из CacheVersions, query - читаемые параметры запроса"""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                return self.serve(dependencies, view, args, kwargs, query)
+            return wrapper
+        return decorator
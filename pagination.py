@@ -0,0 +1,92 @@
+"""Постраничный вывод по ключу (keyset): стоимость страницы не зависит от ее номера"""
+import base64
+import json
+from datetime import datetime
+
+from flask import abort, request, url_for
+from sqlalchemy import tuple_
+
+
+class KeysetPage:
+    def __init__(self, items, prev_cursor=None, next_cursor=None):
+        self.items = items
+        self.prev_cursor = prev_cursor
+        self.next_cursor = next_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def encode_cursor(values):
+    payload = [{'dt': value.isoformat()} if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        values = tuple(datetime.fromisoformat(value['dt']) if isinstance(value, dict) else value
+                       for value in payload)
+    except (ValueError, TypeError, KeyError):
+        abort(400)
+    # Курсор приходит от клиента: чужая форма дошла бы до сравнения кортежей в SQL и дала бы 500
+    if not isinstance(payload, list) or len(values) != 2 or \
+            not all(value is None or isinstance(value, (datetime, str, int, float)) for value in values):
+        abort(400)
+    return values
+
+
+def keyset_paginate(query, sort_column, id_column, after=None, before=None,
+                    per_page=20, descending=True):
+    """Страница query, упорядоченной по (sort_column, id_column).
+
+    after - курсор последней записи предыдущей страницы (идем дальше по порядку),
+    before - курсор первой записи следующей страницы (идем назад).
+    """
+    key_attrs = (sort_column.key, id_column.key)
+    key = tuple_(sort_column, id_column)
+
+    def _cursor(item):
+        return encode_cursor([getattr(item, attr) for attr in key_attrs])
+
+    backwards = before is not None and after is None
+    forward_order = (sort_column.desc(), id_column.desc()) if descending else (sort_column, id_column)
+    backward_order = (sort_column, id_column) if descending else (sort_column.desc(), id_column.desc())
+
+    if backwards:
+        values = decode_cursor(before)
+        query = query.filter(key > values if descending else key < values).order_by(*backward_order)
+    else:
+        if after is not None:
+            values = decode_cursor(after)
+            query = query.filter(key < values if descending else key > values)
+        query = query.order_by(*forward_order)
+
+    rows = query.limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    items = rows[:per_page]
+    if backwards:
+        items.reverse()
+
+    if not items:
+        return KeysetPage(items)
+    if backwards:
+        prev_cursor = _cursor(items[0]) if has_more else None
+        next_cursor = _cursor(items[-1])
+    else:
+        prev_cursor = _cursor(items[0]) if after is not None else None
+        next_cursor = _cursor(items[-1]) if has_more else None
+    return KeysetPage(items, prev_cursor, next_cursor)
+
+
+def page_url(**changes):
+    """URL текущей страницы с теми же параметрами, кроме курсоров и переданных изменений"""
+    args = request.args.to_dict()
+    args.pop('after', None)
+    args.pop('before', None)
+    args.update({name: value for name, value in changes.items() if value is not None})
+    return url_for(request.endpoint, **(request.view_args or {}), **args)
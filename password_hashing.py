@@ -0,0 +1,106 @@
+"""Хеширование и проверка паролей в отдельном пуле процессов с ограниченной очередью"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class HasherBusy(Exception):
+    """Пул занят: очередь заполнена или ответ не пришел вовремя"""
+
+
+@lru_cache(maxsize=8)
+def _method_prefix(method):
+    # Полная запись параметров метода, как она хранится в хеше (например, 'scrypt:32768:8:1')
+    return generate_password_hash('', method).split('$', 1)[0]
+
+
+def hash_password(password, method):
+    return generate_password_hash(password, method)
+
+
+def verify_password(password_hash, password, method):
+    """Проверяет пароль. Возвращает (совпал, новый хеш или None, если параметры актуальны)"""
+    if not check_password_hash(password_hash, password):
+        return False, None
+    if password_hash.split('$', 1)[0] != _method_prefix(method):
+        return True, generate_password_hash(password, method)
+    return True, None
+
+
+class PasswordHasher:
+    """Пул из max_workers процессов. Вместе с выполняемыми в очереди может стоять не больше
+    max_queue задач - следующие сразу получают HasherBusy, а не ждут, занимая поток воркера.
+    При max_workers = 0 хеширование выполняется в вызывающем потоке."""
+
+    def __init__(self, method='scrypt', max_workers=2, max_queue=8, timeout=5.0):
+        self.method = method
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        # Пул создается лениво в процессе воркера. forkserver, а не fork: воркер gunicorn
+        # многопоточный (потоки запросов, логов, пакетной записи, планировщика), и дочерний
+        # процесс, полученный fork, может унаследовать захваченную блокировку. Сервер forkserver
+        # один раз импортирует запускаемый скрипт (serve.py - без запуска сервера)
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    self._executor = ProcessPoolExecutor(
+                        self.max_workers, mp_context=multiprocessing.get_context('forkserver')
+                    )
+                    self._pid = os.getpid()
+        return self._executor
+
+    def _discard(self, executor):
+        """Сломанный пул (дочерний процесс убит OOM, упал) заменяется новым при следующем вызове"""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, func, *args):
+        if not self.max_workers:
+            return func(*args)
+        # Вторая попытка - на новом пуле, если прежний оказался сломан
+        for _ in range(2):
+            if not self._slots.acquire(blocking=False):
+                raise HasherBusy()
+            executor = self._pool()
+            try:
+                future = executor.submit(func, *args)
+            except BrokenProcessPool:
+                self._slots.release()
+                self._discard(executor)
+                continue
+            except Exception:
+                self._slots.release()
+                raise
+            # Слот освобождается, когда задача действительно завершилась, а не когда мы перестали ждать
+            future.add_done_callback(lambda _: self._slots.release())
+            try:
+                return future.result(self.timeout)
+            except TimeoutError:
+                raise HasherBusy()
+            except BrokenProcessPool:
+                self._discard(executor)
+        raise HasherBusy()
+
+    def hash(self, password):
+        return self._run(hash_password, password, self.method)
+
+    def verify(self, password_hash, password):
+        """(совпал, новый хеш при устаревших параметрах или None)"""
+        return self._run(verify_password, password_hash, password, self.method)
+
+    def shutdown(self):
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(cancel_futures=True)
@@ -0,0 +1,285 @@
+"""Профилирование живых маршрутов по запросу преподавателя (cProfile или сэмплирование стека)"""
+import cProfile
+import hmac
+import os
+import re
+import sys
+import threading
+import time
+import zlib
+from collections import Counter
+from datetime import datetime
+from html import escape
+
+from flask import Blueprint, Response, abort, current_app, g, jsonify, request, send_from_directory
+from flask_login import current_user
+
+profiler_bp = Blueprint('profiler', __name__, url_prefix='/admin/profiler')
+
+MODES = ('cprofile', 'sampler')
+_PROFILE_NAME_RE = re.compile(r'^[\w.-]+\.(pstats|collapsed)$')
+
+# Занят, пока в процессе работает cProfile (захватывается без ожидания)
+_cprofile_slot = threading.Lock()
+
+
+class ProfilerState:
+    """Что и как профилировать. Пока active=False, на запросы не тратится ничего, кроме одной проверки"""
+
+    def __init__(self):
+        self.active = False
+        self._lock = threading.Lock()
+        self.mode = 'cprofile'
+        self.endpoint = None
+        self.remaining = 0
+        self.sample_every = 1
+        self.seen = 0
+
+    def arm(self, mode, endpoint=None, requests_count=1, sample_every=1):
+        with self._lock:
+            self.mode = mode
+            self.endpoint = endpoint or None
+            self.remaining = requests_count
+            self.sample_every = max(1, sample_every)
+            self.seen = 0
+            self.active = requests_count > 0
+
+    def disarm(self):
+        with self._lock:
+            self.active = False
+            self.remaining = 0
+
+    def claim(self, endpoint):
+        """Решает, профилировать ли этот запрос (N следующих запросов, из них каждый K-й)"""
+        with self._lock:
+            if not self.active or (self.endpoint and endpoint != self.endpoint):
+                return None
+            self.seen += 1
+            if self.seen % self.sample_every:
+                return None
+            self.remaining -= 1
+            if self.remaining <= 0:
+                self.active = False
+            return self.mode
+
+    def to_dict(self):
+        return {
+            'active': self.active,
+            'mode': self.mode,
+            'endpoint': self.endpoint,
+            'remaining': self.remaining,
+            'sample_every': self.sample_every,
+        }
+
+
+class StackSampler:
+    """Фоновый поток, который периодически снимает стек потока запроса"""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(names))] += 1
+
+    def collapsed(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+def _profile_dir():
+    path = current_app.config['PROFILER_DIR']
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _start_profiling():
+    state = current_app.extensions['profiler']
+    if not state.active:
+        return
+    mode = state.claim(request.endpoint)
+    if mode == 'cprofile':
+        # cProfile - один на процесс: в Python 3.12 второй enable() при активном профиле дает
+        # ValueError. Запросы, пересекшиеся с профилируемым, снимаются сэмплером
+        profile = cProfile.Profile()
+        if not _cprofile_slot.acquire(blocking=False):
+            mode = 'sampler'
+        else:
+            try:
+                profile.enable()
+            except ValueError:
+                # Профилированием процесса уже занят другой инструмент
+                _cprofile_slot.release()
+                mode = 'sampler'
+            else:
+                g._profiler = (mode, profile, time.perf_counter())
+    if mode == 'sampler':
+        sampler = StackSampler(threading.get_ident(), current_app.config['PROFILER_SAMPLE_INTERVAL'])
+        g._profiler = (mode, sampler, time.perf_counter())
+        sampler.start()
+
+
+def _stop_profiling(exc):
+    profiler = g.pop('_profiler', None)
+    if profiler is None:
+        return
+    mode, collector, started = profiler
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+    base_name = f'{timestamp}_{request.endpoint or "unknown"}_{elapsed_ms:.0f}ms'
+    if mode == 'cprofile':
+        collector.disable()
+        _cprofile_slot.release()
+        collector.dump_stats(os.path.join(_profile_dir(), f'{base_name}.pstats'))
+    else:
+        collector.stop()
+        with open(os.path.join(_profile_dir(), f'{base_name}.collapsed'), 'w') as f:
+            f.write(collector.collapsed())
+
+
+def _require_access():
+    # Доступ: только преподаватель и только с токеном профилировщика
+    token = current_app.config['PROFILER_TOKEN']
+    if not token:
+        abort(404)
+    if not current_user.is_authenticated or not current_user.is_teacher:
+        abort(403)
+    supplied = request.headers.get('X-Profiler-Token') or request.args.get('token') or ''
+    if not hmac.compare_digest(supplied, token):
+        abort(403)
+
+
+profiler_bp.before_request(_require_access)
+
+
+@profiler_bp.route('')
+def profiler_status():
+    files = sorted((name for name in os.listdir(_profile_dir()) if _PROFILE_NAME_RE.match(name)),
+                   reverse=True)
+    return jsonify({'state': current_app.extensions['profiler'].to_dict(), 'profiles': files})
+
+
+@profiler_bp.route('/start', methods=['POST'])
+def profiler_start():
+    data = request.get_json(silent=True) or request.form
+    mode = data.get('mode', 'cprofile')
+    if mode not in MODES:
+        return jsonify({'error': f'Неизвестный режим: {mode}'}), 400
+    endpoint = data.get('endpoint') or None
+    if endpoint and endpoint not in current_app.view_functions:
+        return jsonify({'error': f'Неизвестный маршрут: {endpoint}'}), 400
+    try:
+        requests_count = int(data.get('requests', 1))
+        sample_every = int(data.get('sample_every', 1))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'requests и sample_every должны быть числами'}), 400
+    requests_count = min(requests_count, current_app.config['PROFILER_MAX_REQUESTS'])
+
+    state = current_app.extensions['profiler']
+    state.arm(mode, endpoint, requests_count, sample_every)
+    return jsonify({'success': 'Профилирование включено', 'state': state.to_dict()})
+
+
+@profiler_bp.route('/stop', methods=['POST'])
+def profiler_stop():
+    state = current_app.extensions['profiler']
+    state.disarm()
+    return jsonify({'success': 'Профилирование выключено', 'state': state.to_dict()})
+
+
+@profiler_bp.route('/<name>')
+def profiler_download(name):
+    if not _PROFILE_NAME_RE.match(name):
+        abort(404)
+    return send_from_directory(os.path.abspath(_profile_dir()), name, as_attachment=True)
+
+
+@profiler_bp.route('/<name>/flamegraph.svg')
+def profiler_flamegraph(name):
+    if not _PROFILE_NAME_RE.match(name) or not name.endswith('.collapsed'):
+        abort(404)
+    path = os.path.join(_profile_dir(), name)
+    if not os.path.exists(path):
+        abort(404)
+    with open(path) as f:
+        svg = render_flamegraph(f.read())
+    return Response(svg, mimetype='image/svg+xml',
+                    headers={'Content-Disposition': f'attachment; filename={name}.svg'})
+
+
+def render_flamegraph(collapsed, width=1200, row_height=16):
+    """Простой flamegraph в SVG из свернутых стеков ("a;b;c 12")"""
+    root = {'children': {}, 'count': 0}
+    for line in collapsed.splitlines():
+        stack, _, count = line.rpartition(' ')
+        if not stack or not count.isdigit():
+            continue
+        count = int(count)
+        root['count'] += count
+        node = root
+        for name in stack.split(';'):
+            node = node['children'].setdefault(name, {'children': {}, 'count': 0})
+            node['count'] += count
+
+    total = root['count'] or 1
+    rects = []
+
+    def _walk(node, depth, x):
+        for name, child in sorted(node['children'].items()):
+            w = child['count'] / total * width
+            if w >= 0.5:
+                rects.append((x, depth, w, name, child['count']))
+                _walk(child, depth + 1, x)
+            x += w
+
+    _walk(root, 0, 0.0)
+    max_depth = max((depth for _, depth, _, _, _ in rects), default=0) + 1
+    height = max_depth * row_height
+    parts = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+             f'font-family="monospace" font-size="11">']
+    for x, depth, w, name, count in rects:
+        y = height - (depth + 1) * row_height
+        hue = 20 + zlib.crc32(name.encode()) % 40
+        label = escape(name)
+        parts.append(
+            f'<g><title>{label} ({count} samples, {count / total:.1%})</title>'
+            f'<rect x="{x:.1f}" y="{y}" width="{w:.1f}" height="{row_height - 1}" '
+            f'fill="hsl({hue},90%,60%)"/>'
+        )
+        if w > 40:
+            parts.append(f'<text x="{x + 3:.1f}" y="{y + row_height - 4}">{escape(name[:int(w / 7)])}</text>')
+        parts.append('</g>')
+    parts.append('</svg>')
+    return '\n'.join(parts)
+
+
+def init_profiler(app):
+    """Подключает профилировщик: без PROFILER_TOKEN он полностью выключен"""
+    app.config.setdefault('PROFILER_TOKEN', None)
+    app.config.setdefault('PROFILER_DIR', 'profiles')
+    app.config.setdefault('PROFILER_SAMPLE_INTERVAL', 0.005)
+    app.config.setdefault('PROFILER_MAX_REQUESTS', 100)
+
+    app.extensions['profiler'] = ProfilerState()
+    if app.config['PROFILER_TOKEN']:
+        app.before_request(_start_profiling)
+        app.teardown_request(_stop_profiling)
+    app.register_blueprint(profiler_bp)
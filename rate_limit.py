@@ -0,0 +1,219 @@
+"""Ограничение частоты запросов (token bucket) и защита приема заявок от флуда"""
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+
+
+class MemoryBucketStore:
+    """Корзины в памяти процесса: у каждого воркера свои лимиты"""
+
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # ключ -> (токены, время обновления)
+        self._seen = OrderedDict()     # ключ -> время последнего появления
+        self._lock = threading.Lock()
+
+    def _remember(self, table, key, value):
+        table[key] = value
+        table.move_to_end(key)
+        while len(table) > self.max_keys:
+            table.popitem(last=False)
+
+    def consume(self, key, capacity, rate, now):
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            if tokens < 1:
+                return False
+            self._remember(self._buckets, key, (tokens - 1, now))
+            return True
+
+    def first_seen(self, key, window, now):
+        with self._lock:
+            seen_at = self._seen.get(key)
+            if seen_at is not None and now - seen_at < window:
+                return False
+            self._remember(self._seen, key, now)
+            return True
+
+
+class SQLiteBucketStore:
+    """Корзины в отдельном маленьком файле SQLite, общем для всех воркеров.
+
+    Каждая проверка - один атомарный UPSERT, поэтому воркеры не мешают друг
+    другу, а основная база (и ее блокировка на запись) не затрагивается.
+    """
+
+    def __init__(self, path, cleanup_interval=300.0):
+        self.path = path
+        self.cleanup_interval = cleanup_interval
+        self._local = threading.local()
+        self._cleaned_at = time.monotonic()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = self._connection()
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS bucket (key TEXT PRIMARY KEY, tokens REAL NOT NULL, '
+            'updated REAL NOT NULL, full_at REAL NOT NULL)'
+        )
+        connection.execute('CREATE TABLE IF NOT EXISTS seen (key TEXT PRIMARY KEY, seen_at REAL NOT NULL)')
+
+    def _connection(self):
+        # Соединение на поток и на процесс (после fork старое соединение использовать нельзя)
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=2.0, isolation_level=None)
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _cleanup(self, connection, now):
+        if time.monotonic() - self._cleaned_at < self.cleanup_interval:
+            return
+        self._cleaned_at = time.monotonic()
+        # Полные корзины ничем не отличаются от отсутствующих
+        connection.execute('DELETE FROM bucket WHERE full_at < ?', (now,))
+        connection.execute('DELETE FROM seen WHERE seen_at < ?', (now - 86400,))
+
+    def consume(self, key, capacity, rate, now):
+        connection = self._connection()
+        self._cleanup(connection, now)
+        # Токен списывается, только если он есть; при отказе строка не меняется
+        cursor = connection.execute(
+            'INSERT INTO bucket (key, tokens, updated, full_at) VALUES (?1, ?2 - 1, ?4, ?4 + 1 / ?3) '
+            'ON CONFLICT(key) DO UPDATE SET '
+            'tokens = min(?2, tokens + (?4 - updated) * ?3) - 1, '
+            'updated = ?4, '
+            'full_at = ?4 + (?2 - (min(?2, tokens + (?4 - updated) * ?3) - 1)) / ?3 '
+            'WHERE min(?2, tokens + (?4 - updated) * ?3) >= 1',
+            (key, capacity, rate, now)
+        )
+        return cursor.rowcount == 1
+
+    def first_seen(self, key, window, now):
+        connection = self._connection()
+        cursor = connection.execute(
+            'INSERT INTO seen (key, seen_at) VALUES (?1, ?2) '
+            'ON CONFLICT(key) DO UPDATE SET seen_at = ?2 WHERE seen_at <= ?2 - ?3',
+            (key, now, window)
+        )
+        return cursor.rowcount == 1
+
+
+class RateLimiter:
+    """Token bucket: capacity запросов подряд, затем по одному каждые period / capacity секунд"""
+
+    def __init__(self, store):
+        self.store = store
+
+    def hit(self, key, capacity, period):
+        """Списывает токен. Возвращает 0, если запрос разрешен, иначе - через сколько секунд повторить"""
+        rate = capacity / period
+        try:
+            allowed = self.store.consume(key, capacity, rate, time.time())
+        except sqlite3.Error:
+            # Хранилище лимитов недоступно - лучше пропустить запрос, чем отказать всем
+            current_app.logger.exception('Ошибка хранилища лимитов')
+            return 0
+        return 0 if allowed else max(1, int(1 / rate))
+
+    def first_seen(self, key, window):
+        """True, если ключ не встречался последние window секунд (и запоминает его)"""
+        try:
+            return self.store.first_seen(key, window, time.time())
+        except sqlite3.Error:
+            current_app.logger.exception('Ошибка хранилища лимитов')
+            return True
+
+
+def normalize_phone(phone):
+    """Телефон для сравнения: только цифры, российские 8XXXXXXXXXX и XXXXXXXXXX приводятся к 7XXXXXXXXXX"""
+    digits = re.sub(r'\D', '', phone or '')
+    if len(digits) == 11 and digits.startswith('8'):
+        digits = '7' + digits[1:]
+    elif len(digits) == 10:
+        digits = '7' + digits
+    return digits
+
+
+class BatchWriter:
+    """Копит строки для вставки и пишет их пачкой из фонового потока раз в interval секунд.
+
+    Запрос не ждет блокировки основной базы: сотня заявок от бота превращается в одну
+    транзакцию. При interval = 0 строки пишутся сразу в вызывающем потоке.
+    """
+
+    def __init__(self, app, db, table, interval=0.5, max_batch=100, max_pending=5000):
+        self.app = app
+        self.db = db
+        self.table = table
+        self.interval = interval
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self._pending = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def add(self, row):
+        """Ставит строку в очередь. False, если очередь переполнена"""
+        if not self.interval:
+            self._write([row])
+            return True
+        with self._lock:
+            if len(self._pending) >= self.max_pending:
+                return False
+            self._pending.append(row)
+            if len(self._pending) >= self.max_batch:
+                self._wakeup.set()
+        self._ensure_thread()
+        return True
+
+    def _ensure_thread(self):
+        # Поток создается в том процессе, который пишет (после fork потоки родителя не живут)
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='batch-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def _write(self, rows):
+        with self.app.app_context():
+            try:
+                self.db.session.execute(self.table.insert(), rows)
+                self.db.session.commit()
+            except Exception:
+                self.db.session.rollback()
+                raise
+
+    def flush(self):
+        """Записывает накопленное. При ошибке строки возвращаются в очередь до следующей попытки"""
+        with self._lock:
+            rows, self._pending = self._pending, []
+        if not rows:
+            return 0
+        try:
+            self._write(rows)
+        except Exception:
+            self.app.logger.exception('Не удалось записать %d строк в %s', len(rows), self.table.name)
+            with self._lock:
+                self._pending = (rows + self._pending)[:self.max_pending]
+            return 0
+        return len(rows)
@@ -0,0 +1,209 @@
+"""Повторяющиеся занятия: правила в духе RRULE и ленивое развертывание в окне дат"""
+import calendar
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+WEEKDAYS = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+FREQUENCIES = ('DAILY', 'WEEKLY', 'MONTHLY')
+MAX_COUNT = 1000
+
+
+class RecurrenceRule:
+    """Подмножество RFC 5545 RRULE: FREQ=DAILY|WEEKLY|MONTHLY, INTERVAL, BYDAY (для WEEKLY),
+    COUNT и UNTIL. MONTHLY повторяет число месяца из начала серии, месяцы без такого числа пропускаются"""
+
+    def __init__(self, freq, interval=1, byday=(), count=None, until=None):
+        if freq not in FREQUENCIES:
+            raise ValueError('Неизвестная периодичность повторения')
+        if interval < 1:
+            raise ValueError('Интервал повторения должен быть положительным')
+        if count is not None and not 1 <= count <= MAX_COUNT:
+            raise ValueError(f'Число повторений должно быть от 1 до {MAX_COUNT}')
+        if count is not None and until is not None:
+            raise ValueError('Укажите либо число повторений, либо дату окончания')
+        self.freq = freq
+        self.interval = interval
+        self.byday = tuple(sorted(set(byday), key=WEEKDAYS.index))
+        self.count = count
+        self.until = until
+
+    @classmethod
+    def parse(cls, text):
+        parts = {}
+        for part in text.strip().upper().split(';'):
+            if not part:
+                continue
+            name, _, value = part.partition('=')
+            parts[name] = value
+        try:
+            byday = [day for day in parts.get('BYDAY', '').split(',') if day]
+            if any(day not in WEEKDAYS for day in byday):
+                raise ValueError('Неизвестный день недели в BYDAY')
+            until = parts.get('UNTIL')
+            return cls(
+                parts.get('FREQ', ''),
+                int(parts.get('INTERVAL', 1)),
+                byday,
+                int(parts['COUNT']) if 'COUNT' in parts else None,
+                datetime.strptime(until.rstrip('Z'), '%Y%m%dT%H%M%S') if until else None
+            )
+        except (TypeError, KeyError) as e:
+            raise ValueError(f'Неверное правило повторения: {text}') from e
+
+    def __str__(self):
+        parts = [f'FREQ={self.freq}']
+        if self.interval != 1:
+            parts.append(f'INTERVAL={self.interval}')
+        if self.byday:
+            parts.append('BYDAY=' + ','.join(self.byday))
+        if self.count is not None:
+            parts.append(f'COUNT={self.count}')
+        if self.until is not None:
+            parts.append('UNTIL=' + self.until.strftime('%Y%m%dT%H%M%S'))
+        return ';'.join(parts)
+
+    def _periods(self, dtstart, start):
+        """Начала повторений по периодам, начиная с периода, в который попадает start"""
+        if self.freq == 'DAILY':
+            step = timedelta(days=self.interval)
+            k = max(0, -(-(start - dtstart) // step))
+            while True:
+                yield [dtstart + k * step]
+                k += 1
+        elif self.freq == 'WEEKLY':
+            days = [WEEKDAYS.index(day) for day in self.byday] or [dtstart.weekday()]
+            week0 = dtstart - timedelta(days=dtstart.weekday())
+            step = timedelta(weeks=self.interval)
+            k = max(0, (start - week0) // step)
+            while True:
+                week = week0 + k * step
+                yield [occurrence for occurrence in (week + timedelta(days=day) for day in days)
+                       if occurrence >= dtstart]
+                k += 1
+        else:
+            months = max(0, (start.year - dtstart.year) * 12 + start.month - dtstart.month)
+            k = months // self.interval
+            while True:
+                month_index = dtstart.month - 1 + k * self.interval
+                year, month = dtstart.year + month_index // 12, month_index % 12 + 1
+                if dtstart.day <= calendar.monthrange(year, month)[1]:
+                    yield [dtstart.replace(year=year, month=month)]
+                else:
+                    yield []
+                k += 1
+
+    def last(self, dtstart):
+        """Начало последнего повторения или None для бесконечной серии"""
+        if self.count is not None:
+            seen = 0
+            for period in self._periods(dtstart, dtstart):
+                for occurrence in period:
+                    seen += 1
+                    if seen == self.count:
+                        return occurrence
+        if self.until is not None:
+            last = None
+            for occurrence in self.between(dtstart, dtstart, self.until + timedelta(seconds=1)):
+                last = occurrence
+            return last
+        return None
+
+    def between(self, dtstart, start, end, last=None):
+        """Начала повторений в [start, end). last - заранее вычисленный self.last(dtstart)"""
+        if self.count is not None and last is None:
+            last = self.last(dtstart)
+        limit = last or self.until
+        for period in self._periods(dtstart, start):
+            if not period:
+                continue
+            if period[0] >= end or (limit is not None and period[0] > limit):
+                return
+            for occurrence in period:
+                if occurrence >= end or (limit is not None and occurrence > limit):
+                    return
+                if occurrence >= start:
+                    yield occurrence
+
+
+class Occurrence:
+    """Занятие в календаре: отдельная запись Schedule (id) или повторение серии (series_id).
+    Только простые данные, без ORM-объектов - поэтому их можно кэшировать между запросами"""
+
+    __slots__ = ('id', 'series_id', 'original_start', 'title', 'description', 'start_time', 'end_time',
+                 'group_id', 'group_name', 'student_id', 'student_name', 'rrule', 'created_by')
+
+    def __init__(self, id=None, series_id=None, original_start=None, title='', description=None,
+                 start_time=None, end_time=None, group_id=None, group_name=None,
+                 student_id=None, student_name=None, rrule=None, created_by=None):
+        self.id = id
+        self.series_id = series_id
+        self.original_start = original_start
+        self.title = title
+        self.description = description
+        self.start_time = start_time
+        self.end_time = end_time
+        self.group_id = group_id
+        self.group_name = group_name
+        self.student_id = student_id
+        self.student_name = student_name
+        self.rrule = rrule
+        self.created_by = created_by
+
+    @property
+    def key(self):
+        """Устойчивый идентификатор: 'e<id>' для записи, 's<серия>-<ГГГГММДДTЧЧММ>' для повторения"""
+        if self.series_id is not None:
+            return f"s{self.series_id}-{self.original_start.strftime('%Y%m%dT%H%M')}"
+        return f'e{self.id}'
+
+
+def parse_occurrence_key(key):
+    """('schedule', id) или ('series', id, original_start); ValueError для неверного ключа"""
+    if key.startswith('e'):
+        return 'schedule', int(key[1:])
+    if key.startswith('s'):
+        series_id, _, start = key[1:].partition('-')
+        return 'series', int(series_id), datetime.strptime(start, '%Y%m%dT%H%M')
+    raise ValueError(f'Неверный ключ занятия: {key}')
+
+
+class OccurrenceCache:
+    """Небольшой LRU развернутых окон: (начало, конец) -> повторения всех серий в окне.
+    Все окна сбрасываются при смене версии 'schedule'"""
+
+    version_name = 'schedule'
+
+    def __init__(self, versions, max_windows=32):
+        self.versions = versions
+        self.max_windows = max_windows
+        self._windows = OrderedDict()
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def value(self, name, loader):
+        """Небольшое производное значение расписания (например, самое длинное занятие),
+        сбрасывается вместе с окнами"""
+        version = self.versions.current(self.version_name)
+        entry = self._values.get(name)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        value = loader()
+        self._values[name] = (version, value)
+        return value
+
+    def get(self, start, end, loader):
+        version = self.versions.current(self.version_name)
+        key = (start, end)
+        with self._lock:
+            entry = self._windows.get(key)
+            if entry is not None and entry[0] == version:
+                self._windows.move_to_end(key)
+                return entry[1]
+        occurrences = tuple(loader(start, end))
+        with self._lock:
+            self._windows[key] = (version, occurrences)
+            self._windows.move_to_end(key)
+            while len(self._windows) > self.max_windows:
+                self._windows.popitem(last=False)
+        return occurrences
@@ -0,0 +1,662 @@
+"""Расписание: занятия и серии, проверка пересечений, окна календаря и ленты .ics"""
+import hashlib
+import json
+import secrets
+from datetime import datetime, timedelta
+
+import sqlalchemy
+from flask import Blueprint, abort, current_app, flash, jsonify, redirect, render_template, request, url_for
+from flask_login import current_user, login_required
+
+from calendar_feed import CalendarFeeds, CalendarItem
+from extensions import cache_versions, calendar_feeds, occurrence_cache, schedule_index
+from models import (db, CacheVersion, CalendarFeedToken, Group, GroupMember, Homework, Schedule, ScheduleException,
+                    ScheduleSeries, User)
+from recurrence import WEEKDAYS, Occurrence, RecurrenceRule
+
+schedule_bp = Blueprint('schedule', __name__)
+
+
+# Имена групп и учеников для занятий календаря (два запроса на любое число занятий)
+def schedule_resource_names(group_ids, student_ids):
+    group_names = {}
+    student_names = {}
+    if group_ids:
+        group_names = dict(db.session.query(Group.id, Group.name).filter(Group.id.in_(group_ids)).all())
+    if student_ids:
+        rows = db.session.query(User.id, User.first_name, User.last_name).filter(User.id.in_(student_ids)).all()
+        student_names = {row.id: f'{row.first_name} {row.last_name}' for row in rows}
+    return group_names, student_names
+
+# Повторения всех серий, пересекающиеся с окном [start, end). Вызывается через occurrence_cache
+def expand_series(start, end):
+    # Занятие короче суток, поэтому серии, закончившиеся раньше start - 1 день, не нужны
+    series_list = ScheduleSeries.query.filter(
+        ScheduleSeries.start_time < end,
+        sqlalchemy.or_(ScheduleSeries.last_start.is_(None), ScheduleSeries.last_start >= start - timedelta(days=1))
+    ).all()
+    if not series_list:
+        return []
+    
+    skipped = set(db.session.query(ScheduleException.series_id, ScheduleException.original_start).filter(
+        ScheduleException.series_id.in_([series.id for series in series_list]),
+        ScheduleException.original_start >= start - timedelta(days=1),
+        ScheduleException.original_start < end
+    ).all())
+    group_names, student_names = schedule_resource_names(
+        {series.group_id for series in series_list if series.group_id},
+        {series.student_id for series in series_list if series.student_id}
+    )
+    
+    occurrences = []
+    for series in series_list:
+        duration = series.end_time - series.start_time
+        rule = RecurrenceRule.parse(series.rrule)
+        for occurrence_start in rule.between(series.start_time, start - duration, end, last=series.last_start):
+            if (series.id, occurrence_start) in skipped or occurrence_start + duration <= start:
+                continue
+            occurrences.append(Occurrence(
+                series_id=series.id,
+                original_start=occurrence_start,
+                title=series.title,
+                description=series.description,
+                start_time=occurrence_start,
+                end_time=occurrence_start + duration,
+                group_id=series.group_id,
+                group_name=group_names.get(series.group_id),
+                student_id=series.student_id,
+                student_name=student_names.get(series.student_id),
+                rrule=series.rrule,
+                created_by=series.created_by
+            ))
+    return occurrences
+
+# Самая длинная запись Schedule: занятия, пересекающиеся с окном, начались не раньше,
+# чем за столько до его начала - так диапазон по индексу ограничен с обеих сторон
+def schedule_max_duration():
+    days = db.session.query(
+        db.func.max(db.func.julianday(Schedule.end_time) - db.func.julianday(Schedule.start_time))
+    ).scalar()
+    return timedelta(days=days or 0) + timedelta(minutes=1)
+
+# Занятия календаря в окне [start, end): отдельные записи Schedule и повторения серий.
+# Если переданы group_ids/student_id - только занятия этих групп или этого ученика
+def calendar_events(start, end, group_ids=None, student_id=None):
+    earliest = start - occurrence_cache.value('max_duration', schedule_max_duration)
+    query = Schedule.query.filter(
+        Schedule.start_time < end, Schedule.start_time > earliest, Schedule.end_time > start
+    )
+    filtered = group_ids is not None or student_id is not None
+    if filtered:
+        query = query.filter(sqlalchemy.or_(
+            Schedule.group_id.in_(group_ids or ()),
+            Schedule.student_id == student_id
+        ))
+    rows = query.all()
+    group_names, student_names = schedule_resource_names(
+        {row.group_id for row in rows if row.group_id},
+        {row.student_id for row in rows if row.student_id}
+    )
+    events = [Occurrence(
+        id=row.id,
+        title=row.title,
+        description=row.description,
+        start_time=row.start_time,
+        end_time=row.end_time,
+        group_id=row.group_id,
+        group_name=group_names.get(row.group_id),
+        student_id=row.student_id,
+        student_name=student_names.get(row.student_id),
+        created_by=row.created_by
+    ) for row in rows]
+    
+    for occurrence in occurrence_cache.get(start, end, expand_series):
+        if not filtered or occurrence.group_id in (group_ids or ()) or (
+                student_id is not None and occurrence.student_id == student_id):
+            events.append(occurrence)
+    events.sort(key=lambda event: (event.start_time, event.title))
+    return events
+
+# Окно календаря по умолчанию: с начала сегодняшнего дня на SCHEDULE_WINDOW_DAYS дней
+# (границы по дням, чтобы развернутые окна серий переиспользовались из кэша)
+def default_schedule_window():
+    start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    return start, start + timedelta(days=current_app.config['SCHEDULE_WINDOW_DAYS'] + 1)
+
+# Превращает повторение серии в отдельную запись Schedule (например, чтобы привязать к нему
+# домашнее задание). Серия это повторение больше не выдает. commit выполняет вызывающий код
+def materialize_occurrence(series, original_start):
+    exception = ScheduleException.query.filter_by(series_id=series.id, original_start=original_start).first()
+    if exception and exception.schedule_id:
+        return exception.schedule
+    if exception or original_start not in RecurrenceRule.parse(series.rrule).between(
+            series.start_time, original_start, original_start + timedelta(seconds=1), last=series.last_start):
+        raise ValueError('Такого занятия в серии нет')
+    
+    event = Schedule(
+        title=series.title,
+        description=series.description,
+        start_time=original_start,
+        end_time=original_start + (series.end_time - series.start_time),
+        group_id=series.group_id,
+        student_id=series.student_id,
+        created_by=series.created_by
+    )
+    db.session.add(event)
+    db.session.flush()
+    db.session.add(ScheduleException(series_id=series.id, original_start=original_start, schedule_id=event.id))
+    cache_versions.bump('schedule')
+    return event
+
+# Занятия для индекса пересечений: как calendar_events, но записи Schedule читаются
+# только нужными столбцами, без ORM-объектов (их в окне индекса десятки тысяч)
+def schedule_index_events(start, end):
+    rows = db.session.execute(
+        db.select(Schedule.id, Schedule.title, Schedule.start_time, Schedule.end_time,
+                  Schedule.group_id, Schedule.student_id, Schedule.created_by)
+        .where(Schedule.start_time < end, Schedule.end_time > start)
+    ).all()
+    group_names, student_names = schedule_resource_names(
+        {row.group_id for row in rows if row.group_id},
+        {row.student_id for row in rows if row.student_id}
+    )
+    events = [Occurrence(
+        id=row.id,
+        title=row.title,
+        start_time=row.start_time,
+        end_time=row.end_time,
+        group_id=row.group_id,
+        group_name=group_names.get(row.group_id),
+        student_id=row.student_id,
+        student_name=student_names.get(row.student_id),
+        created_by=row.created_by
+    ) for row in rows]
+    events.extend(expand_series(start, end))
+    return events
+
+# Пересечения нового занятия (или всех повторений серии) с календарями преподавателя,
+# группы и учеников. Для группы проверяются и занятия всех ее учеников: индивидуальные
+# и в других группах. Возвращает список Clash из schedule_conflicts
+def schedule_clashes(intervals, teacher_id, group_id=None, student_id=None):
+    student_ids = set()
+    if group_id:
+        student_ids.update(db.session.execute(
+            db.select(GroupMember.user_id).where(GroupMember.group_id == group_id)
+        ).scalars())
+    if student_id:
+        student_ids.add(student_id)
+    # Группы этих учеников - одним запросом
+    shared_groups = set()
+    if student_ids:
+        shared_groups.update(db.session.execute(
+            db.select(GroupMember.group_id).where(GroupMember.user_id.in_(student_ids))
+        ).scalars())
+    shared_groups.discard(group_id)
+    
+    def reasons(occurrence):
+        found = []
+        if occurrence.created_by == teacher_id:
+            found.append('преподаватель')
+        if group_id and occurrence.group_id == group_id:
+            found.append('та же группа')
+        elif occurrence.group_id in shared_groups:
+            found.append(f'общие ученики с группой «{occurrence.group_name}»')
+        if occurrence.student_id in student_ids:
+            found.append(f'ученик {occurrence.student_name}')
+        return found
+    
+    return schedule_index.clashes(intervals, reasons)
+
+def schedule_clashes_message(clashes):
+    shown = current_app.config['SCHEDULE_CONFLICTS_SHOWN']
+    lines = [f'Найдено пересечений: {len(clashes)}.']
+    for clash in clashes[:shown]:
+        occurrence = clash.occurrence
+        lines.append(
+            f"{clash.start.strftime('%d.%m.%Y %H:%M')}-{clash.end.strftime('%H:%M')} пересекается с "
+            f"«{occurrence.title}» {occurrence.start_time.strftime('%d.%m.%Y %H:%M')}-"
+            f"{occurrence.end_time.strftime('%H:%M')} ({', '.join(clash.reasons)})"
+        )
+    if len(clashes) > shown:
+        lines.append(f'и еще {len(clashes) - shown}')
+    return ' '.join(lines)
+
+# Время последнего изменения данных, из которых собираются календари .ics
+def calendar_feeds_changed_at():
+    changed_at = db.session.query(db.func.max(CacheVersion.updated_at)).filter(
+        CacheVersion.name.in_(CalendarFeeds.version_names)
+    ).scalar()
+    return changed_at or datetime(1970, 1, 1)
+
+# Содержимое календаря .ics: (название, [CalendarItem]) или None, если ученика/группы нет.
+# Ученик видит свои занятия и занятия своих групп, преподаватель - все созданные им
+def calendar_feed_items(kind, resource_id):
+    since = datetime.now() - timedelta(days=current_app.config['CALENDAR_FEED_PAST_DAYS'])
+    if kind == 'student':
+        student = db.session.get(User, resource_id)
+        if student is None or student.is_teacher:
+            return None
+        title = f'{student.first_name} {student.last_name}'
+        group_ids = [row.group_id for row in GroupMember.query.filter_by(user_id=resource_id).all()]
+        def for_resource(model):
+            return sqlalchemy.or_(model.group_id.in_(group_ids), model.student_id == resource_id)
+    elif kind == 'group':
+        group = db.session.get(Group, resource_id)
+        if group is None:
+            return None
+        title = group.name
+        def for_resource(model):
+            return model.group_id == resource_id
+    elif kind == 'teacher':
+        teacher = db.session.get(User, resource_id)
+        if teacher is None or not teacher.is_teacher:
+            return None
+        title = f'{teacher.first_name} {teacher.last_name}'
+        def for_resource(model):
+            return model.created_by == resource_id
+    else:
+        return None
+    
+    rows = Schedule.query.filter(for_resource(Schedule), Schedule.end_time > since).all()
+    series_list = ScheduleSeries.query.filter(
+        for_resource(ScheduleSeries),
+        sqlalchemy.or_(ScheduleSeries.last_start.is_(None), ScheduleSeries.last_start > since - timedelta(days=1))
+    ).all()
+    homeworks = Homework.query.filter(for_resource(Homework), Homework.deadline > since).all()
+    exceptions = {}
+    if series_list:
+        for exception in ScheduleException.query.filter(
+                ScheduleException.series_id.in_([series.id for series in series_list])).all():
+            exceptions.setdefault(exception.series_id, []).append(exception)
+    group_names, student_names = schedule_resource_names(
+        {item.group_id for item in rows + series_list + homeworks if item.group_id},
+        {item.student_id for item in rows + series_list + homeworks if item.student_id}
+    )
+    
+    def who(item):
+        if item.student_id:
+            return f'Индивидуально: {student_names.get(item.student_id, "")}'
+        if item.group_id:
+            return f'Группа: {group_names.get(item.group_id, "")}'
+        return None
+    
+    host = request.host.split(':')[0]
+    items = []
+    for row in rows:
+        items.append(CalendarItem(
+            f'schedule-{row.id}@{host}', row.title, row.start_time, row.end_time,
+            '\n'.join(filter(None, [who(row), row.description])), stamp=row.created_at or since
+        ))
+    for series in series_list:
+        # В iCalendar DTSTART всегда первое повторение, даже если не подходит под BYDAY,
+        # поэтому серия начинается с первого настоящего занятия
+        first_start = next(RecurrenceRule.parse(series.rrule).between(
+            series.start_time, series.start_time, datetime.max, last=series.last_start), None)
+        if first_start is None:
+            continue
+        series_exceptions = exceptions.get(series.id, [])
+        items.append(CalendarItem(
+            f'series-{series.id}@{host}', series.title,
+            first_start, first_start + (series.end_time - series.start_time),
+            '\n'.join(filter(None, [who(series), series.description])),
+            rrule=series.rrule,
+            exdates=sorted(exception.original_start for exception in series_exceptions),
+            stamp=max([series.created_at or since] + [exception.created_at or since for exception in series_exceptions])
+        ))
+    for homework in homeworks:
+        # Срок сдачи - получасовое событие, заканчивающееся в момент дедлайна
+        items.append(CalendarItem(
+            f'homework-{homework.id}@{host}', f'Срок сдачи: {homework.title}',
+            homework.deadline - timedelta(minutes=30), homework.deadline,
+            '\n'.join(filter(None, [who(homework), homework.description])),
+            stamp=homework.updated_at or homework.created_at or since
+        ))
+    return title, items
+
+# Секретная ссылка на календарь (токен создается при первом обращении)
+def calendar_feed_token(kind, resource_id):
+    feed = CalendarFeedToken.query.filter_by(kind=kind, resource_id=resource_id).first()
+    if feed is None:
+        feed = CalendarFeedToken(token=secrets.token_urlsafe(24), kind=kind, resource_id=resource_id)
+        db.session.add(feed)
+        try:
+            db.session.commit()
+        except sqlalchemy.exc.IntegrityError:
+            # Ссылку одновременно создал другой запрос
+            db.session.rollback()
+            feed = CalendarFeedToken.query.filter_by(kind=kind, resource_id=resource_id).first()
+    return feed.token
+
+def calendar_feed_url(kind, resource_id):
+    return url_for('schedule.calendar_feed', token=calendar_feed_token(kind, resource_id), _external=True)
+
+# Расписание преподавателя
+@schedule_bp.route('/admin/schedule')
+@login_required
+def admin_schedule():
+    if not current_user.is_teacher:
+        flash('Доступ запрещен!', 'error')
+        return redirect(url_for('main.dashboard'))
+    
+    # Занятия страница загружает окнами через api_schedule, учеников для индивидуальных
+    # занятий ищет student_search - здесь нужны только названия групп
+    groups = db.session.query(Group.id, Group.name).order_by(Group.name).all()
+    
+    return render_template('admin_schedule.html', groups=groups,
+                           weekdays=list(zip(WEEKDAYS, ('Пн', 'Вт', 'Ср', 'Чт', 'Пт', 'Сб', 'Вс'))),
+                           feed_url=calendar_feed_url('teacher', current_user.id))
+
+# Правило повторения из формы создания занятия (None - занятие не повторяется)
+def recurrence_rule_from_form(form, start_dt):
+    freq = form.get('repeat')
+    if not freq:
+        return None
+    byday = form.getlist('repeat_days') if freq == 'WEEKLY' else []
+    count = None
+    if form.get('repeat_end') == 'count':
+        # Пустое или нечисловое значение не должно превращать серию в бесконечную
+        count = form.get('repeat_count', type=int)
+        if count is None:
+            raise ValueError('Укажите число повторений')
+    until = None
+    if form.get('repeat_end') == 'until':
+        if not form.get('repeat_until'):
+            raise ValueError('Укажите дату окончания повторений')
+        # Дата окончания включительно
+        until = datetime.fromisoformat(form['repeat_until']).replace(hour=23, minute=59, second=59)
+        if until < start_dt:
+            raise ValueError('Дата окончания повторений раньше первого занятия')
+    return RecurrenceRule(freq, form.get('repeat_interval', 1, type=int) or 1, byday, count, until)
+
+# Создание события в расписании
+@schedule_bp.route('/admin/schedule/create', methods=['POST'])
+@login_required
+def create_schedule_event():
+    if not current_user.is_teacher:
+        flash('Доступ запрещен!', 'error')
+        return redirect(url_for('main.dashboard'))
+    
+    title = request.form.get('title')
+    description = request.form.get('description')
+    start_time = request.form.get('start_time')
+    end_time = request.form.get('end_time')
+    group_id = request.form.get('group_id')
+    
+    if not title or not start_time or not end_time:
+        flash('Заполните все обязательные поля!', 'error')
+        return redirect(url_for('schedule.admin_schedule'))
+    
+    try:
+        # Преобразуем строки в datetime
+        start_dt = datetime.fromisoformat(start_time.replace('T', ' '))
+        end_dt = datetime.fromisoformat(end_time.replace('T', ' '))
+        
+        # Проверяем, что время начала раньше времени окончания
+        if start_dt >= end_dt:
+            flash('Время начала должно быть раньше времени окончания!', 'error')
+            return redirect(url_for('schedule.admin_schedule'))
+        
+        # Обрабатываем group_id - может быть None, число или строка student_X
+        group_id_int = None
+        student_id_int = None
+        if group_id:
+            if group_id.startswith('student_'):
+                # Это индивидуальное занятие для конкретного ученика
+                student_id_int = int(group_id.replace('student_', ''))
+            else:
+                # Это группа
+                group_id_int = int(group_id)
+        
+        rule = recurrence_rule_from_form(request.form, start_dt)
+        if rule is not None and end_dt - start_dt >= timedelta(days=1):
+            raise ValueError('Повторяющееся занятие должно быть короче суток')
+        
+        # Интервалы нового занятия: одно или все повторения серии в пределах горизонта проверки
+        if rule is None:
+            intervals = [(start_dt, end_dt)]
+        else:
+            horizon_end = schedule_index.window()[1]
+            intervals = [(occurrence_start, occurrence_start + (end_dt - start_dt))
+                         for occurrence_start in rule.between(start_dt, start_dt, horizon_end)]
+        clashes = schedule_clashes(intervals, current_user.id, group_id_int, student_id_int)
+        if clashes and not request.form.get('ignore_conflicts'):
+            flash('Занятие не добавлено: время занято. ' + schedule_clashes_message(clashes), 'error')
+            return redirect(url_for('schedule.admin_schedule'))
+        
+        if rule is None:
+            # Создаем событие
+            event = Schedule(
+                title=title,
+                description=description,
+                start_time=start_dt,
+                end_time=end_dt,
+                group_id=group_id_int,
+                student_id=student_id_int,
+                created_by=current_user.id
+            )
+        else:
+            # Повторяющееся занятие хранится одной записью серии
+            event = ScheduleSeries(
+                title=title,
+                description=description,
+                start_time=start_dt,
+                end_time=end_dt,
+                rrule=str(rule),
+                last_start=rule.last(start_dt),
+                group_id=group_id_int,
+                student_id=student_id_int,
+                created_by=current_user.id
+            )
+        db.session.add(event)
+        cache_versions.bump('schedule')
+        db.session.commit()
+        
+        # Индекс пересечений этого воркера дополняется на месте, без перестроения
+        group_names, student_names = schedule_resource_names(
+            {group_id_int} if group_id_int else set(), {student_id_int} if student_id_int else set()
+        )
+        schedule_index.record(cache_versions.current('schedule', refresh=True), [Occurrence(
+            id=event.id if rule is None else None,
+            series_id=event.id if rule is not None else None,
+            original_start=None if rule is None else interval_start,
+            title=title,
+            start_time=interval_start,
+            end_time=interval_end,
+            group_id=group_id_int,
+            group_name=group_names.get(group_id_int),
+            student_id=student_id_int,
+            student_name=student_names.get(student_id_int),
+            created_by=current_user.id
+        ) for interval_start, interval_end in intervals])
+        
+        if clashes:
+            flash('Событие добавлено, несмотря на пересечения. ' + schedule_clashes_message(clashes), 'warning')
+        else:
+            flash('Событие успешно добавлено в расписание!', 'success')
+    except ValueError as e:
+        db.session.rollback()
+        flash(f'Ошибка в данных: {str(e)}', 'error')
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Ошибка при добавлении события: {str(e)}', 'error')
+    
+    return redirect(url_for('schedule.admin_schedule'))
+
+# Удаление события из расписания
+@schedule_bp.route('/admin/schedule/delete/<int:event_id>')
+@login_required
+def delete_schedule_event(event_id):
+    if not current_user.is_teacher:
+        flash('Доступ запрещен!', 'error')
+        return redirect(url_for('main.dashboard'))
+    
+    event = Schedule.query.get_or_404(event_id)
+    # Если запись заменяла повторение серии, повторение остается отмененным
+    ScheduleException.query.filter_by(schedule_id=event.id).update({'schedule_id': None})
+    db.session.delete(event)
+    cache_versions.bump('schedule')
+    db.session.commit()
+    schedule_index.record(cache_versions.current('schedule', refresh=True), removed=[f'e{event_id}'])
+    
+    flash('Событие успешно удалено из расписания!', 'success')
+    return redirect(url_for('schedule.admin_schedule'))
+
+# Удаление серии повторяющихся занятий (отдельные записи, выделенные из серии, остаются)
+@schedule_bp.route('/admin/schedule/series/delete/<int:series_id>')
+@login_required
+def delete_schedule_series(series_id):
+    if not current_user.is_teacher:
+        flash('Доступ запрещен!', 'error')
+        return redirect(url_for('main.dashboard'))
+    
+    series = ScheduleSeries.query.get_or_404(series_id)
+    db.session.delete(series)
+    cache_versions.bump('schedule')
+    db.session.commit()
+    
+    flash('Серия занятий удалена из расписания!', 'success')
+    return redirect(url_for('schedule.admin_schedule'))
+
+# Отмена одного занятия серии
+@schedule_bp.route('/admin/schedule/series/<int:series_id>/cancel/<start>')
+@login_required
+def cancel_schedule_occurrence(series_id, start):
+    if not current_user.is_teacher:
+        flash('Доступ запрещен!', 'error')
+        return redirect(url_for('main.dashboard'))
+    
+    series = ScheduleSeries.query.get_or_404(series_id)
+    try:
+        original_start = datetime.strptime(start, '%Y%m%dT%H%M')
+    except ValueError:
+        abort(404)
+    if original_start not in RecurrenceRule.parse(series.rrule).between(
+            series.start_time, original_start, original_start + timedelta(seconds=1), last=series.last_start):
+        abort(404)
+    
+    if not ScheduleException.query.filter_by(series_id=series.id, original_start=original_start).first():
+        db.session.add(ScheduleException(series_id=series.id, original_start=original_start))
+        cache_versions.bump('schedule')
+        db.session.commit()
+    
+    flash('Занятие отменено!', 'success')
+    return redirect(url_for('schedule.admin_schedule'))
+
+# Расписание ученика
+@schedule_bp.route('/student/schedule')
+@login_required
+def student_schedule():
+    if current_user.is_teacher:
+        flash('Доступ запрещен!', 'error')
+        return redirect(url_for('main.dashboard'))
+    
+    # Занятия страница загружает окнами через api_schedule
+    return render_template('student_schedule.html', feed_url=calendar_feed_url('student', current_user.id))
+
+# Занятия календаря в окне для страниц расписания.
+# from, to - даты ГГГГ-ММ-ДД (to включительно), resource: all, group:<id>, student:<id> или me.
+# Ученик видит только свои занятия и занятия своих групп
+@schedule_bp.route('/api/schedule')
+@login_required
+def api_schedule():
+    try:
+        start = datetime.strptime(request.args.get('from', ''), '%Y-%m-%d')
+        end = datetime.strptime(request.args.get('to', ''), '%Y-%m-%d') + timedelta(days=1)
+    except ValueError:
+        return jsonify({'error': 'Укажите from и to в формате ГГГГ-ММ-ДД'}), 400
+    if end <= start or (end - start).days > current_app.config['SCHEDULE_API_MAX_DAYS']:
+        return jsonify({'error': f"Окно должно быть от 1 до {current_app.config['SCHEDULE_API_MAX_DAYS']} дней"}), 400
+    
+    resource = request.args.get('resource') or ('all' if current_user.is_teacher else 'me')
+    kind, _, resource_id = resource.partition(':')
+    group_ids, student_id = None, None
+    try:
+        if kind == 'me' and not current_user.is_teacher:
+            group_ids, student_id = list(current_user.group_ids), current_user.id
+        elif kind == 'all' and current_user.is_teacher:
+            pass
+        elif kind == 'group' and (current_user.is_teacher or int(resource_id) in current_user.group_ids):
+            group_ids = [int(resource_id)]
+        elif kind == 'student' and current_user.is_teacher:
+            student_id = int(resource_id)
+            group_ids = list(db.session.execute(
+                db.select(GroupMember.group_id).where(GroupMember.user_id == student_id)
+            ).scalars())
+        elif kind == 'student' and int(resource_id) == current_user.id:
+            group_ids, student_id = list(current_user.group_ids), current_user.id
+        else:
+            return jsonify({'error': 'Доступ запрещен'}), 403
+    except ValueError:
+        return jsonify({'error': 'Неверный параметр resource'}), 400
+    
+    # ETag считается до запроса к базе: по версии расписания, окну и набору групп.
+    # Повторный запрос того же окна без изменений расписания обходится без обращения к занятиям
+    etag = hashlib.sha1(repr((
+        cache_versions.current('schedule'), start, end, sorted(group_ids or ()), student_id, group_ids is None
+    )).encode()).hexdigest()
+    # Сравнение слабое: сжатый ответ уходит с ETag W/"...", и браузер возвращает именно его
+    if request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+    else:
+        events = calendar_events(start, end, group_ids, student_id)
+        groups, students, items = {}, {}, []
+        for event in events:
+            item = {
+                'k': event.key,
+                't': event.title,
+                's': event.start_time.strftime('%Y-%m-%dT%H:%M'),
+                'e': event.end_time.strftime('%Y-%m-%dT%H:%M'),
+            }
+            if event.description:
+                item['d'] = event.description
+            if event.group_id:
+                item['g'] = event.group_id
+                groups[event.group_id] = event.group_name
+            if event.student_id:
+                item['u'] = event.student_id
+                students[event.student_id] = event.student_name
+            if event.rrule:
+                item['r'] = event.rrule
+            items.append(item)
+        body = json.dumps({
+            'from': start.strftime('%Y-%m-%d'),
+            'to': (end - timedelta(days=1)).strftime('%Y-%m-%d'),
+            'groups': groups,
+            'students': students,
+            'events': items,
+        }, ensure_ascii=False, separators=(',', ':'))
+        response = current_app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    # Браузер хранит окно у себя и каждый раз сверяет ETag
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+# Календарь .ics по секретной ссылке (для подписки в телефоне, Google Calendar и т.п.)
+@schedule_bp.route('/calendar/<token>.ics')
+def calendar_feed(token):
+    feed = CalendarFeedToken.query.filter_by(token=token).first()
+    if feed is None:
+        abort(404)
+    response = calendar_feeds.response(feed.kind, feed.resource_id)
+    if response is None:
+        abort(404)
+    return response
+
+# Новая секретная ссылка на календарь (старая перестает работать)
+@schedule_bp.route('/calendar/<kind>/<int:resource_id>/reset', methods=['POST'])
+@login_required
+def reset_calendar_feed(kind, resource_id):
+    if kind not in ('student', 'group', 'teacher'):
+        abort(404)
+    own = kind in ('student', 'teacher') and resource_id == current_user.id
+    if not current_user.is_teacher and not own:
+        flash('Доступ запрещен!', 'error')
+        return redirect(url_for('main.dashboard'))
+    
+    CalendarFeedToken.query.filter_by(kind=kind, resource_id=resource_id).delete()
+    db.session.commit()
+    calendar_feed_token(kind, resource_id)
+    flash('Создана новая ссылка на календарь, старая больше не работает.', 'success')
+    if kind == 'group':
+        return redirect(url_for('groups.view_group', group_id=resource_id))
+    return redirect(url_for('schedule.admin_schedule' if kind == 'teacher' else 'schedule.student_schedule'))
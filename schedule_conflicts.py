@@ -0,0 +1,151 @@
+"""Поиск пересечений занятий: интервальный индекс календаря в памяти процесса"""
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+
+
+class IntervalIndex:
+    """Интервалы, отсортированные по началу.
+
+    Занятия не длиннее max_duration хранятся в отсортированном списке: пересекающиеся с
+    [start, end) лежат среди начавшихся в [start - max_duration, end), их находит бинарный
+    поиск. Редкие длинные события (каникулы, интенсив на неделю) проверяются перебором.
+    """
+
+    def __init__(self, occurrences=(), max_duration=timedelta(days=1)):
+        self.max_duration = max_duration
+        self._starts = []
+        self._entries = []
+        self._long = []
+        for occurrence in sorted(occurrences, key=lambda item: item.start_time):
+            self._append(occurrence)
+
+    def __len__(self):
+        return len(self._entries) + len(self._long)
+
+    def _append(self, occurrence):
+        if occurrence.end_time - occurrence.start_time > self.max_duration:
+            self._long.append(occurrence)
+        else:
+            self._starts.append(occurrence.start_time)
+            self._entries.append(occurrence)
+
+    def copy(self):
+        index = IntervalIndex(max_duration=self.max_duration)
+        index._starts = list(self._starts)
+        index._entries = list(self._entries)
+        index._long = list(self._long)
+        return index
+
+    def add(self, occurrence):
+        if occurrence.end_time - occurrence.start_time > self.max_duration:
+            self._long.append(occurrence)
+            return
+        position = bisect_right(self._starts, occurrence.start_time)
+        self._starts.insert(position, occurrence.start_time)
+        self._entries.insert(position, occurrence)
+
+    def remove(self, keys):
+        keys = set(keys)
+        kept = [(start, entry) for start, entry in zip(self._starts, self._entries) if entry.key not in keys]
+        self._starts = [start for start, _ in kept]
+        self._entries = [entry for _, entry in kept]
+        self._long = [entry for entry in self._long if entry.key not in keys]
+
+    def overlapping(self, start, end):
+        """Занятия, пересекающиеся с [start, end)"""
+        low = bisect_left(self._starts, start - self.max_duration)
+        high = bisect_left(self._starts, end)
+        for position in range(low, high):
+            entry = self._entries[position]
+            if entry.end_time > start:
+                yield entry
+        for entry in self._long:
+            if entry.start_time < end and entry.end_time > start:
+                yield entry
+
+
+class Clash:
+    """Пересечение нового занятия [start, end) с существующим occurrence; reasons - чье время занято"""
+
+    __slots__ = ('start', 'end', 'occurrence', 'reasons')
+
+    def __init__(self, start, end, occurrence, reasons):
+        self.start = start
+        self.end = end
+        self.occurrence = occurrence
+        self.reasons = reasons
+
+
+class ScheduleIndex:
+    """Индекс занятий (отдельных и повторений серий) на horizon дней вперед.
+
+    loader(start, end) возвращает занятия календаря в окне. Индекс строится заново при смене
+    версии 'schedule', а изменения этого воркера вносятся через record() в копию индекса,
+    которая затем подменяет текущую: проверки читают индекс без блокировки и никогда не видят
+    его наполовину измененным. Интервалы за пределами окна (прошлое, далекое будущее)
+    проверяются прямым запросом loader по самому интервалу; горизонт ограничивает только
+    развертывание новой серии вызывающим кодом.
+    """
+
+    version_name = 'schedule'
+
+    def __init__(self, versions, loader, horizon=timedelta(days=365), max_duration=timedelta(days=1)):
+        self.versions = versions
+        self.loader = loader
+        self.horizon = horizon
+        self.max_duration = max_duration
+        self._state = None  # (версия, начало окна, конец окна, IntervalIndex)
+        self._lock = threading.Lock()
+
+    def window(self, now=None):
+        start = (now or datetime.now()).replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=1)
+        return start, start + self.horizon + timedelta(days=1)
+
+    def _current(self):
+        # Перед проверкой версия читается из БД, а не из кэша CacheVersions: занятие другого
+        # воркера, добавленное секунду назад, тоже должно считаться
+        version = self.versions.current(self.version_name, refresh=True)
+        start, end = self.window()
+        with self._lock:
+            state = self._state
+            if state is not None and state[0] == version and state[1] == start:
+                return state
+            index = IntervalIndex(self.loader(start, end), self.max_duration)
+            self._state = (version, start, end, index)
+            return self._state
+
+    def record(self, version, added=(), removed=()):
+        """Применяет к индексу изменения, сохраненные этим воркером (version - версия после commit).
+        Если между ними были чужие изменения, индекс будет построен заново при следующей проверке"""
+        with self._lock:
+            state = self._state
+            if state is None or state[0] != version - 1:
+                self._state = None
+                return
+            _, start, end, index = state
+            index = index.copy()
+            if removed:
+                index.remove(removed)
+            for occurrence in added:
+                if occurrence.start_time < end and occurrence.end_time > start:
+                    index.add(occurrence)
+            self._state = (version, start, end, index)
+
+    def clashes(self, intervals, reasons):
+        """Все пересечения интервалов [(начало, конец), ...] с занятиями календаря.
+        reasons(occurrence) - список причин конфликта (пустой, если занятие не мешает)"""
+        _, start, end, index = self._current()
+        found = []
+        for interval_start, interval_end in intervals:
+            if start <= interval_start and interval_end <= end:
+                candidates = index.overlapping(interval_start, interval_end)
+            else:
+                # Индекс покрывает только окно: занятия вне его ищутся в календаре напрямую
+                candidates = self.loader(interval_start, interval_end)
+            for occurrence in candidates:
+                occurrence_reasons = reasons(occurrence)
+                if occurrence_reasons:
+                    found.append(Clash(interval_start, interval_end, occurrence, occurrence_reasons))
+        found.sort(key=lambda clash: (clash.start, clash.occurrence.start_time))
+        return found
@@ -0,0 +1,215 @@
+"""Боевой запуск: gunicorn с несколькими воркерами, приложение загружается один раз в мастере.
+
+    python serve.py                        запуск (настройки SERVER_* из create_app)
+    python serve.py --workers 8 --threads 2
+    python serve.py reload                 новый код без простоя
+    python serve.py stop                   плавная остановка
+
+reload: мастеру отправляется USR2 - он запускает новый мастер (заново импортирует код) на тех же
+сокетах; когда новый мастер записал pid-файл и поднял воркеров, старый получает TERM и дожидается
+текущих запросов. HUP мастеру только заменяет воркеров: код при предзагрузке остается прежним.
+
+Для systemd: ExecStart=python serve.py, ExecReload=python serve.py reload,
+PIDFile=<SERVER_PIDFILE> - после reload systemd читает pid нового мастера из файла.
+
+Задачи по расписанию (jobs.py): при SCHEDULER_MODE = 'workers' планировщик запускается в каждом
+воркере и задачи выполняет только лидер; при 'process' - отдельная служба
+ExecStart=flask --app app run-scheduler.
+"""
+import argparse
+import logging
+import os
+import signal
+import sys
+import time
+
+from gunicorn.app.base import BaseApplication
+
+from app import create_app, create_teacher
+from models import db, ensure_indexes
+from template_cache import warm_templates
+
+logger = logging.getLogger('serve')
+
+
+# Подготовка базы и шаблонов в мастере до запуска воркеров (как раньше в блоке __main__ app.py)
+def prepare(app):
+    # Воркеров несколько: без общего каталога /metrics отдавал бы счетчики того воркера,
+    # который ответил на запрос
+    if not app.config['METRICS_DIR']:
+        app.config['METRICS_DIR'] = os.path.join(app.instance_path, 'metrics')
+        app.extensions['metrics'].metrics_dir = app.config['METRICS_DIR']
+
+    with app.app_context():
+        db.create_all()
+        ensure_indexes()
+        # WAL: воркеры читают, пока другой процесс пишет (режим сохраняется в файле базы)
+        if db.engine.dialect.name == 'sqlite':
+            with db.engine.connect() as connection:
+                connection.exec_driver_sql('PRAGMA journal_mode=WAL')
+        logger.info("Таблицы базы данных созданы")
+        create_teacher()
+        os.makedirs('backups', exist_ok=True)
+
+    # Шаблоны компилируются до fork - воркеры получают их уже готовыми
+    if app.config['TEMPLATES_PRELOAD']:
+        names, elapsed = warm_templates(app)
+        logger.info("Шаблоны скомпилированы: %d за %.0f мс", len(names), elapsed * 1000)
+
+
+class Server(BaseApplication):
+    def __init__(self, app, options):
+        self.application = app
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        return self.application
+
+
+def _post_fork(app):
+    def post_fork(server, worker):
+        # Соединения с базой, открытые мастером, воркеру не годятся - у каждого свой пул
+        with app.app_context():
+            db.engine.dispose(close=False)
+        # Потоки не переживают fork, поэтому планировщик запускается в каждом воркере;
+        # задачи выполняет только тот, кто держит аренду
+        if app.config['SCHEDULER_MODE'] == 'workers':
+            app.extensions['job_scheduler'].start()
+    return post_fork
+
+
+def _pre_request(app):
+    def pre_request(worker, req):
+        # Пока в воркере идет задача (резервная копия), перезапуск по max_requests откладывается:
+        # иначе worker_exit дождется ее только SERVER_GRACEFUL_TIMEOUT секунд
+        if app.extensions['job_scheduler'].busy:
+            worker.max_requests = max(worker.max_requests, worker.nr + 2)
+    return pre_request
+
+
+def _worker_exit(app):
+    def worker_exit(server, worker):
+        # Заявки, ожидающие пакетной записи, сохраняются до выхода воркера
+        app.extensions['application_writer'].flush()
+        # Аренда освобождается сразу, не дожидаясь истечения - лидером станет другой воркер
+        app.extensions['job_scheduler'].stop(timeout=app.config['SERVER_GRACEFUL_TIMEOUT'])
+        # Записи, оставшиеся в очереди логов, выводятся до выхода
+        app.extensions['logging'].flush()
+    return worker_exit
+
+
+def options(app, args):
+    config = app.config
+    workers = args.workers or config['SERVER_WORKERS'] or os.cpu_count() or 1
+    threads = args.threads or config['SERVER_THREADS']
+    return {
+        'bind': args.bind or config['SERVER_BIND'],
+        'workers': workers,
+        'threads': threads,
+        'worker_class': 'gthread' if threads > 1 else 'sync',
+        'preload_app': True,
+        'max_requests': config['SERVER_MAX_REQUESTS'] if args.max_requests is None else args.max_requests,
+        'max_requests_jitter': config['SERVER_MAX_REQUESTS_JITTER'],
+        'timeout': config['SERVER_TIMEOUT'],
+        'graceful_timeout': config['SERVER_GRACEFUL_TIMEOUT'],
+        'keepalive': config['SERVER_KEEPALIVE'],
+        'pidfile': config['SERVER_PIDFILE'],
+        'post_fork': _post_fork(app),
+        'pre_request': _pre_request(app),
+        'worker_exit': _worker_exit(app),
+    }
+
+
+def _read_pid(path):
+    try:
+        with open(path) as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError:
+        return False
+    return True
+
+
+def _wait(condition, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.1)
+    return False
+
+
+def reload(app):
+    """Замена мастера без простоя. Возвращает код завершения.
+
+    Новый мастер пишет pid в <SERVER_PIDFILE>.2, а после выхода старого переименовывает
+    файл в SERVER_PIDFILE - reload ждет этого, чтобы systemd сразу прочитал новый pid"""
+    config = app.config
+    pidfile = config['SERVER_PIDFILE']
+    old_pid = _read_pid(pidfile)
+    if old_pid is None or not _alive(old_pid):
+        logger.error("Сервер не запущен (нет живого процесса в %s)", pidfile)
+        return 1
+    os.kill(old_pid, signal.SIGUSR2)
+
+    def new_master():
+        pid = _read_pid(pidfile + '.2')
+        return pid if pid is not None and pid != old_pid and _alive(pid) else None
+
+    if not _wait(new_master, config['SERVER_RELOAD_TIMEOUT']):
+        logger.error("Новый мастер не запустился за %s с, старый %s продолжает работу",
+                     config['SERVER_RELOAD_TIMEOUT'], old_pid)
+        return 1
+    new_pid = new_master()
+    # Новый мастер слушает те же сокеты; даем его воркерам подняться
+    time.sleep(config['SERVER_RELOAD_WARMUP'])
+    os.kill(old_pid, signal.SIGTERM)
+    logger.info("Новый мастер %s запущен, старый %s завершает текущие запросы", new_pid, old_pid)
+    if not _wait(lambda: _read_pid(pidfile) == new_pid, config['SERVER_GRACEFUL_TIMEOUT'] + 10):
+        logger.error("Старый мастер %s еще не завершился", old_pid)
+        return 1
+    return 0
+
+
+def stop(app):
+    pid = _read_pid(app.config['SERVER_PIDFILE'])
+    if pid is None or not _alive(pid):
+        logger.error("Сервер не запущен")
+        return 1
+    os.kill(pid, signal.SIGTERM)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Запуск сайта под gunicorn')
+    parser.add_argument('command', nargs='?', choices=('start', 'reload', 'stop'), default='start')
+    parser.add_argument('--bind', help='адрес:порт (SERVER_BIND)')
+    parser.add_argument('--workers', type=int, help='число процессов (SERVER_WORKERS, по умолчанию - по числу ядер)')
+    parser.add_argument('--threads', type=int, help='потоков в каждом процессе (SERVER_THREADS)')
+    parser.add_argument('--max-requests', type=int, help='перезапуск воркера после стольких запросов, 0 - никогда')
+    args = parser.parse_args(argv)
+
+    app = create_app()
+    if args.command == 'reload':
+        return reload(app)
+    if args.command == 'stop':
+        return stop(app)
+    os.makedirs(os.path.dirname(app.config['SERVER_PIDFILE']), exist_ok=True)
+    prepare(app)
+    Server(app, options(app, args)).run()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,132 @@
+"""Учет SQL-запросов в рамках одного HTTP-запроса и поиск N+1"""
+import re
+import time
+from collections import Counter
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class QueryBudgetExceeded(Exception):
+    """Маршрут превысил бюджет SQL-запросов (строгий режим)"""
+
+
+# Нормализация текста запроса в "форму": литералы и списки IN (...) схлопываются
+_IN_LIST_RE = re.compile(r'IN \((?:\?|\s|,)+\)', re.IGNORECASE)
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_SPACES_RE = re.compile(r'\s+')
+
+
+def statement_shape(statement):
+    """Приводит SQL к форме без значений, чтобы находить повторяющиеся запросы"""
+    shape = _SPACES_RE.sub(' ', statement).strip()
+    shape = _STRING_RE.sub('?', shape)
+    shape = _NUMBER_RE.sub('?', shape)
+    return _IN_LIST_RE.sub('IN (...)', shape)
+
+
+class RequestSQLStats:
+    """Статистика SQL для текущего запроса"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.shapes = Counter()
+
+    def record(self, statement, duration):
+        self.count += 1
+        self.total_time += duration
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated_shapes(self, max_repeats):
+        return [(shape, n) for shape, n in self.shapes.most_common() if n > max_repeats]
+
+
+def query_budget(max_queries, max_repeats=None):
+    """Декоратор: бюджет запросов для конкретного маршрута"""
+    def decorator(view):
+        view._query_budget = (max_queries, max_repeats)
+        return view
+    return decorator
+
+
+def current_sql_stats():
+    """Статистика SQL текущего запроса или None вне запроса"""
+    if not has_request_context():
+        return None
+    return g.get('_sql_stats')
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('_query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['_query_start'].pop()
+    stats = current_sql_stats()
+    if stats is not None:
+        stats.record(statement, time.perf_counter() - started)
+
+
+def _handle_error(context):
+    # Запрос завершился ошибкой - after_cursor_execute не будет вызван
+    starts = context.connection.info.get('_query_start') if context.connection else None
+    if starts:
+        starts.pop()
+
+
+def _start_request():
+    g._sql_stats = RequestSQLStats()
+
+
+def _finish_request(response):
+    stats = g.pop('_sql_stats', None)
+    if stats is None:
+        return response
+
+    db_ms = stats.total_time * 1000
+    response.headers.add('Server-Timing', f'db;dur={db_ms:.2f};desc="{stats.count} queries"')
+
+    config = current_app.config
+    max_queries = config['SQL_QUERY_BUDGET']
+    max_repeats = config['SQL_MAX_REPEATS']
+    view = current_app.view_functions.get(request.endpoint)
+    budget = getattr(view, '_query_budget', None)
+    if budget:
+        max_queries = budget[0]
+        if budget[1] is not None:
+            max_repeats = budget[1]
+
+    current_app.logger.debug('SQL %s %s: %d запросов, %.2f мс',
+                             request.method, request.path, stats.count, db_ms)
+    repeated = stats.repeated_shapes(max_repeats)
+    for shape, n in repeated:
+        current_app.logger.warning('Возможный N+1 в %s: запрос выполнен %d раз: %s',
+                                   request.endpoint, n, shape)
+
+    if config['SQL_MONITOR_STRICT']:
+        if stats.count > max_queries:
+            raise QueryBudgetExceeded(
+                f'{request.endpoint}: {stats.count} запросов при бюджете {max_queries}')
+        if repeated:
+            shape, n = repeated[0]
+            raise QueryBudgetExceeded(
+                f'{request.endpoint}: запрос повторен {n} раз (максимум {max_repeats}): {shape}')
+    return response
+
+
+def init_sql_monitor(app):
+    """Подключает учет SQL-запросов к приложению"""
+    app.config.setdefault('SQL_MONITOR_STRICT', False)
+    app.config.setdefault('SQL_QUERY_BUDGET', 50)
+    app.config.setdefault('SQL_MAX_REPEATS', 10)
+
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
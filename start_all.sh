@@ -3,15 +3,34 @@
 echo "=== Запуск всех сервисов сайта ==="
 echo ""
 
-# Проверяем, запущен ли сервис
+# Сервис запускает gunicorn через serve.py. В юните должны быть строки:
+#   ExecStart=python serve.py
+#   ExecReload=python serve.py reload
+#   PIDFile=<папка instance>/server.pid
+# Если сервис уже запущен, он перезагружается без простоя: новый код подхватывает новый
+# мастер, старый дожидается текущих запросов
 if systemctl is-active --quiet english-teacher-site.service; then
-    echo "✅ Веб-сервис уже запущен"
+    echo "🔄 Веб-сервис запущен, перезагрузка без простоя..."
+    sudo systemctl reload english-teacher-site.service
 else
     echo "🚀 Запуск веб-сервиса..."
     sudo systemctl start english-teacher-site.service
     sleep 2
 fi
 
+# Готовность проверяем по /readyz, а не по systemctl: "active" бывает и у зависшего воркера
+# или при заблокированной базе
+echo ""
+echo "⏳ Проверка готовности..."
+for i in $(seq 1 15); do
+    if curl -fsS --max-time 2 http://localhost:5000/readyz; then
+        echo ""
+        echo "✅ Сайт готов"
+        break
+    fi
+    sleep 1
+done
+
 # Проверяем статус
 echo ""
 echo "📊 Статус сервисов:"
@@ -0,0 +1,61 @@
+"""Бюджет запуска: время импорта приложения и модули, которые должны загружаться только по требованию"""
+import re
+import subprocess
+import sys
+
+import click
+
+# Нужны только планировщику резервного копирования, отправке почты и сборке статики
+# (zipfile не проверяется: его загружает сам flask.cli через importlib.metadata)
+LAZY_MODULES = ('apscheduler', 'backup', 'smtplib', 'email.mime', 'urllib.request')
+
+_MEASURE = '''
+import time
+started = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+create_app()
+print(f'{(imported - started) * 1000:.1f} {(time.perf_counter() - imported) * 1000:.1f}')
+'''
+
+_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def measure_startup(root_path):
+    """Импорт app и create_app() в отдельном интерпретаторе с -X importtime.
+    Возвращает (мс на импорт, мс на create_app, [(модуль, собственное время мс, с вложенными мс)])"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', _MEASURE],
+                            cwd=root_path, capture_output=True, text=True, check=True)
+    modules = []
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            modules.append((match.group(4), int(match.group(1)) / 1000, int(match.group(2)) / 1000))
+    import_ms, create_ms = (float(value) for value in result.stdout.split()[-2:])
+    return import_ms, create_ms, modules
+
+
+def _is_lazy(module):
+    return any(module == name or module.startswith(name + '.') for name in LAZY_MODULES)
+
+
+def init_startup_check(app):
+    app.config.setdefault('STARTUP_IMPORT_BUDGET_MS', 1000)
+
+    @app.cli.command('check-startup')
+    @click.option('--top', default=15, help='Сколько самых долгих модулей показать.')
+    def check_startup_command(top):
+        """Измерить время импорта приложения и проверить ленивые модули."""
+        import_ms, create_ms, modules = measure_startup(app.root_path)
+        budget = app.config['STARTUP_IMPORT_BUDGET_MS']
+        click.echo(f'Импорт: {import_ms:.0f} мс (бюджет {budget} мс), create_app: {create_ms:.0f} мс, '
+                   f'модулей: {len(modules)}')
+        for name, own, cumulative in sorted(modules, key=lambda item: item[1], reverse=True)[:top]:
+            click.echo(f'  {own:8.1f} {cumulative:8.1f}  {name}')
+
+        loaded = sorted({name for name, _, _ in modules if _is_lazy(name)})
+        if loaded:
+            raise click.ClickException('При запуске загружены модули, которые должны импортироваться лениво: '
+                                       + ', '.join(loaded))
+        if import_ms > budget:
+            raise click.ClickException(f'Импорт приложения дольше бюджета: {import_ms:.0f} мс > {budget} мс')